@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    ARI_BASE_URL,
+    ARI_USERNAME,
+    ARI_PASSWORD,
+    ARI_TIMEOUT_SECONDS,
+    ARI_RETRIES,
+    ARI_POOL_SIZE,
+    ARI_CIRCUIT_FAILURES,
+    ARI_CIRCUIT_RESET_SECONDS,
+)
+from metrics import metrics
+from utils import logger
+
+# Path segments after these are resource ids, collapsed in the per-endpoint metrics
+ID_COLLECTIONS = {"channels", "bridges", "playbacks", "recordings"}
+NAMED_ENDPOINTS = {"externalMedia", "create"}
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "DELETE", "PUT"}
+
+ari_requests = metrics.counter("voicebot_ari_requests_total", "ARI REST requests by endpoint and outcome",
+                               labels=("method", "endpoint", "outcome"))
+ari_latency = metrics.histogram("voicebot_ari_request_seconds", "ARI REST request latency",
+                                labels=("method", "endpoint"),
+                                buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+ari_circuit_open = metrics.gauge("voicebot_ari_circuit_open", "1 while the ARI circuit breaker is open")
+
+
+class CircuitOpenError(Exception):
+    """ARI is failing, requests are refused until the breaker's reset time has passed."""
+
+
+def endpoint_name(path: str) -> str:
+    """/channels/1712.5/play -> /channels/{id}/play"""
+    segments = path.strip("/").split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in ID_COLLECTIONS and segments[i] not in NAMED_ENDPOINTS:
+            segments[i] = "{id}"
+    return "/" + "/".join(segments)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed requests (connection errors,
+    timeouts, 5xx) and refuses requests for `reset_seconds`. Then a single
+    trial request is let through: success closes the breaker, failure opens
+    it again.
+    """
+
+    def __init__(self, failures: int = ARI_CIRCUIT_FAILURES, reset_seconds: float = ARI_CIRCUIT_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("ARI circuit breaker closed")
+                ari_circuit_open.set(0)
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                if self.opened_at is None:
+                    logger.error(f"ARI circuit breaker open after {self.consecutive_failures} failed requests")
+                    ari_circuit_open.set(1)
+                self.opened_at = time.monotonic()
+
+
+class ARIClient:
+    """
+    The one way to call the ARI REST interface.
+
+    Keeps a pooled keep-alive session, applies a timeout to every call,
+    retries connection errors, timeouts and 502/503/504 with jittered
+    exponential backoff and trips a circuit breaker when Asterisk stops
+    answering. Non-idempotent POSTs are
+    only retried when the connection could not be made at all. Requests
+    are counted per endpoint in the metrics.
+
+    Paths are relative to ARI_BASE_URL; responses are returned as they
+    come, status codes are left to the caller.
+    """
+
+    def __init__(self, base_url: str = ARI_BASE_URL, username: str = ARI_USERNAME, password: str = ARI_PASSWORD,
+                 timeout: float = ARI_TIMEOUT_SECONDS, retries: int = ARI_RETRIES, pool_size: int = ARI_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.auth = (username, password) if username else None
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker()
+
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: spreads the retries of many calls hitting the same outage
+        return random.uniform(0, min(2.0, 0.1 * 2 ** attempt))
+
+    @staticmethod
+    def _retryable_error(method: str, error: Exception) -> bool:
+        if method in IDEMPOTENT_METHODS:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        return isinstance(error, requests.ConnectTimeout)
+
+    def _record(self, method: str, endpoint: str, started: float, outcome: str) -> None:
+        ari_requests.inc(method=method, endpoint=endpoint, outcome=outcome)
+        ari_latency.observe(time.monotonic() - started, method=method, endpoint=endpoint)
+
+    def request(self, method: str, path: str, params: dict = None, timeout: float = None) -> requests.Response:
+        """Send one request with retries. Raises CircuitOpenError or the last connection error."""
+        method = method.upper()
+        endpoint = endpoint_name(path)
+        url = self.base_url + path
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                ari_requests.inc(method=method, endpoint=endpoint, outcome="circuit_open")
+                raise CircuitOpenError(f"ARI circuit open, refusing {method} {endpoint}")
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, params=params, timeout=timeout or self.timeout)
+            except requests.RequestException as e:
+                self._record(method, endpoint, started, "error")
+                self.breaker.record_failure()
+                if attempt == self.retries or not self._retryable_error(method, e):
+                    raise
+                logger.debug(f"ARI {method} {endpoint} failed ({e}), retrying")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._record(method, endpoint, started, str(response.status_code))
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+                if (response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+                        and attempt < self.retries):
+                    time.sleep(self._backoff(attempt))
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# Global instance
+ari_client = ARIClient()
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import ARI_DISPATCH_WORKERS
+from metrics import metrics
+from utils import logger
+
+event_lag = metrics.histogram(
+    "voicebot_ari_event_lag_seconds",
+    "Time an ARI event waited between the websocket and its handler",
+    labels=("event",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0),
+)
+event_queue_depth = metrics.gauge("voicebot_ari_event_queue_depth", "ARI events waiting for a handler")
+events_total = metrics.counter("voicebot_ari_events_total", "ARI events dispatched", labels=("event",))
+
+
+class ARIEventDispatcher:
+    """
+    Runs ARI event handlers on a worker pool, in order per channel.
+
+    The websocket thread only parses and submits. Events of different
+    channels run concurrently, so one call's setup (RTP discovery, OpenAI
+    thread, Deepgram connect) no longer holds up every other call's
+    StasisStart and StasisEnd. Events of one channel run one at a time in
+    arrival order: a StasisEnd that arrives during setup runs once the
+    setup handler returns. Setup can check `is_ended()` to stop early.
+    """
+
+    def __init__(self, workers: int = ARI_DISPATCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ari-event")
+        self.lock = threading.Lock()
+        self.pending = {}  # channel_id -> deque of (received_at, event_type, handler, args)
+        self.ended = set()
+        self.queued = 0
+
+    def submit(self, channel_id: str, event_type: str, handler, *args) -> None:
+        """Queue handler(*args) behind the channel's earlier events."""
+        item = (time.monotonic(), event_type, handler, args)
+        with self.lock:
+            if event_type == "StasisEnd":
+                self.ended.add(channel_id)
+            self.queued += 1
+            event_queue_depth.set(self.queued)
+            queue = self.pending.get(channel_id)
+            if queue is not None:
+                # a worker is draining this channel and will pick it up
+                queue.append(item)
+                return
+            self.pending[channel_id] = deque([item])
+        self.executor.submit(self._drain, channel_id)
+
+    def _drain(self, channel_id: str) -> None:
+        while True:
+            with self.lock:
+                queue = self.pending[channel_id]
+                if not queue:
+                    del self.pending[channel_id]
+                    return
+                received_at, event_type, handler, args = queue.popleft()
+                self.queued -= 1
+                event_queue_depth.set(self.queued)
+
+            event_lag.observe(time.monotonic() - received_at, event=event_type)
+            events_total.inc(event=event_type)
+            try:
+                handler(*args)
+            except Exception as e:
+                logger.error(f"Error handling {event_type} for channel {channel_id}: {e}")
+
+    def is_ended(self, channel_id: str) -> bool:
+        """True once a StasisEnd for the channel has been received, even if not yet handled."""
+        return channel_id in self.ended
+
+    def forget(self, channel_id: str) -> None:
+        """Drop the ended flag, called when the channel's StasisEnd has been handled."""
+        with self.lock:
+            self.ended.discard(channel_id)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+# Global instance
+ari_dispatcher = ARIEventDispatcher()
@@ -1,71 +1,163 @@
 import json
 import threading
-import requests
 import websocket
 from scapy.all import sniff, IP, UDP
-from config import ARI_BASE_URL, ARI_USERNAME, ARI_PASSWORD, APP_NAME
+from config import (ARI_USERNAME, ARI_PASSWORD, APP_NAME, INGEST_MODE, RTP_PORT_MIN, RTP_PORT_MAX,
+                    ADMISSION_OVERFLOW, ADMISSION_QUEUE_TIMEOUT_SECONDS, LLM_BACKEND)
+from ari_client import ari_client
 from utils import logger
 from media_receiver import MediaReceiver
+from ari_dispatcher import ari_dispatcher
+from session_pool import session_pool
+from capacity_manager import capacity_manager
+from external_media import ExternalMediaSession, is_external_media_channel
 from openai_functions.OpenAIClient import openai_client
 from time import time, sleep
 
 active_channels = {}
 active_channels_lock = threading.Lock()
-active_ports = []
 
-def handle_stasis_start(channel_id, caller_number):
-    try:
-        response = requests.get(
-            f"{ARI_BASE_URL}/channels/{channel_id}/rtp_statistics",
-            auth=(ARI_USERNAME, ARI_PASSWORD)
-        )
+def discover_rtp_port(channel_id):
+    """Find the caller's RTP port by sniffing the carrier's traffic."""
+    response = ari_client.get(f"/channels/{channel_id}/rtp_statistics")
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to get RTP statistics: {response.text}")
+        return None
         
-        if response.status_code != 200:
-            logger.error(f"Failed to get RTP statistics: {response.text}")
-            return
+    rtp_info = response.json()
+    logger.info(f"RTP stats for channel {channel_id}: {json.dumps(rtp_info, indent=2)}")
+
+    def detect_rtp_destination_port(packet):
+        if packet.haslayer(IP) and packet.haslayer(UDP):
+            src_ip = packet[IP].src
+            dst_port = packet[UDP].dport
             
-        rtp_info = response.json()
-        logger.info(f"RTP stats for channel {channel_id}: {json.dumps(rtp_info, indent=2)}")
-        
-        rtp_port = None  
+            if src_ip.startswith("46.19.210") and capacity_manager.rtp_ports.claim(dst_port, channel_id):
+                logger.info(f"Detected RTP Destination Port from {src_ip}: {dst_port}")
+                return dst_port
+        return None
+    
+    logger.info("Starting packet sniffing to detect RTP port from 46.19.210.22...")
+    packets = sniff(filter=f"udp portrange {RTP_PORT_MIN}-{RTP_PORT_MAX}", count=25, timeout=65,
+                    stop_filter=lambda packet: ari_dispatcher.is_ended(channel_id))
+    
+    for packet in packets:
+        port = detect_rtp_destination_port(packet)
+        if port:
+            return port
+    return None
 
-        def detect_rtp_destination_port(packet):
-            if packet.haslayer(IP) and packet.haslayer(UDP):
-                src_ip = packet[IP].src
-                dst_port = packet[UDP].dport
-                
-                if src_ip.startswith("46.19.210") and 10000 <= dst_port <= 20000 and dst_port not in active_ports:
-                    logger.info(f"Detected RTP Destination Port from {src_ip}: {dst_port}")
-                    active_ports.append(dst_port)
-                    return dst_port
-            return None
-        
-        logger.info("Starting packet sniffing to detect RTP port from 46.19.210.22...")
-        packets = sniff(filter="udp portrange 10000-20000", count=25, timeout=65)
-        
-        for packet in packets:
-            port = detect_rtp_destination_port(packet)
-            if port:
-                rtp_port = port
-                break   
+def admit_call(channel_id, caller_number):
+    """
+    Take the call if this node has capacity, otherwise hold the caller or reject them as busy.
+    A held call does not wait here: setup_call() runs on the dispatcher once it is admitted.
+    """
+    reason = capacity_manager.try_admit(channel_id)
+    if reason is None:
+        return True
+    logger.warning(f"Channel {channel_id} over capacity: {reason}")
+
+    if ADMISSION_OVERFLOW == "queue" and capacity_manager.enqueue(
+        channel_id, ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        lambda: ari_dispatcher.submit(channel_id, "Admitted", resume_held_call, channel_id, caller_number),
+        lambda: ari_dispatcher.submit(channel_id, "AdmissionTimeout", reject_held_call, channel_id),
+    ):
+        # the resume or reject queues behind this handler, so music on hold starts first
+        try:
+            ari_client.post(f"/channels/{channel_id}/moh")
+        except Exception as e:
+            logger.error(f"Could not start music on hold for channel {channel_id}: {e}")
+        return False
+
+    reject_call(channel_id)
+    return False
+
+def reject_call(channel_id):
+    if not ari_dispatcher.is_ended(channel_id):
+        try:
+            ari_client.delete(f"/channels/{channel_id}", params={"reason": "busy"})
+        except Exception as e:
+            logger.error(f"Could not reject channel {channel_id}: {e}")
+
+def stop_hold_music(channel_id):
+    try:
+        ari_client.delete(f"/channels/{channel_id}/moh")
+    except Exception as e:
+        logger.error(f"Could not stop music on hold for channel {channel_id}: {e}")
+
+def resume_held_call(channel_id, caller_number):
+    if not capacity_manager.is_admitted(channel_id):
+        # hung up while waiting, its StasisEnd already gave the slot back
+        return
+    stop_hold_music(channel_id)
+    logger.info(f"Channel {channel_id} admitted after waiting for capacity")
+    setup_call(channel_id, caller_number)
+
+def reject_held_call(channel_id):
+    stop_hold_music(channel_id)
+    reject_call(channel_id)
+
+def handle_stasis_start(channel_id, caller_number):
+    if admit_call(channel_id, caller_number):
+        setup_call(channel_id, caller_number)
+
+def setup_call(channel_id, caller_number):
+    media_session = None
+    try:
+        if INGEST_MODE == "external_media":
+            media_port = capacity_manager.media_ports.allocate(channel_id)
+            if not media_port:
+                logger.error(f"No free ExternalMedia port for channel {channel_id}")
+                return
+            media_session = ExternalMediaSession(channel_id, port=media_port)
+            if not media_session.open():
+                media_session.close()
+                return
+            rtp_port = media_session.port
+        else:
+            rtp_port = discover_rtp_port(channel_id)
         
         if not rtp_port:
             logger.error(f"Could not determine RTP port for channel {channel_id}")
             return
+
+        if ari_dispatcher.is_ended(channel_id):
+            logger.info(f"Channel {channel_id} hung up during setup")
+            if media_session:
+                media_session.close()
+            return
         
-        logger.info(f"Creating OPENAI thread")
-        openai_thread = openai_client.get_client().beta.threads.create()
-        openai_thread_id = openai_thread.id
+        warm_session = session_pool.acquire()
+        if warm_session:
+            logger.info(f"Using a warm session for channel {channel_id}")
+            openai_thread_id = warm_session.openai_thread_id
+            dg_connection = warm_session.dg_connection
+        elif LLM_BACKEND == "assistants":
+            logger.info(f"Creating OPENAI thread")
+            openai_thread = openai_client.get_client().beta.threads.create()
+            openai_thread_id = openai_thread.id
+            dg_connection = None
+        else:
+            # the chat backend keeps the conversation in the call, there is no thread to create
+            openai_thread_id = None
+            dg_connection = None
 
         logger.info(f"Initiazlizing Media Receiver")
-        receiver = MediaReceiver(channel_id, openai_thread_id, caller_number)
+        receiver = MediaReceiver(channel_id, openai_thread_id, caller_number, media_session=media_session)
         logger.info(f"setting media receiver port {rtp_port}")
         receiver.rtp_port = rtp_port
 
-        if not receiver.start_deepgram():
+        if not receiver.start_deepgram(dg_connection):
             logger.error(f"Failed to start Deepgram for channel {channel_id}")
+            receiver.cleanup()
             return
-            
+
+        if ari_dispatcher.is_ended(channel_id):
+            logger.info(f"Channel {channel_id} hung up during setup")
+            receiver.cleanup()
+            return
+
         with active_channels_lock:
             active_channels[channel_id] = receiver
         
@@ -79,6 +171,12 @@ def handle_stasis_start(channel_id, caller_number):
         
     except Exception as e:
         logger.error(f"Error in handle_stasis_start: {e}")
+        if media_session and channel_id not in active_channels:
+            media_session.close()
+    finally:
+        # every failed setup gives back its call slot and ports
+        if channel_id not in active_channels:
+            capacity_manager.release(channel_id)
 
 def cleanup_channel(channel_id):
     try:
@@ -86,16 +184,12 @@ def cleanup_channel(channel_id):
             if channel_id in active_channels:
                 receiver = active_channels[channel_id]
                 receiver.stop_flag = True
-                if receiver.rtp_port in active_ports:
-                    active_ports.remove(receiver.rtp_port)
-                    logger.info(f"Removed RTP port {receiver.rtp_port} from active_ports")
                 receiver.cleanup()
                 del active_channels[channel_id]
+        capacity_manager.cancel(channel_id)
+        capacity_manager.release(channel_id)
                 
-        response = requests.delete(
-            f"{ARI_BASE_URL}/channels/{channel_id}",
-            auth=(ARI_USERNAME, ARI_PASSWORD)
-        )
+        response = ari_client.delete(f"/channels/{channel_id}")
         
         if response.status_code not in (200, 404):
             logger.error(f"Error deleting channel {channel_id}: {response.text}")
@@ -103,7 +197,22 @@ def cleanup_channel(channel_id):
     except Exception as e:
         logger.error(f"Error in cleanup_channel: {e}")
 
+def handle_stasis_end(channel_id):
+    cleanup_channel(channel_id)
+    ari_dispatcher.forget(channel_id)
+
+def route_playback_event(event_type, playback):
+    """Hand PlaybackStarted/PlaybackFinished to the TTS queue of the channel the playback is on."""
+    target = playback.get('target_uri', '')
+    if not target.startswith('channel:'):
+        return
+    with active_channels_lock:
+        receiver = active_channels.get(target[len('channel:'):])
+    if receiver:
+        receiver.conversation_handler.tts_handler.on_playback_event(event_type, playback)
+
 def on_ari_message(ws, message):
+    """Runs on the websocket thread: parse and hand the event to the dispatcher, never block here."""
     try:
         event = json.loads(message)
         event_type = event.get('type')
@@ -111,25 +220,34 @@ def on_ari_message(ws, message):
         if not event_type:
             return
             
+        if event_type in ("PlaybackStarted", "PlaybackFinished"):
+            # only wakes the channel's playback thread, safe to run on the websocket thread
+            route_playback_event(event_type, event.get('playback', {}))
+            return
+
         logger.info(f"Received ARI event: {event_type}")
         
+        if event_type in ("StasisStart", "StasisEnd") and is_external_media_channel(event.get('channel', {})):
+            return
+
         if event_type == "StasisStart":
             channel = event.get('channel', {})
             channel_id = channel.get('id')
             caller_number = channel.get('caller', {}).get('number')
             logger.info(f"Caller number: {caller_number}")
             if channel_id:
-                handle_stasis_start(channel_id, caller_number)
-                
+                ari_dispatcher.submit(channel_id, event_type, handle_stasis_start, channel_id, caller_number)
+
         elif event_type == "StasisEnd":
             channel_id = event.get('channel', {}).get('id')
             if channel_id:
-                cleanup_channel(channel_id)
+                ari_dispatcher.submit(channel_id, event_type, handle_stasis_end, channel_id)
                 
     except Exception as e:
         logger.error(f"Error processing ARI message: {e}")
 
-def handle_ari_events():
+def handle_ari_events(on_message=on_ari_message):
+    """Listen on the ARI websocket forever. on_message is WorkerSupervisor.route in multi-process mode."""
     while True:
         try:
             ws_url = (
@@ -140,7 +258,7 @@ def handle_ari_events():
             
             ws = websocket.WebSocketApp(
                 ws_url,
-                on_message=on_ari_message,
+                on_message=on_message,
                 on_error=lambda ws, error: logger.error(f"ARI WebSocket error: {error}"),
                 on_close=lambda ws, code, msg: logger.info(f"ARI WebSocket closed: {code} - {msg}")
             )
@@ -149,4 +267,4 @@ def handle_ari_events():
             
         except Exception as e:
             logger.error(f"Error in ARI event handler: {e}")
-            time.sleep(5)
+            sleep(5)
@@ -0,0 +1,240 @@
+import numpy as np
+
+
+def _build_ulaw_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((codes & 0x0F) << 3) + 0x84) << ((codes & 0x70) >> 4)
+    return np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.int16)
+
+
+def _build_alaw_table() -> np.ndarray:
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    segment = (codes & 0x70) >> 4
+    magnitude = (codes & 0x0F) << 4
+    magnitude = np.where(segment == 0, magnitude + 8, (magnitude + 0x108) << np.maximum(segment - 1, 0))
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+# G.711 code -> 16-bit linear sample, identical to audioop.ulaw2lin / alaw2lin
+ULAW_TO_LINEAR = _build_ulaw_table()
+ALAW_TO_LINEAR = _build_alaw_table()
+DECODE_TABLES = {"PCMU": ULAW_TO_LINEAR, "PCMA": ALAW_TO_LINEAR}
+CODEC_OFFSETS = {"PCMU": 0, "PCMA": 256}
+
+
+def decode_g711(raw, codec: str = "PCMU", out=None) -> np.ndarray:
+    """Decode G.711 bytes to int16 PCM with a 256-entry lookup table."""
+    return np.take(DECODE_TABLES[codec], np.frombuffer(raw, dtype=np.uint8), out=out, mode="clip")
+
+
+def _build_linear_to_ulaw_table() -> np.ndarray:
+    samples = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    value = np.minimum(np.abs(samples), 8159) + 0x21
+    segment = np.minimum(np.searchsorted(1 << np.arange(6, 14), value, side="right"), 8)
+    code = np.where(segment > 7, 0x7F, (np.minimum(segment, 7) << 4) | ((value >> (np.minimum(segment, 7) + 1)) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+
+def _build_linear_to_alaw_table() -> np.ndarray:
+    samples = np.arange(-32768, 32768, dtype=np.int32) >> 3
+    mask = np.where(samples >= 0, 0xD5, 0x55)
+    value = np.where(samples >= 0, samples, -samples - 1)
+    segment = np.searchsorted(np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]), value)
+    shift = np.minimum(np.where(segment < 2, 1, segment), 7)
+    code = np.where(segment > 7, 0x7F, (np.minimum(segment, 7) << 4) | ((value >> shift) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+
+# 16-bit linear sample (offset by 32768) -> G.711 code, identical to audioop.lin2ulaw / lin2alaw
+ENCODE_TABLES = {"PCMU": _build_linear_to_ulaw_table(), "PCMA": _build_linear_to_alaw_table()}
+
+
+def encode_g711(pcm, codec: str = "PCMU") -> bytes:
+    """Encode int16 PCM (bytes or array) to G.711 with a 64K-entry lookup table."""
+    samples = np.frombuffer(pcm, dtype=np.int16) if isinstance(pcm, (bytes, bytearray, memoryview)) else pcm
+    # flipping the sign bit of the raw sample is the +32768 offset into the table
+    return np.take(ENCODE_TABLES[codec], samples.view(np.uint16) ^ np.uint16(0x8000)).tobytes()
+
+
+def apply_gain(pcm, gain: float) -> np.ndarray:
+    """
+    int16 PCM bytes times gain, clipped to int16. Works in place on one
+    int32 copy; a whole-number gain stays in integer arithmetic.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.int32)
+    if float(gain).is_integer():
+        samples *= int(gain)
+    else:
+        np.multiply(samples, gain, out=samples, casting="unsafe")  # truncates like astype(int16) did
+    np.clip(samples, -32768, 32767, out=samples)
+    return samples.astype(np.int16)
+
+
+class IngestDSP:
+    """
+    Preallocated NumPy kernel for ingest chunks.
+
+    Replaces the audioop chain in MediaReceiver: G.711 decode by table
+    lookup, the first-order high-pass (stateful across chunks), and a single
+    in-place pass for DC removal, AGC and volume boost with saturation. All work buffers are
+    allocated once; decode() and highpass() return views into them that
+    stay valid until the next call.
+
+    With `channels` > 1 the kernel keeps filter state for that many calls
+    and the *_rows() methods process a 2-D batch, one chunk per row, where
+    `rows` selects the channels the rows belong to. The single-chunk
+    methods work on channel 0 and skip the batch bookkeeping.
+    """
+
+    def __init__(self, frame_samples: int, codec: str = "PCMU", highpass_alpha: float = 0.97,
+                 target_rms: float = 2000, volume_boost: float = 2.0, channels: int = 1):
+        self.codec = codec
+        self.table = DECODE_TABLES[codec]
+        self.highpass_alpha = np.float32(highpass_alpha)
+        self.target_rms = float(target_rms)
+        self.volume_boost = float(volume_boost)
+        self.channels = channels
+
+        # both laws in one table for batches, a channel's codec is an offset into it
+        self.tables = np.concatenate([DECODE_TABLES[name] for name in CODEC_OFFSETS])
+        self.table_offset = np.full(channels, CODEC_OFFSETS[codec], dtype=np.intp)
+
+        self.codes = np.empty((channels, frame_samples), dtype=np.intp)
+        self.pcm = np.empty((channels, frame_samples), dtype=np.int16)
+        self.highpassed = np.empty((channels, frame_samples), dtype=np.int16)
+        self.samples32 = np.empty((channels, frame_samples), dtype=np.float32)
+        self.work32 = np.empty((channels, frame_samples), dtype=np.float32)
+        self.work64 = np.empty((channels, frame_samples), dtype=np.float64)
+        self.ones = np.ones(frame_samples, dtype=np.float64)
+        self.out = np.empty((channels, frame_samples), dtype=np.int16)
+        self.previous_sample = np.zeros(channels, dtype=np.float32)
+        self.row_mean = np.empty(channels, dtype=np.float64)
+        self.row_rms = np.empty(channels, dtype=np.float64)
+        self.row_gain = np.empty(channels, dtype=np.float64)
+
+    def reset(self, rows=slice(None)) -> None:
+        """Forget the filter state carried over from the previous chunk."""
+        self.previous_sample[rows] = 0
+
+    def set_codec(self, row: int, codec: str) -> None:
+        self.table_offset[row] = CODEC_OFFSETS[codec]
+
+    def decode(self, raw) -> np.ndarray:
+        raw_codes = np.frombuffer(raw, dtype=np.uint8)
+        n = len(raw_codes)
+        # take() would allocate an intp copy of uint8 indices, widen into our own buffer
+        codes = self.codes[0, :n]
+        np.copyto(codes, raw_codes)
+        pcm = self.pcm[0, :n]
+        # codes are always in range, "clip" skips the bounds-check buffer
+        np.take(self.table, codes, out=pcm, mode="clip")
+        return pcm
+
+    def highpass(self, pcm: np.ndarray) -> np.ndarray:
+        """
+        y[n] = x[n] - alpha * x[n-1] in float32, continuing from the last
+        sample of the previous chunk instead of wrapping around like np.roll.
+        """
+        n = len(pcm)
+        work = self.work32[0, :n]
+        work[0] = np.float32(pcm[0]) - self.highpass_alpha * self.previous_sample[0]
+        self.previous_sample[0] = pcm[-1]
+        np.multiply(pcm[:-1], self.highpass_alpha, out=work[1:], dtype=np.float32)
+        np.subtract(pcm[1:], work[1:], out=work[1:])
+        np.minimum(work, 32767, out=work)
+        np.maximum(work, -32768, out=work)
+        out = self.highpassed[0, :n]
+        np.copyto(out, work, casting="unsafe")
+        return out
+
+    def finalize(self, samples: np.ndarray) -> bytes:
+        """
+        DC removal, AGC to target_rms and volume boost, saturated to int16.
+
+        Matches audioop.avg/bias/rms/mul rounding (floor of the mean,
+        truncated RMS, floor after each gain) except that out-of-range
+        values saturate where audioop.bias would wrap around.
+        """
+        n = len(samples)
+        acc = self.work64[0, :n]
+        np.copyto(acc, samples, casting="unsafe")
+
+        # dot() against ones is the cheapest exact sum for these sizes
+        mean = np.floor(np.dot(acc, self.ones[:n]) / n)
+        if mean != 0:
+            np.subtract(acc, mean, out=acc)
+
+        rms = int(np.sqrt(np.dot(acc, acc) / n))
+        if rms > 0:
+            np.multiply(acc, self.target_rms / rms, out=acc)
+            np.floor(acc, out=acc)
+        np.multiply(acc, self.volume_boost, out=acc)
+        if not self.volume_boost.is_integer():
+            np.floor(acc, out=acc)
+        np.minimum(acc, 32767, out=acc)
+        np.maximum(acc, -32768, out=acc)
+
+        out = self.out[0, :n]
+        np.copyto(out, acc, casting="unsafe")
+        return out.tobytes()
+
+    def decode_rows(self, rows, raw: np.ndarray) -> np.ndarray:
+        """decode() for a (batch, samples) uint8 array, each row with its channel's codec."""
+        k, n = raw.shape
+        codes = self.codes[:k, :n]
+        np.copyto(codes, raw)
+        codes += self.table_offset[rows][:, np.newaxis]
+        pcm = self.pcm[:k, :n]
+        np.take(self.tables, codes, out=pcm, mode="clip")
+        return pcm
+
+    def highpass_rows(self, rows, pcm: np.ndarray) -> np.ndarray:
+        """highpass() for a batch, with each row continuing its own channel's filter."""
+        k, n = pcm.shape
+        # widen once, casting inside strided 2-D ufuncs would go through a temporary buffer
+        x = self.samples32[:k, :n]
+        np.copyto(x, pcm)
+        work = self.work32[:k, :n]
+        work[:, 0] = x[:, 0] - self.highpass_alpha * self.previous_sample[rows]
+        self.previous_sample[rows] = x[:, -1]
+        np.multiply(x[:, :-1], self.highpass_alpha, out=work[:, 1:])
+        np.subtract(x[:, 1:], work[:, 1:], out=work[:, 1:])
+        np.minimum(work, 32767, out=work)
+        np.maximum(work, -32768, out=work)
+        out = self.highpassed[:k, :n]
+        np.copyto(out, work, casting="unsafe")
+        return out
+
+    def finalize_rows(self, samples: np.ndarray) -> np.ndarray:
+        """finalize() for a batch, returns an int16 array with one chunk per row."""
+        k, n = samples.shape
+        acc = self.work64[:k, :n]
+        np.copyto(acc, samples, casting="unsafe")
+
+        # sums of int16 samples and their squares are exact in float64 in any order
+        mean = self.row_mean[:k]
+        np.matmul(acc, self.ones[:n], out=mean)
+        mean /= n
+        np.floor(mean, out=mean)
+        acc -= mean[:, np.newaxis]
+
+        rms = self.row_rms[:k]
+        np.einsum("ij,ij->i", acc, acc, out=rms)
+        rms /= n
+        np.sqrt(rms, out=rms)
+        np.trunc(rms, out=rms)
+        gain = self.row_gain[:k]
+        gain.fill(1.0)
+        np.divide(self.target_rms, rms, out=gain, where=rms > 0)
+        acc *= gain[:, np.newaxis]
+        np.floor(acc, out=acc)
+        np.multiply(acc, self.volume_boost, out=acc)
+        if not self.volume_boost.is_integer():
+            np.floor(acc, out=acc)
+        np.minimum(acc, 32767, out=acc)
+        np.maximum(acc, -32768, out=acc)
+
+        out = self.out[:k, :n]
+        np.copyto(out, acc, casting="unsafe")
+        return out
@@ -0,0 +1,102 @@
+"""
+Chat Completions backend against the mock streaming server.
+
+Runs a three-turn conversation, including a track_order tool call,
+through ChatEngine against tools/mock_llm_server.py with LATENCY seconds
+to the first byte of every request. For each turn it reports the time
+until the first sentence goes to TTS and the number of requests. The
+Assistants backend makes two requests before its first token
+(messages.create, then runs.stream), so that column shows the floor it
+would add at the same latency. It is a model, not a measurement.
+
+It also checks three things: the request always starts with the same
+system prompt (the mock reports it as cached), the history stays
+consistent across the tool call, and barge-in stops the stream.
+
+Run from the repository root:
+    python benchmarks/bench_chat_engine.py
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import openai  # noqa: E402
+from openai_functions import chat_engine  # noqa: E402
+from tools.mock_llm_server import MockLLM  # noqa: E402
+
+for name in ("openai", "httpx", "httpcore"):
+    logging.getLogger(name).setLevel(logging.WARNING)
+
+LATENCY = 0.15
+TOKEN_DELAY = 0.01
+TURNS = ["Здравейте, каква е доставката?", "Къде е поръчката ми?", "Благодаря."]
+
+
+class RecordingTTS:
+    def __init__(self):
+        self.sentences = []
+
+    def synthesize_and_play(self, text, trace=None):
+        self.sentences.append((time.monotonic(), text))
+
+
+class FakeConversation:
+    """The parts of ConversationHandler the engine uses."""
+
+    def __init__(self):
+        self.tts_handler = RecordingTTS()
+        self.is_interrupted = False
+
+
+def fast_track_order(conversation_handler, trace, arguments):
+    """run_track_order without the 3.3 s wait for the prompt to play."""
+    conversation_handler.tts_handler.synthesize_and_play("Проследявам поръчката Ви... Един момент..", trace=trace)
+    return "не е намерина такава поръчка"
+
+
+def prompt_tokens(cached: str) -> float:
+    return chat_engine.llm_prompt_tokens.values.get((cached,), 0)
+
+
+if __name__ == "__main__":
+    mock = MockLLM(LATENCY, TOKEN_DELAY)
+    server = mock.serve()
+    client = openai.OpenAI(api_key="mock", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+    chat_engine.TOOLS["track_order"] = fast_track_order
+    engine = chat_engine.ChatEngine("359888123456", client=client)
+    conversation = FakeConversation()
+
+    print(f"mock latency {LATENCY * 1000:.0f} ms to first byte, {TOKEN_DELAY * 1000:.0f} ms per word")
+    print(f"{'turn':>4s} {'requests':>9s} {'first sentence ms':>18s} {'assistants floor ms':>20s}  reply")
+    for turn, text in enumerate(TURNS, 1):
+        conversation.tts_handler.sentences.clear()
+        sent_before = len(mock.requests)
+        started = time.monotonic()
+        engine.respond(text, conversation)
+        first = (conversation.tts_handler.sentences[0][0] - started) * 1000
+        requests = len(mock.requests) - sent_before
+        floor = 2 * LATENCY * 1000 + (requests - 1) * LATENCY * 1000
+        print(f"{turn:4d} {requests:9d} {first:18.0f} {floor:20.0f}  "
+              + " | ".join(sentence for _, sentence in conversation.tts_handler.sentences))
+
+    prefixes = {request["messages"][0]["content"] for request in mock.requests}
+    print(f"system prompt identical in all {len(mock.requests)} requests: {len(prefixes) == 1}")
+    print(f"prompt tokens served from cache: {prompt_tokens('yes'):.0f} of "
+          f"{prompt_tokens('yes') + prompt_tokens('no'):.0f}")
+    roles = [message["role"] for message in engine.history]
+    print(f"history: {' '.join(roles)}")
+
+    conversation.tts_handler.sentences.clear()
+    mock.token_delay = 0.2
+    interrupter = threading.Timer(LATENCY + 0.1, lambda: setattr(conversation, "is_interrupted", True))
+    interrupter.start()
+    started = time.monotonic()
+    engine.respond("Разкажи ми за магазините.", conversation)
+    print(f"barge-in: stream stopped after {(time.monotonic() - started) * 1000:.0f} ms, "
+          f"sentences spoken {len(conversation.tts_handler.sentences)}")
+    server.shutdown()
@@ -0,0 +1,138 @@
+"""
+Equivalence check and per-chunk cost of the NumPy ingest kernel (audio_dsp)
+against the audioop chain it replaced in MediaReceiver.
+
+The check decodes every G.711 code of both laws and runs random 240 ms
+chunks through the high-pass and DC/AGC/gain stages of both paths. Outputs
+must be identical wherever the audioop path does not overflow (it wraps
+around on int16 overflow, the kernel saturates). Noise suppression sits
+between the two stages; the streaming suppressor is timed against the
+per-chunk noisereduce call it replaced.
+
+Run from the repository root:
+    python benchmarks/bench_dsp.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_dsp import IngestDSP, ULAW_TO_LINEAR, ALAW_TO_LINEAR  # noqa: E402
+from noise_suppressor import StreamingNoiseSuppressor  # noqa: E402
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # removed in Python 3.13
+        audioop = None
+
+CHUNK_SAMPLES = 1920  # 240 ms at 8 kHz
+CHUNKS = 2000
+
+
+def legacy_decode(raw):
+    return audioop.ulaw2lin(raw, 2)
+
+
+def legacy_highpass(audio_data):
+    audio_array = np.frombuffer(audio_data, dtype=np.int16)
+    shifted = np.roll(audio_array, 1)
+    highpassed = audio_array.astype(np.float32) - 0.97 * shifted.astype(np.float32)
+    highpassed[0] = audio_array[0]
+    return highpassed.astype(np.int16)
+
+
+def legacy_finalize(audio_array):
+    processed_data = audio_array.tobytes()
+    avg_val = audioop.avg(processed_data, 2)
+    if avg_val != 0:
+        processed_data = audioop.bias(processed_data, 2, -avg_val)
+    current_rms = audioop.rms(processed_data, 2)
+    if current_rms > 0:
+        processed_data = audioop.mul(processed_data, 2, 2000.0 / current_rms)
+    return audioop.mul(processed_data, 2, 2.0)
+
+
+def random_chunks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for _ in range(count):
+        pcm = rng.normal(rng.uniform(-300, 300), rng.uniform(10, 3000), CHUNK_SAMPLES)
+        chunks.append(np.clip(pcm, -32768, 32767).astype(np.int16))
+    return chunks
+
+
+def check_equivalence():
+    codes = bytes(range(256))
+    assert np.array_equal(np.frombuffer(audioop.ulaw2lin(codes, 2), np.int16), ULAW_TO_LINEAR)
+    assert np.array_equal(np.frombuffer(audioop.alaw2lin(codes, 2), np.int16), ALAW_TO_LINEAR)
+
+    dsp = IngestDSP(CHUNK_SAMPLES)
+    max_error = 0
+    for pcm in random_chunks(500, seed=1):
+        expected_hp = legacy_highpass(pcm.tobytes())
+        dsp.reset()  # the legacy filter restarted on every chunk
+        assert np.array_equal(dsp.highpass(pcm), expected_hp), "high-pass differs"
+        expected = np.frombuffer(legacy_finalize(expected_hp), np.int16).astype(np.int32)
+        actual = np.frombuffer(dsp.finalize(expected_hp), np.int16)
+        max_error = max(max_error, int(np.abs(expected - actual).max()))
+    assert max_error == 0, f"finalize differs by up to {max_error}"
+    print("equivalence: G.711 tables, high-pass and DC/AGC/gain are bit-exact with audioop")
+
+
+def per_chunk_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def peak_bytes(fn, item):
+    fn(item)
+    tracemalloc.start()
+    fn(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    rng = np.random.default_rng(2)
+    raw_chunks = [rng.integers(0, 256, CHUNK_SAMPLES, dtype=np.uint8).tobytes() for _ in range(CHUNKS)]
+    dsp = IngestDSP(CHUNK_SAMPLES)
+
+    if audioop is None:
+        print("audioop unavailable, skipping equivalence check and legacy timings")
+    else:
+        check_equivalence()
+        legacy_fn = lambda raw: legacy_finalize(legacy_highpass(legacy_decode(raw)))  # noqa: E731
+        legacy = per_chunk_us(legacy_fn, raw_chunks)
+        print(f"audioop chain  {legacy:8.1f} us/chunk  {peak_bytes(legacy_fn, raw_chunks[0]):7d} B peak allocation")
+
+    kernel_fn = lambda raw: dsp.finalize(dsp.highpass(dsp.decode(raw)))  # noqa: E731
+    kernel = per_chunk_us(kernel_fn, raw_chunks)
+    print(f"numpy kernel   {kernel:8.1f} us/chunk  {peak_bytes(kernel_fn, raw_chunks[0]):7d} B peak allocation")
+    if audioop is not None:
+        print(f"speedup        {legacy / kernel:8.1f}x")
+
+    decoded = [dsp.decode(raw).copy() for raw in raw_chunks[:200]]
+    suppressor = StreamingNoiseSuppressor(prop_decrease=0.8)
+    streaming = per_chunk_us(suppressor.process, decoded)
+    print(f"streaming NS   {streaming:8.1f} us/chunk")
+    try:
+        import noisereduce as nr
+    except ImportError:
+        print("noisereduce not installed, skipping the per-chunk comparison")
+        return
+    noise = per_chunk_us(lambda pcm: nr.reduce_noise(y=pcm, sr=8000, prop_decrease=0.8), decoded[:50])
+    print(f"noisereduce    {noise:8.1f} us/chunk  ({noise / streaming:.0f}x the streaming suppressor)")
+
+
+if __name__ == "__main__":
+    main()
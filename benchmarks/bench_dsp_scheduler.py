@@ -0,0 +1,107 @@
+"""
+CPU cost per call of the ingest DSP chain (decode, high-pass, noise
+suppression, voice gate, AGC) with one processing thread per call against
+the shared DSPScheduler batch, as the number of concurrent calls grows.
+
+Both run the same 240 ms frames. The batch output is checked against the
+per-call chain for equality first.
+
+Run from the repository root:
+    python benchmarks/bench_dsp_scheduler.py
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_dsp import IngestDSP  # noqa: E402
+from dsp_scheduler import DSPScheduler  # noqa: E402
+from noise_suppressor import StreamingNoiseSuppressor  # noqa: E402
+from vad import VoiceActivityGate  # noqa: E402
+
+FRAME_SAMPLES = 1920
+FRAMES_PER_CALL = 40
+CONCURRENCY = (1, 4, 16, 64, 128)
+
+
+class PerCallChain:
+    """The chain MediaReceiver runs in its own thread with DSP_MODE=thread."""
+
+    def __init__(self):
+        self.dsp = IngestDSP(FRAME_SAMPLES)
+        self.noise_suppressor = StreamingNoiseSuppressor(prop_decrease=0.8)
+        self.vad = VoiceActivityGate()
+
+    def process(self, raw):
+        reduced_noise = self.noise_suppressor.process(self.dsp.highpass(self.dsp.decode(raw)))
+        return self.dsp.finalize(reduced_noise), self.vad.process(reduced_noise)
+
+
+def call_frames(calls, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (FRAMES_PER_CALL, calls, FRAME_SAMPLES), dtype=np.uint8)
+
+
+def check_equivalence():
+    frames = call_frames(8, seed=1)
+    scheduler = DSPScheduler(FRAME_SAMPLES, max_channels=8)
+    scheduler._allocate()
+    chains = [PerCallChain() for _ in range(8)]
+    slots = np.arange(8)
+    for tick in frames[:10]:
+        output, is_speech = scheduler.process_batch(slots, tick)
+        for slot, chain in enumerate(chains):
+            expected, expected_speech = chain.process(tick[slot].tobytes())
+            assert output[slot].tobytes() == expected, "batch output differs from the per-call chain"
+            assert bool(is_speech[slot]) == expected_speech, "batch voice gate differs"
+    print("equivalence: batch output matches the per-call chain")
+
+
+def per_call_threads(frames):
+    calls = frames.shape[1]
+    chains = [PerCallChain() for _ in range(calls)]
+    payloads = [[frames[t, c].tobytes() for t in range(FRAMES_PER_CALL)] for c in range(calls)]
+
+    def worker(chain, raws):
+        for raw in raws:
+            chain.process(raw)
+
+    threads = [threading.Thread(target=worker, args=(chains[c], payloads[c])) for c in range(calls)]
+    cpu, wall = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.process_time() - cpu, time.perf_counter() - wall
+
+
+def batched(frames):
+    calls = frames.shape[1]
+    scheduler = DSPScheduler(FRAME_SAMPLES, max_channels=calls)
+    scheduler._allocate()
+    slots = np.arange(calls)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for tick in frames:
+        output, _ = scheduler.process_batch(slots, tick)
+        [row.tobytes() for row in output]
+    return time.process_time() - cpu, time.perf_counter() - wall
+
+
+def main():
+    check_equivalence()
+    print(f"{'calls':>5}  {'threads cpu/frame':>18}  {'batch cpu/frame':>16}  {'ratio':>6}")
+    for calls in CONCURRENCY:
+        frames = call_frames(calls)
+        thread_cpu, _ = per_call_threads(frames)
+        batch_cpu, _ = batched(frames)
+        total = calls * FRAMES_PER_CALL
+        print(f"{calls:5d}  {thread_cpu / total * 1e6:15.1f} us  {batch_cpu / total * 1e6:13.1f} us"
+              f"  {thread_cpu / batch_cpu:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Accuracy and cost of the FAQ fast path.
+
+Scores caller-style turns that faq.json does not contain word for word:
+paraphrases with their expected entry, speech-recognition slips, and
+turns that must go to the LLM (order tracking, product questions,
+yes/no answers, questions mixed with something else). For a range of
+thresholds it prints the hit rate on the FAQ turns, how many hits
+picked the wrong entry, and how many LLM turns were answered from the
+FAQ by mistake. FAQ_MATCH_THRESHOLD should sit where the last two are
+zero. It also times match().
+
+Run from the repository root:
+    python benchmarks/bench_faq_matcher.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from faq_matcher import FAQMatcher  # noqa: E402
+
+ROUNDS = 2000
+# (turn, expected entry id or None for the LLM)
+TURNS = [
+    ("колко ще ми струва доставката", "delivery_price"),
+    ("доставката безплатна ли е", "delivery_price"),
+    ("за колко дни пристига поръчка", "delivery_time"),
+    ("какъв е срока на доставка", "delivery_time"),
+    ("с кой куриер работите", "couriers"),
+    ("работите ли с еконт", "couriers"),
+    ("доставяте ли в чужбина", "international_delivery"),
+    ("искам да върна един продукт", "returns"),
+    ("как мога да върна стоката", "returns"),
+    ("какви са условията за връщане на стока", "returns"),
+    ("кога ще ми върнете парите", "refund_time"),
+    ("какво е работното време на магазина", "store_hours"),
+    ("до колко часа работи магазина", "store_hours"),
+    ("отворено ли е в неделя", "store_hours"),
+    ("къде се намира магазина", "store_locations"),
+    ("какъв е адреса на магазина в плевен", "store_locations"),
+    ("мога ли да платя с карта", "payment_methods"),
+    ("какви са начините на плащане", "payment_methods"),
+    ("до колко часа работи онлайн отдела", "online_hours"),
+    ("колко струва доставкта", "delivery_price"),
+    ("работното време на магазините", "store_hours"),
+    ("къде е поръчката ми", None),
+    ("искам да проследя поръчката си", None),
+    ("телефонът е нула осем осем осем", None),
+    ("да", None),
+    ("не благодаря", None),
+    ("здравейте", None),
+    ("имате ли маратонки найки номер четиридесет и две", None),
+    ("искам да говоря с човек", None),
+    ("поръчах вчера и искам да сменя адреса за доставка", None),
+    ("колко струва чифт маратонки адидас", None),
+    ("получих грешен размер какво да правя сега и кой плаща", None),
+]
+
+if __name__ == "__main__":
+    matcher = FAQMatcher(threshold=0)
+    matcher.load()
+    scored = [(matcher.scores(turn)[0], expected) for turn, expected in TURNS]
+    faq_turns = sum(1 for _, expected in TURNS if expected)
+    llm_turns = len(TURNS) - faq_turns
+
+    print(f"{faq_turns} FAQ turns, {llm_turns} LLM turns")
+    print(f"{'threshold':>9s} {'hit rate':>9s} {'wrong entry':>12s} {'false hits':>11s}")
+    for threshold in (0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9):
+        hits = [(entry["id"], expected) for (confidence, entry), expected in scored if confidence >= threshold]
+        correct = sum(1 for found, expected in hits if found == expected)
+        wrong = sum(1 for found, expected in hits if expected and found != expected)
+        false = sum(1 for _, expected in hits if expected is None)
+        print(f"{threshold:9.2f} {correct / faq_turns:9.0%} {wrong:12d} {false:11d}")
+
+    print("\nper turn:")
+    for ((confidence, entry), expected), (turn, _) in zip(scored, TURNS):
+        print(f"  {confidence:.2f} {entry['id']:>22s} {str(expected):>22s}  {turn}")
+
+    timings = []
+    for _ in range(ROUNDS):
+        for turn, _ in TURNS[:4]:
+            started = time.perf_counter()
+            matcher.scores(turn)
+            timings.append(time.perf_counter() - started)
+    p50, p99 = np.percentile(timings, [50, 99]) * 1e6
+    print(f"\nmatch: p50 {p50:.0f} us, p99 {p99:.0f} us")
@@ -0,0 +1,93 @@
+"""
+Build and query cost of the local knowledge index.
+
+Builds the BM25 index of Knowledge.docx into a temporary file and loads
+it again to check that an unchanged document is not rebuilt. Then it
+times search() on caller-style questions: the chat engine runs one
+search per turn, in place of the Assistants file_search round trip.
+Last it checks that return questions, however the verb is inflected,
+get a returns passage first; it exits with 1 if one does not.
+
+Run from the repository root:
+    python benchmarks/bench_knowledge_index.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from config import KNOWLEDGE_DOCX  # noqa: E402
+from knowledge_index import KnowledgeIndex  # noqa: E402
+
+ROUNDS = 2000
+QUESTIONS = [
+    "Колко струва доставката?",
+    "Искам да върна маратонки, какво да направя?",
+    "До кога мога да върна стоката?",
+    "Какво е работното време на магазина в Плевен?",
+    "С кои куриери работите?",
+    "Мога ли да платя на кредит?",
+    "Доставяте ли в чужбина?",
+    "Как да използвам промокод?",
+]
+RETURN_QUESTIONS = [
+    "Искам да върна маратонки",
+    "До кога мога да върна стоката?",
+    "Как става връщането на стока?",
+    "Върнахте ли ми парите за върнатата стока?",
+    "Как да направя замяна на продукт?",
+]
+RETURN_PASSAGES = {
+    "Връщане на стока",
+    "Инструкции за връщане на стока",
+    "Кои са условията за връщане на стока?",
+    "Как да направя връщане или замяна на продукт?",
+    "Как да върна продукт, закупен на кредит?",
+    "На кой адрес да върна артикул, закупен онлайн?",
+    "Кога ще ми бъде възстановена сумата от върнатата стока?",
+}
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp(prefix="bench_knowledge_")
+    try:
+        path = os.path.join(directory, "knowledge.idx")
+        index = KnowledgeIndex(KNOWLEDGE_DOCX, path)
+        started = time.perf_counter()
+        index.load()
+        build_ms = (time.perf_counter() - started) * 1000
+        built_at = os.path.getmtime(path)
+
+        reloaded = KnowledgeIndex(KNOWLEDGE_DOCX, path)
+        started = time.perf_counter()
+        reloaded.load()
+        load_ms = (time.perf_counter() - started) * 1000
+        print(f"{len(index.chunks)} passages, {len(index.vocabulary)} terms, index {os.path.getsize(path)} bytes")
+        print(f"build {build_ms:.1f} ms, load of the unchanged index {load_ms:.1f} ms, "
+              f"rebuilt: {os.path.getmtime(path) != built_at}")
+
+        print(f"\n{'question':>46s} {'p50 us':>7s} {'p99 us':>7s}  top passage")
+        for question in QUESTIONS:
+            timings = []
+            for _ in range(ROUNDS):
+                started = time.perf_counter()
+                results = reloaded.search(question, 3)
+                timings.append(time.perf_counter() - started)
+            p50, p99 = np.percentile(timings, [50, 99]) * 1e6
+            top = results[0][1]["title"] if results else "-"
+            print(f"{question:>46s} {p50:7.1f} {p99:7.1f}  {top}")
+
+        misses = 0
+        print("\nreturn questions, top passage:")
+        for question in RETURN_QUESTIONS:
+            results = reloaded.search(question, 1)
+            top = results[0][1]["title"] if results else "-"
+            ok = top in RETURN_PASSAGES
+            misses += not ok
+            print(f"{'ok  ' if ok else 'MISS'} {question:>46s}  {top}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    sys.exit(1 if misses else 0)
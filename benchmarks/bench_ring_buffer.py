@@ -0,0 +1,88 @@
+"""
+Cost of the ingest chunker: the per-packet Queue plus bytearray slicing it
+replaced in MediaReceiver against FrameRingBuffer, and the memory each one
+holds after the consumer stalls for a minute of audio.
+
+Run from the repository root:
+    python benchmarks/bench_ring_buffer.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from queue import Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ring_buffer import FrameRingBuffer  # noqa: E402
+
+PACKET = bytes(range(160))  # 20 ms of G.711
+CHUNK_SIZE = 1920  # 240 ms
+PACKETS = 30000  # 10 minutes of audio
+STALL_PACKETS = 3000  # 60 s without the consumer
+
+
+def legacy_chunker(packets):
+    audio_queue = Queue()
+    buffer = bytearray()
+    chunks = 0
+    for packet in packets:
+        audio_queue.put(packet)
+        buffer.extend(audio_queue.get())
+        while len(buffer) >= CHUNK_SIZE:
+            chunk = bytes(buffer[:CHUNK_SIZE])
+            buffer = buffer[CHUNK_SIZE:]
+            chunks += len(chunk) > 0
+    return chunks
+
+
+def ring_chunker(packets):
+    ring = FrameRingBuffer(CHUNK_SIZE, 21)
+    chunks = 0
+    for packet in packets:
+        ring.write(packet)
+        while ring.write_pos - ring.read_pos >= CHUNK_SIZE:
+            chunk = ring.read_frame(timeout=0)
+            chunks += len(chunk) > 0
+            ring.release_frame()
+    return chunks
+
+
+def stalled_bytes(fill):
+    tracemalloc.start()
+    keep = fill()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return held
+
+
+def legacy_stall():
+    audio_queue = Queue()
+    for _ in range(STALL_PACKETS):
+        audio_queue.put(bytes(memoryview(PACKET)))  # the jitter buffer hands over fresh bytes per packet
+    return audio_queue
+
+
+def ring_stall():
+    ring = FrameRingBuffer(CHUNK_SIZE, 21)
+    for _ in range(STALL_PACKETS):
+        ring.write(PACKET)
+    return ring
+
+
+def main():
+    packets = [PACKET] * PACKETS
+    for name, fn in (("queue + bytearray", legacy_chunker), ("ring buffer", ring_chunker)):
+        start = time.perf_counter()
+        chunks = fn(packets)
+        elapsed = time.perf_counter() - start
+        print(f"{name:18s} {elapsed / PACKETS * 1e6:6.2f} us/packet  {chunks} chunks")
+
+    print(f"after a {STALL_PACKETS * 20 // 1000} s consumer stall:")
+    print(f"  queue + bytearray holds {stalled_bytes(legacy_stall):8d} B")
+    print(f"  ring buffer holds       {stalled_bytes(ring_stall):8d} B (5 s capacity, oldest dropped)")
+
+
+if __name__ == "__main__":
+    main()
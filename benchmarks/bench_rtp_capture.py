@@ -0,0 +1,77 @@
+"""
+Per-packet CPU cost of the old scapy sniff() path vs the shared capture engine.
+
+Both paths get the same synthetic Ethernet/IPv4/UDP/RTP frames (20 ms of
+G.711, 160 byte payload). The scapy path is the per-packet callback that
+MediaReceiver.run used with sniff(); the engine path is the offset parser
+plus payload slice that RTPCaptureEngine runs for every ring frame.
+
+Run from the repository root:
+    python benchmarks/bench_rtp_capture.py
+"""
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scapy.all import Ether, IP, UDP  # noqa: E402
+from rtp_capture import parse_udp_packet, RTP_HEADER_SIZE  # noqa: E402
+
+PACKETS = 20000
+DST_PORT = 12000
+ETHERNET_HEADER_SIZE = 14
+
+
+def build_frame(seq: int) -> bytes:
+    payload = bytes((seq + i) & 0xFF for i in range(160))
+    rtp = struct.pack("!BBHII", 0x80, 0, seq & 0xFFFF, seq * 160, 0x1234) + payload
+    udp = struct.pack("!HHHH", 40000, DST_PORT, 8 + len(rtp), 0) + rtp
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), seq & 0xFFFF, 0, 64, 17, 0,
+                     bytes([46, 19, 210, 22]), bytes([10, 0, 0, 1])) + udp
+    return b"\x00" * 12 + b"\x08\x00" + ip
+
+
+def scapy_path(frames):
+    out = []
+    for frame in frames:
+        packet = Ether(frame)
+        if packet.haslayer(IP) and packet.haslayer(UDP):
+            if packet[UDP].dport == DST_PORT:
+                out.append(bytes(packet[UDP].payload)[RTP_HEADER_SIZE:])
+    return out
+
+
+def engine_path(frames):
+    out = []
+    for frame in frames:
+        view = memoryview(frame)
+        parsed = parse_udp_packet(view, ETHERNET_HEADER_SIZE, len(frame) - ETHERNET_HEADER_SIZE)
+        if parsed and parsed[0] == DST_PORT:
+            out.append(bytes(view[parsed[1] + RTP_HEADER_SIZE:parsed[2]]))
+    return out
+
+
+def measure(name, fn, frames):
+    start = time.process_time()
+    result = fn(frames)
+    elapsed = time.process_time() - start
+    per_packet_us = elapsed / len(frames) * 1e6
+    print(f"{name:<8} {per_packet_us:8.2f} us/packet  {len(frames) / elapsed:12.0f} packets/s")
+    return result, per_packet_us
+
+
+def main():
+    frames = [build_frame(seq) for seq in range(PACKETS)]
+    # scapy is orders of magnitude slower, a tenth of the packets is plenty
+    scapy_result, scapy_cost = measure("scapy", scapy_path, frames[:PACKETS // 10])
+    engine_result, engine_cost = measure("engine", engine_path, frames)
+    assert scapy_result == engine_result[:len(scapy_result)], "payload mismatch between paths"
+    print(f"speedup  {scapy_cost / engine_cost:8.1f}x")
+    # 30 calls at 50 packets/s each
+    print(f"CPU at 30 calls: scapy {scapy_cost * 1500 / 1e4:.2f}%  engine {engine_cost * 1500 / 1e4:.2f}% of one core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Streaming TTS playback over RTP against the file path, with a fake TTS
+generator and a local RTP sink.
+
+The fake TTS produces an answer of SENTENCES sentences the way the
+ElevenLabs stream does: the first bytes after FIRST_BYTE_SECONDS, then
+CHUNK_MS chunks faster than real time. In "file" mode playback of a
+sentence can only start once the whole sentence was downloaded and
+written; in "rtp" mode RTPStreamSender starts sending with the first
+chunk. The sink records every packet and checks pacing (inter-arrival
+around 20 ms), sequence and timestamp continuity, and how fast a
+flush() (barge-in) silences the stream.
+
+Run from the repository root:
+    python benchmarks/bench_rtp_stream.py
+"""
+import math
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from rtp_sender import RTPStreamSender  # noqa: E402
+from tts_handler import write_wav  # noqa: E402
+
+SENTENCES = 3
+SENTENCE_SECONDS = 2.0
+FIRST_BYTE_SECONDS = 0.25
+CHUNK_MS = 100
+SPEEDUP = 4.0  # fake TTS produces audio this many times faster than real time
+
+
+def fake_tts(seconds: float = SENTENCE_SECONDS, frequency: float = 440.0):
+    """PCM chunks of a tone, paced like a streaming TTS response. Chunks have odd lengths on purpose."""
+    samples = np.arange(int(seconds * 8000))
+    pcm = (6000 * np.sin(2 * math.pi * frequency * samples / 8000)).astype(np.int16).tobytes()
+    time.sleep(FIRST_BYTE_SECONDS)
+    step = 16 * CHUNK_MS + 1
+    for offset in range(0, len(pcm), step):
+        yield pcm[offset:offset + step]
+        time.sleep(CHUNK_MS / 1000 / SPEEDUP)
+
+
+class RTPSink:
+    """Local UDP socket that records (arrival, seq, timestamp, marker) of every RTP packet."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.address = self.sock.getsockname()
+        self.packets = []
+        self.stop_flag = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_flag:
+            try:
+                data = self.sock.recv(2048)
+            except socket.timeout:
+                continue
+            _, second, seq, ts, _ = struct.unpack("!BBHII", data[:12])
+            self.packets.append((time.monotonic(), seq, ts, bool(second & 0x80), len(data) - 12))
+
+    def close(self):
+        self.stop_flag = True
+        self.thread.join()
+        self.sock.close()
+
+
+def file_mode(sentences: int) -> list:
+    """
+    Seconds from the request to when each sentence starts playing: once
+    its WAV is written and the sentence before it has finished.
+    """
+    ready = []
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(sentences):
+            pcm = b"".join(fake_tts())
+            write_wav(os.path.join(directory, f"{i}.wav"), pcm)
+            ready.append(time.monotonic() - started)
+    starts = []
+    for at in ready:
+        starts.append(max(at, starts[-1] + SENTENCE_SECONDS) if starts else at)
+    return starts
+
+
+def rtp_mode(sentences: int):
+    sink = RTPSink()
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = RTPStreamSender(out, lambda: sink.address)
+    started = time.monotonic()
+    first_packet = []
+    for i in range(sentences):
+        first = True
+        for chunk in fake_tts():
+            sender.feed(chunk, on_start=(lambda: first_packet.append(time.monotonic() - started)) if first else None)
+            first = False
+    while not sender.is_idle():
+        time.sleep(0.01)
+    time.sleep(0.1)
+    sender.stop()
+    sink.close()
+    out.close()
+    return first_packet, sink.packets
+
+
+def flush_latency(trials: int = 5) -> list:
+    """Seconds from flush() to the last packet of the flushed audio reaching the sink."""
+    latencies = []
+    for _ in range(trials):
+        sink = RTPSink()
+        out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender = RTPStreamSender(out, lambda: sink.address)
+        sender.feed(bytes(16000 * 5))
+        time.sleep(0.5)
+        flushed_at = time.monotonic()
+        sender.flush()
+        time.sleep(0.2)
+        latencies.append(max(0.0, sink.packets[-1][0] - flushed_at))
+        sender.stop()
+        sink.close()
+        out.close()
+    return latencies
+
+
+if __name__ == "__main__":
+    audio_seconds = SENTENCES * SENTENCE_SECONDS
+    print(f"{SENTENCES} sentences of {SENTENCE_SECONDS} s, first byte after {FIRST_BYTE_SECONDS * 1000:.0f} ms, "
+          f"TTS {SPEEDUP:.0f}x real time")
+
+    file_starts = file_mode(SENTENCES)
+    first_packet, packets = rtp_mode(SENTENCES)
+    print(f"{'sentence':>8s} {'file plays at ms':>17s} {'rtp plays at ms':>16s}")
+    for i, (file_at, rtp_at) in enumerate(zip(file_starts, first_packet)):
+        print(f"{i + 1:8d} {file_at * 1000:17.0f} {rtp_at * 1000:16.0f}")
+
+    arrivals = np.array([p[0] for p in packets])
+    gaps = np.diff(arrivals) * 1000
+    seqs = np.array([p[1] for p in packets], dtype=np.int64)
+    stamps = np.array([p[2] for p in packets], dtype=np.int64)
+    markers = sum(p[3] for p in packets)
+    print(f"packets {len(packets)} ({len(packets) * 0.02:.2f} s of audio for {audio_seconds:.2f} s fed), "
+          f"talkspurts {markers}")
+    print(f"inter-arrival ms: mean {gaps.mean():.2f} p50 {np.percentile(gaps, 50):.2f} "
+          f"p99 {np.percentile(gaps, 99):.2f} max {gaps.max():.2f}")
+    drift = (arrivals[-1] - arrivals[0]) - (len(packets) - 1) * 0.02
+    print(f"schedule drift over the stream: {drift * 1000:.2f} ms")
+    print(f"sequence gaps: {int(np.sum(np.diff(seqs) % 65536 != 1))}, "
+          f"timestamp steps other than 160: {int(np.sum(np.diff(stamps) % (1 << 32) != 160))}")
+
+    latencies = flush_latency()
+    print(f"flush to last packet ms: max {max(latencies) * 1000:.2f} "
+          f"mean {sum(latencies) / len(latencies) * 1000:.2f}")
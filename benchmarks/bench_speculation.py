@@ -0,0 +1,137 @@
+"""
+Turn latency with and without speculative replies.
+
+Replays a Deepgram timeline against ConversationHandler on the chat
+backend, with tools/mock_llm_server.py standing in for OpenAI (LATENCY
+to the first byte):
+    t=0                      the caller stops talking
+    t=INTERIM_SECONDS        interim result with the whole question
+    t=SPEECH_FINAL_SECONDS   is_final + speech_final (endpointing 800 ms)
+It measures how long after speech_final the first sentence reaches TTS,
+with SPECULATIVE_GENERATION off and on. A second scenario has the
+caller go on talking after a pause that looked like the end of the
+question: that draft must be discarded, and its tokens show up as
+wasted. A third asks about an order: the draft says a sentence and
+calls track_order. The committed draft's tool call runs and the turn
+goes on from it: the sentence is spoken once and kept in the history.
+
+Run from the repository root:
+    python benchmarks/bench_speculation.py
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+os.environ["LLM_BACKEND"] = "chat"
+os.environ["SPECULATIVE_GENERATION"] = "true"
+
+import numpy as np  # noqa: E402
+import openai  # noqa: E402
+import conversation_handler  # noqa: E402
+import speculation  # noqa: E402
+from tools.mock_llm_server import MockLLM  # noqa: E402
+
+for name in ("openai", "httpx", "httpcore"):
+    logging.getLogger(name).setLevel(logging.WARNING)
+
+LATENCY = 0.35
+INTERIM_SECONDS = 0.25
+SPEECH_FINAL_SECONDS = 0.9
+TURNS = 5
+QUESTION = "Имате ли маратонки Найк в размер четиридесет и две?"
+ORDER_QUESTION = "Къде е моята поръчка с номер 0888123456?"
+PREAMBLE = "Един момент, ще проверя."
+
+
+class RecordingTTS:
+    channel_id = "bench"
+
+    def __init__(self):
+        self.sentences = []
+        self.prefetched = []
+
+    def synthesize_and_play(self, text, trace=None):
+        self.sentences.append((time.monotonic(), text))
+
+    def prefetch(self, text, on_synthesized=None):
+        self.prefetched.append(text)
+
+    def play_thinking_sound(self):
+        pass
+
+    def clear_queue(self):
+        pass
+
+
+def new_handler(client, speculative: bool):
+    conversation_handler.SPECULATIVE_GENERATION = speculative
+    handler = conversation_handler.ConversationHandler(None, "359888123456", RecordingTTS())
+    handler.chat_engine.client = client
+    handler.chat_engine.knowledge = None
+    return handler
+
+
+def turn(handler, kept_talking: bool = False, question: str = QUESTION) -> float:
+    """One caller turn on the timeline above, returns ms from speech_final to the first sentence."""
+    handler.tts_handler.sentences.clear()
+    started = time.monotonic()
+    time.sleep(INTERIM_SECONDS)
+    handler.speculate(question)
+    if kept_talking:
+        time.sleep(0.3)
+        handler.speculate(QUESTION + " И колко")  # the caller goes on, the draft is dropped
+        time.sleep(0.3)
+        handler.handle_transcript(QUESTION + " И колко струват?", time.time())
+    else:
+        time.sleep(SPEECH_FINAL_SECONDS - INTERIM_SECONDS)
+        handler.handle_transcript(question, time.time())
+    confirmed = time.monotonic()
+    handler.generate_and_stream(time.time())
+    first = handler.tts_handler.sentences[0][0]
+    assert first >= started
+    return (first - confirmed) * 1000
+
+
+def count(metric, *key) -> float:
+    return metric.values.get(key, 0)
+
+
+if __name__ == "__main__":
+    mock = MockLLM(LATENCY, 0.01, tool_preamble=PREAMBLE)
+    server = mock.serve()
+    client = openai.OpenAI(api_key="mock", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+    print(f"mock LLM {LATENCY * 1000:.0f} ms to first byte, interim at {INTERIM_SECONDS * 1000:.0f} ms, "
+          f"speech_final at {SPEECH_FINAL_SECONDS * 1000:.0f} ms after the caller stops")
+
+    for speculative in (False, True):
+        handler = new_handler(client, speculative)
+        timings = [turn(handler) for _ in range(TURNS)]
+        label = "speculative" if speculative else "baseline"
+        print(f"{label:>12s}: first sentence {np.median(timings):5.0f} ms after speech_final "
+              f"(median of {TURNS}), history {len(handler.chat_engine.history)} messages")
+
+    handler = new_handler(client, True)
+    requests_before = len(mock.requests)
+    elapsed = turn(handler, kept_talking=True)
+    time.sleep(LATENCY + 0.5)  # let the dropped draft stop and book its tokens
+    print(f"caller kept talking: first sentence {elapsed:.0f} ms after speech_final, "
+          f"{len(mock.requests) - requests_before} requests")
+    handler = new_handler(client, True)
+    requests_before = len(mock.requests)
+    elapsed = turn(handler, question=ORDER_QUESTION)
+    spoken = [text for _, text in handler.tts_handler.sentences].count(PREAMBLE)
+    roles = [message["role"] for message in handler.chat_engine.history]
+    kept = handler.chat_engine.history[1]["content"] == PREAMBLE
+    print(f"order question: first sentence {elapsed:.0f} ms after speech_final, "
+          f"{len(mock.requests) - requests_before} requests, preamble spoken {spoken}x, "
+          f"kept in history: {kept}, history {roles}")
+
+    print(f"speculations: {count(speculation.speculations, 'committed'):.0f} committed, "
+          f"{count(speculation.speculations, 'discarded'):.0f} discarded, "
+          f"{count(speculation.speculations, 'tool_call'):.0f} tool_call; wasted tokens "
+          f"{count(speculation.wasted_tokens, 'prompt'):.0f} prompt, "
+          f"{count(speculation.wasted_tokens, 'completion'):.0f} completion")
+    server.shutdown()
@@ -0,0 +1,100 @@
+"""
+TTS cache behaviour on a call-like sentence workload.
+
+Sentences are drawn from a Zipf distribution (a few greetings and
+confirmations dominate, a long tail is said once) and looked up by
+CALLS concurrent callers; a miss runs a fake synthesis of
+SYNTH_SECONDS. Reports the hit rate by tier, how many syntheses ran
+against how many distinct sentences were missed (concurrent misses of a
+sentence must synthesize it once), the lookup latency per tier, and the
+hit rate after a restart, which the old hash() keys always missed.
+
+Run from the repository root:
+    python benchmarks/bench_tts_cache.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from tts_cache import TTSCache, cache_key, cache_requests  # noqa: E402
+
+SENTENCES = 400
+LOOKUPS = 4000
+CALLS = 16
+SYNTH_SECONDS = 0.02
+PCM = bytes(16000 * 2)  # 2 s sentence
+
+
+def workload(seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, LOOKUPS), SENTENCES)
+    return [f"Изречение номер {rank}." for rank in ranks]
+
+
+def run(cache: TTSCache, texts: list) -> dict:
+    syntheses = []
+    latencies = {"hit": [], "miss": []}
+    lock = threading.Lock()
+
+    def caller(part):
+        for text in part:
+            key = cache_key(text)
+            started = time.perf_counter()
+            pcm = cache.acquire(key)
+            if pcm is None:
+                time.sleep(SYNTH_SECONDS)
+                cache.put(key, PCM, text)
+                with lock:
+                    syntheses.append(key)
+                    latencies["miss"].append(time.perf_counter() - started)
+            else:
+                with lock:
+                    latencies["hit"].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=caller, args=(texts[i::CALLS],)) for i in range(CALLS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"syntheses": syntheses, "latencies": latencies}
+
+
+def outcomes() -> dict:
+    return {key[0]: value for key, value in cache_requests.values.items()}
+
+
+def report(title: str, before: dict, result: dict) -> None:
+    after = outcomes()
+    counts = {name: after.get(name, 0) - before.get(name, 0) for name in ("memory", "disk", "coalesced", "miss")}
+    total = sum(counts.values())
+    hits = total - counts["miss"]
+    print(f"{title}: hit rate {hits / total:.1%} "
+          + " ".join(f"{name} {count:.0f}" for name, count in counts.items())
+          + f", syntheses {len(result['syntheses'])} for {len(set(result['syntheses']))} sentences")
+    for tier, values in result["latencies"].items():
+        if values:
+            print(f"  {tier:5s} p50 {np.percentile(values, 50) * 1000:.3f} ms p99 {np.percentile(values, 99) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    texts = workload()
+    print(f"{LOOKUPS} lookups of {len(set(texts))} distinct sentences by {CALLS} concurrent calls")
+    with tempfile.TemporaryDirectory() as directory:
+        before = outcomes()
+        report("cold", before, run(TTSCache(directory), texts))
+
+        # a new process: empty memory tier, same files and index
+        before = outcomes()
+        report("after restart", before, run(TTSCache(directory), workload(seed=1)))
+
+        # a cache limited to 50 sentences keeps the frequent ones
+        before = outcomes()
+        small = TTSCache(directory, max_bytes=50 * (len(PCM) + 44), memory_bytes=10 * len(PCM))
+        report("50-sentence limit", before, run(small, workload(seed=2)))
+        files = len([name for name in os.listdir(directory) if name.endswith(".wav")])
+        print(f"  {files} WAV files left on disk")
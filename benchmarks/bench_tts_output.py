@@ -0,0 +1,95 @@
+"""
+Per-sentence cost of the TTS output stage for each file format, and what
+Asterisk spends playing the file into a G.711 u-law call.
+
+Post-processing is gain and clip plus writing the file: the old path
+scaled in float64 and wrote a WAV, the new one applies the gain in place
+in integer arithmetic and writes the format directly, encoding G.711
+through a lookup table.
+
+Asterisk reads the file 20 ms at a time; a .wav or .sln file holds
+16-bit linear audio that it has to translate to u-law for every frame of
+every playback, a .ulaw file is passed through, a .alaw file goes
+through a-law -> linear -> u-law. The translation is measured with
+audioop's C codecs (table driven like Asterisk's translators), so the
+numbers are an estimate of the Asterisk side, not a measurement of it.
+
+Run from the repository root:
+    python benchmarks/bench_tts_output.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from benchmarks import fixtures  # noqa: E402
+from tts_cache import write_sound, write_wav, SOUND_FORMATS  # noqa: E402
+from tts_handler import boost_volume  # noqa: E402
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop  # noqa: E402
+
+ROUNDS = 200
+FRAME_SAMPLES = 160
+CONCURRENT_PLAYBACKS = 100
+
+
+def old_postprocess(pcm: bytes, path: str) -> None:
+    """The float64 path this stage replaces."""
+    audio_array = np.frombuffer(pcm, dtype=np.int16)
+    write_wav(path, np.clip(audio_array * 2.0, -32768, 32767).astype(np.int16).tobytes())
+
+
+def new_postprocess(pcm: bytes, path: str, sound_format: str) -> None:
+    write_sound(path, boost_volume(pcm), sound_format)
+
+
+def asterisk_playback(path: str, sound_format: str) -> None:
+    """Read the file 20 ms at a time and produce u-law frames for the channel."""
+    with open(path, "rb") as f:
+        if sound_format == "wav":
+            f.read(44)
+        if sound_format == "ulaw":
+            while f.read(FRAME_SAMPLES):
+                pass
+        elif sound_format == "alaw":
+            while frame := f.read(FRAME_SAMPLES):
+                audioop.lin2ulaw(audioop.alaw2lin(frame, 2), 2)
+        else:
+            while frame := f.read(2 * FRAME_SAMPLES):
+                audioop.lin2ulaw(frame, 2)
+
+
+def per_call_us(function, *args) -> float:
+    for _ in range(10):
+        function(*args)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - started) / ROUNDS * 1e6
+
+
+if __name__ == "__main__":
+    pcm = fixtures.tts_pcm()
+    seconds = len(pcm) / 2 / 8000
+    directory = tempfile.mkdtemp(prefix="bench_tts_output_")
+    try:
+        print(f"{seconds:.1f} s sentence, u-law channel, Asterisk CPU for {CONCURRENT_PLAYBACKS} concurrent playbacks")
+        print(f"{'path':>14s} {'postprocess us':>15s} {'file bytes':>11s} {'asterisk us':>12s} {'asterisk CPU':>13s}")
+        rows = [("float64 wav", "wav", lambda path: old_postprocess(pcm, path))]
+        rows += [(f"int16 {name}", name, lambda path, name=name: new_postprocess(pcm, path, name))
+                 for name in SOUND_FORMATS]
+        for label, sound_format, postprocess in rows:
+            path = os.path.join(directory, f"sentence.{sound_format}")
+            post_us = per_call_us(postprocess, path)
+            play_us = per_call_us(asterisk_playback, path, sound_format)
+            cpu = play_us / 1e6 / seconds * CONCURRENT_PLAYBACKS
+            print(f"{label:>14s} {post_us:15.1f} {os.path.getsize(path):11d} {play_us:12.1f} {cpu:12.2%}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
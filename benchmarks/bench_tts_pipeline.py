@@ -0,0 +1,110 @@
+"""
+Turn time with sentences synthesized one by one on the LLM stream
+against the per-call synthesis pipeline of TTSHandler.
+
+A fake LLM emits SENTENCES sentences, one every LLM_SENTENCE_SECONDS; a
+fake ElevenLabs takes TTS_SECONDS per sentence. Before the pipeline the
+LLM stream stopped while each sentence was synthesized, so the last
+sentence was ready after about the sum of both; with the pipeline it
+should be close to max(LLM, TTS). The benchmark also checks that the
+sentences reach playback in order and that clear_queue() (barge-in)
+drops everything still synthesizing.
+
+Run from the repository root:
+    python benchmarks/bench_tts_pipeline.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TTS_SOUNDS_DIR"] = tempfile.mkdtemp(prefix="tts-bench-")  # empty cache, every sentence a miss
+
+import tts_handler  # noqa: E402
+
+SENTENCES = 6
+LLM_SENTENCE_SECONDS = 0.25
+TTS_SECONDS = 0.6
+PCM = bytes(8000 * 2)
+
+
+class FakeTextToSpeech:
+    def convert(self, **kwargs):
+        time.sleep(TTS_SECONDS)
+        yield PCM
+
+
+class FakeClient:
+    text_to_speech = FakeTextToSpeech()
+
+
+class RecordingTTSHandler(tts_handler.TTSHandler):
+    """Records what reaches the playback queue instead of playing it through ARI."""
+
+    def __init__(self):
+        self.played = []
+        super().__init__("bench")
+        self.client = FakeClient()
+
+    def _enqueue(self, base_name, trace=None):
+        self.played.append((time.monotonic(), base_name))
+
+
+def sentences(turn: int) -> list:
+    return [f"Ход {turn}, изречение {i}." for i in range(SENTENCES)]
+
+
+def sequential(turn: int) -> float:
+    """The old path: every sentence synthesized on the LLM stream before the next token is read."""
+    started = time.monotonic()
+    for text in sentences(turn):
+        time.sleep(LLM_SENTENCE_SECONDS)
+        tts_handler.synthesize(text, FakeClient())
+    return time.monotonic() - started
+
+
+def pipelined(turn: int):
+    handler = RecordingTTSHandler()
+    handler.played.clear()  # start_message
+    texts = sentences(turn)
+    started = time.monotonic()
+    for text in texts:
+        time.sleep(LLM_SENTENCE_SECONDS)
+        handler.synthesize_and_play(text)
+    while len(handler.played) < len(texts):
+        time.sleep(0.005)
+    elapsed = handler.played[-1][0] - started
+    in_order = [name for _, name in handler.played] == [
+        tts_handler.tts_cache.base_name(tts_handler.cache_key(text)) for text in texts
+    ]
+    handler.stop()
+    return elapsed, in_order
+
+
+def barge_in(turn: int) -> int:
+    """Sentences that still reach playback after clear_queue() with the whole turn in flight."""
+    handler = RecordingTTSHandler()
+    for text in sentences(turn):
+        handler.synthesize_and_play(text)
+    time.sleep(0.05)
+    handler.played.clear()
+    handler.clear_queue()
+    time.sleep(TTS_SECONDS * SENTENCES)
+    handler.stop()
+    return len(handler.played)
+
+
+if __name__ == "__main__":
+    llm = SENTENCES * LLM_SENTENCE_SECONDS
+    tts = SENTENCES * TTS_SECONDS
+    workers = tts_handler.TTS_PIPELINE_WORKERS
+    print(f"{SENTENCES} sentences, LLM {LLM_SENTENCE_SECONDS * 1000:.0f} ms and TTS {TTS_SECONDS * 1000:.0f} ms "
+          f"per sentence, {workers} synthesis workers")
+    print(f"LLM alone {llm:.2f} s, TTS alone {tts:.2f} s, TTS over {workers} workers {tts / workers:.2f} s")
+    print(f"sequential: last sentence ready after {sequential(0):.2f} s")
+    elapsed, in_order = pipelined(1)
+    print(f"pipelined:  last sentence ready after {elapsed:.2f} s, playback in order: {in_order}")
+    print(f"sentences played after barge-in: {barge_in(2)}")
+    shutil.rmtree(os.environ["TTS_SOUNDS_DIR"], ignore_errors=True)
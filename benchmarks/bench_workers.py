@@ -0,0 +1,71 @@
+"""
+Throughput of the per-call ingest DSP chain when calls are spread over
+threads of one process against worker processes, as in WORKER_PROCESSES
+mode.
+
+Each of CALLS simulated calls runs FRAMES_PER_CALL 240 ms frames through
+decode, high-pass, noise suppression, the voice gate and AGC. Threads
+share one GIL; worker processes each have their own, so their throughput
+should grow with the number of cores until the cores run out.
+
+Run from the repository root:
+    python benchmarks/bench_workers.py
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_dsp_scheduler import PerCallChain, call_frames  # noqa: E402
+
+CALLS = 32
+FRAMES_PER_CALL = 40
+
+
+def run_calls(calls: int, seed: int = 0) -> int:
+    """Process every frame of `calls` calls, returns the number of frames."""
+    frames = call_frames(calls, seed)[:FRAMES_PER_CALL]
+    chains = [PerCallChain() for _ in range(calls)]
+    for tick in frames:
+        for chain, raw in zip(chains, tick):
+            chain.process(raw.tobytes())
+    return calls * len(frames)
+
+
+def split(total: int, parts: int) -> list:
+    return [total // parts + (i < total % parts) for i in range(parts)]
+
+
+def with_threads(parts: int) -> float:
+    threads = [threading.Thread(target=run_calls, args=(calls, i)) for i, calls in enumerate(split(CALLS, parts))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return CALLS * FRAMES_PER_CALL / (time.perf_counter() - started)
+
+
+def with_processes(parts: int) -> float:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(parts) as pool:
+        pool.map(run_calls, [1] * parts)  # start and import before timing
+        started = time.perf_counter()
+        frames = sum(pool.starmap(run_calls, list(zip(split(CALLS, parts), range(parts)))))
+        return frames / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cores, 2 * cores} - {0})
+    print(f"{CALLS} calls x {FRAMES_PER_CALL} frames of 240 ms, {cores} cores")
+    print(f"{'parts':>5s} {'threads fr/s':>13s} {'processes fr/s':>15s} {'process speedup':>16s}")
+    single = None
+    for parts in counts:
+        threaded = with_threads(parts)
+        processed = with_processes(parts)
+        single = single or processed
+        print(f"{parts:5d} {threaded:13.0f} {processed:15.0f} {processed / single:15.2f}x")
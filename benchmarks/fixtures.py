@@ -0,0 +1,113 @@
+"""
+Reproducible inputs for the benchmark suite.
+
+Synthetic inputs are generated from fixed seeds. Recorded and canned
+inputs live in benchmarks/fixtures/:
+
+    call_ulaw.rtpdump       10 s of G.711 RTP recorded over loopback from
+                            tools/rtp_generator.py with 1% loss and 2% reordering
+    deepgram_results.jsonl  live transcription messages as Deepgram sends them,
+                            interim results through speech_final
+    openai_deltas.json      assistant replies cut into the text deltas an
+                            Assistants run stream delivers
+
+Re-record the RTP capture with:
+    python benchmarks/fixtures.py --record
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.rtp_generator import RTPGenerator, linear_to_ulaw, SAMPLE_RATE, SAMPLES_PER_PACKET  # noqa: E402
+from tools.rtp_recorder import read_rtpdump, record, write_rtpdump  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDED_RTP = os.path.join(FIXTURES_DIR, "call_ulaw.rtpdump")
+DEEPGRAM_RESULTS = os.path.join(FIXTURES_DIR, "deepgram_results.jsonl")
+OPENAI_DELTAS = os.path.join(FIXTURES_DIR, "openai_deltas.json")
+
+_ulaw_table = None
+
+
+def ulaw_encode(pcm: np.ndarray) -> bytes:
+    """Encode int16 samples as G.711 mu-law through a 64k-entry table."""
+    global _ulaw_table
+    if _ulaw_table is None:
+        _ulaw_table = np.array([linear_to_ulaw(sample) for sample in range(-32768, 32768)], dtype=np.uint8)
+    return _ulaw_table[pcm.astype(np.int32) + 32768].tobytes()
+
+
+def speech_like_pcm(seconds: float, seed: int = 0) -> np.ndarray:
+    """Line noise with a harmonic, amplitude-modulated voice talking every other 2 s."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 10))
+    voice *= 2000 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)) * (t % 4 < 2)
+    return np.clip(voice + rng.normal(0, 150, len(t)), -32768, 32767).astype(np.int16)
+
+
+def synthetic_rtp(seconds: float = 10, seed: int = 0) -> list:
+    """In-order 20 ms PCMU RTP datagrams of speech_like_pcm()."""
+    generator = RTPGenerator("127.0.0.1", 9)
+    generator.sock.close()
+    payload = ulaw_encode(speech_like_pcm(seconds, seed))
+    packets = []
+    for seq, start in enumerate(range(0, len(payload), SAMPLES_PER_PACKET)):
+        packets.append(generator.build_packet(seq, start, payload[start:start + SAMPLES_PER_PACKET], marker=seq == 0))
+    return packets
+
+
+def recorded_rtp() -> list:
+    """(seconds since the first packet, datagram) pairs of the recorded call."""
+    return read_rtpdump(RECORDED_RTP)
+
+
+def deepgram_results() -> list:
+    """Raw Deepgram live messages, one JSON string each."""
+    with open(DEEPGRAM_RESULTS, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def openai_delta_streams() -> list:
+    """One list of text deltas per assistant reply."""
+    with open(OPENAI_DELTAS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def tts_pcm(seconds: float = 3, seed: int = 1) -> bytes:
+    """16-bit 8 kHz PCM the size of one synthesized sentence."""
+    return (speech_like_pcm(seconds, seed) // 2).astype(np.int16).tobytes()
+
+
+def record_fixture(seconds: float = 10) -> None:
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    random.seed(0)  # the generator draws loss and reordering from the random module
+    generator = RTPGenerator("127.0.0.1", port, loss=0.01, reorder=0.02)
+    threading.Timer(0.2, generator.start, args=(seconds,)).start()
+    packets = record(port, seconds + 0.5, host="127.0.0.1")
+    generator.stop()
+    write_rtpdump(RECORDED_RTP, packets, ("127.0.0.1", port))
+    print(f"Recorded {len(packets)} packets to {RECORDED_RTP}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="re-record the RTP fixture over loopback")
+    args = parser.parse_args()
+    if args.record:
+        record_fixture()
+    else:
+        print(f"{len(synthetic_rtp())} synthetic RTP packets, {len(recorded_rtp())} recorded, "
+              f"{len(deepgram_results())} Deepgram results, {len(openai_delta_streams())} OpenAI streams")
@@ -0,0 +1,107 @@
+"""
+Timing and allocation measurement for the benchmark suite, and the
+comparison against the stored baseline.
+"""
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+
+class Stage:
+    """
+    One benchmarked stage: `run(item)` is a single operation, called on the
+    items in turn. `setup()` returns the items and may build state the
+    operation needs; it runs outside the timing.
+    """
+
+    def __init__(self, name: str, setup, run, ops: int = 2000, unit: str = "op"):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.ops = ops
+        self.unit = unit
+
+
+def measure(stage: Stage, ops=None, rounds: int = 5, warmup: int = 50, alloc_samples: int = 50) -> dict:
+    """
+    Time stage.run() per operation, returns ops/s, p50/p99 and allocation
+    per operation. The operations are split into `rounds`; ops/s and p50
+    come from the best round so a burst of load elsewhere on the machine
+    does not read as a regression, p99 is taken over all operations.
+    """
+    items = stage.setup()
+    ops = ops or stage.ops
+    per_round = max(1, ops // rounds)
+    run = stage.run
+    for i in range(warmup):
+        run(items[i % len(items)])
+
+    timings = np.empty((rounds, per_round), dtype=np.int64)
+    clock = time.perf_counter_ns
+    for r in range(rounds):
+        for i in range(per_round):
+            started = clock()
+            run(items[i % len(items)])
+            timings[r, i] = clock() - started
+
+    # separate pass, tracemalloc slows every allocation down
+    peaks = []
+    retained = 0
+    tracemalloc.start()
+    try:
+        for i in range(alloc_samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run(items[i % len(items)])
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "unit": stage.unit,
+        "ops_per_sec": round(per_round / (timings.sum(axis=1).min() / 1e9), 1),
+        "p50_us": round(float(np.median(timings, axis=1).min()) / 1000, 2),
+        "p99_us": round(float(np.percentile(timings, 99)) / 1000, 2),
+        "alloc_peak_bytes": int(np.median(peaks)),
+        "alloc_retained_bytes": retained // alloc_samples,
+    }
+
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Stages whose median time per operation grew by more than `tolerance`
+    (0.3 = 30%) over the baseline, or that allocate more than (1 + tolerance)
+    times the baseline peak plus 1 KiB of slack. The median is compared
+    rather than ops/s, which a few slow outliers (GC, disk) can swing.
+    """
+    found = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result["p50_us"] > expected["p50_us"] * (1 + tolerance):
+            found.append(f"{name}: p50 {result['p50_us']:.1f} us per {result['unit']}, baseline "
+                         f"{expected['p50_us']:.1f} us ({result['p50_us'] / expected['p50_us'] - 1:+.0%})")
+        ceiling = expected["alloc_peak_bytes"] * (1 + tolerance) + 1024
+        if result["alloc_peak_bytes"] > ceiling:
+            found.append(f"{name}: allocates {result['alloc_peak_bytes']} B per {result['unit']}, "
+                         f"baseline {expected['alloc_peak_bytes']} B")
+    return found
@@ -0,0 +1,217 @@
+"""
+Per-stage microbenchmarks of the voice pipeline.
+
+Each hot stage runs in isolation on the inputs from benchmarks/fixtures.py
+and reports ops/s, p50/p99 latency per operation and bytes allocated per
+operation. Results are compared with benchmarks/baseline.json; a stage
+whose median latency or allocation grows beyond the tolerance fails the
+run with exit status 1.
+
+Run from the repository root:
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --stage decode_audio --stage process_audio_data
+    python benchmarks/run_suite.py --update-baseline   # after an intended change
+
+The baseline is machine-specific, record it on the machine that runs the
+comparison.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace  # noqa: E402
+
+from deepgram import LiveResultResponse  # noqa: E402
+
+import media_receiver  # noqa: E402
+from benchmarks import fixtures  # noqa: E402
+from benchmarks.harness import Stage, measure, load_baseline, save_baseline, regressions  # noqa: E402
+from conversation_handler import ConversationHandler  # noqa: E402
+from openai_functions.OpenAI_EventHandler import OpenAI_EventHandler  # noqa: E402
+from rtp_jitter_buffer import JitterBuffer, parse_rtp  # noqa: E402
+from tts_handler import boost_volume, write_wav  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CHUNK_PACKETS = 12  # 240 ms of 20 ms packets
+
+
+class NullTTSHandler:
+    """Stands in for TTSHandler so no ElevenLabs client or playback thread is started."""
+
+    def __init__(self, channel_id=None, rtp_sender=None):
+        self.channel_id = channel_id
+        self.rtp_sender = rtp_sender
+        self.sentences = []
+
+    def synthesize_and_play(self, text, trace=None):
+        self.sentences.append(text)
+
+    def play_thinking_sound(self):
+        pass
+
+    def clear_queue(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def make_receiver():
+    media_receiver.TTSHandler = NullTTSHandler
+    return media_receiver.MediaReceiver("bench", "thread_bench", "359000000000")
+
+
+def payload_chunks():
+    packets = [parse_rtp(packet).payload for packet in fixtures.synthetic_rtp()]
+    return [b"".join(packets[i:i + CHUNK_PACKETS]) for i in range(0, len(packets) - CHUNK_PACKETS + 1, CHUNK_PACKETS)]
+
+
+def stage_rtp_parse():
+    return Stage("rtp_parse", fixtures.synthetic_rtp, parse_rtp, ops=20000, unit="packet")
+
+
+def stage_jitter_buffer():
+    recorded = fixtures.recorded_rtp()
+
+    def replay(_):
+        buffer = JitterBuffer()
+        for arrival, packet in recorded:
+            buffer.push(packet, arrival)
+        buffer.flush()
+
+    return Stage("jitter_buffer", lambda: [None], replay, ops=30, unit="10 s call")
+
+
+def stage_decode_audio():
+    receiver = make_receiver()
+    return Stage("decode_audio", payload_chunks, receiver._decode_audio, ops=5000, unit="240 ms chunk")
+
+
+def stage_process_audio_data():
+    receiver = make_receiver()
+
+    def setup():
+        return [receiver._decode_audio(chunk).copy() for chunk in payload_chunks()]
+
+    return Stage("process_audio_data", setup, receiver._process_audio_data, ops=1000, unit="240 ms chunk")
+
+
+def stage_chunker():
+    receiver = make_receiver()
+    ring = receiver.audio_ring
+
+    def setup():
+        packets = [parse_rtp(packet).payload for packet in fixtures.synthetic_rtp()]
+        return [packets[i:i + CHUNK_PACKETS] for i in range(0, len(packets) - CHUNK_PACKETS + 1, CHUNK_PACKETS)]
+
+    def chunk(packets):
+        for payload in packets:
+            ring.write(payload)
+        frame = ring.read_frame(timeout=0)
+        ring.release_frame()
+        return frame
+
+    return Stage("chunker", setup, chunk, ops=5000, unit="240 ms chunk")
+
+
+def stage_transcript():
+    conversation = ConversationHandler("thread_bench", "359000000000", NullTTSHandler())
+
+    def handle(message):
+        result = LiveResultResponse.from_json(message)
+        sentence = result.channel.alternatives[0].transcript
+        if sentence.strip() and result.is_final:
+            conversation.handle_transcript(sentence, 0.0)
+        if result.speech_final:
+            conversation.accumulated_transcript = ""
+
+    return Stage("deepgram_transcript", fixtures.deepgram_results, handle, ops=3000, unit="message")
+
+
+def stage_sentence_splitter():
+    conversation = SimpleNamespace(is_interrupted=False, tts_handler=NullTTSHandler())
+
+    def setup():
+        return [[SimpleNamespace(value=delta) for delta in stream] for stream in fixtures.openai_delta_streams()]
+
+    def split(deltas):
+        handler = OpenAI_EventHandler(conversation)
+        for delta in deltas:
+            handler.on_text_delta(delta, None)
+        conversation.tts_handler.sentences.clear()
+
+    return Stage("sentence_splitter", setup, split, ops=2000, unit="reply")
+
+
+def stage_tts_postprocess():
+    return Stage("tts_postprocess", lambda: [fixtures.tts_pcm()], boost_volume, ops=2000, unit="3 s sentence")
+
+
+def stage_wav_write():
+    directory = tempfile.mkdtemp(prefix="bench_wav_")
+    path = os.path.join(directory, "sentence.wav")
+    pcm = boost_volume(fixtures.tts_pcm())
+    return Stage("wav_write", lambda: [pcm], lambda data: write_wav(path, data), ops=1000, unit="3 s sentence")
+
+
+STAGES = [
+    stage_rtp_parse,
+    stage_jitter_buffer,
+    stage_chunker,
+    stage_decode_audio,
+    stage_process_audio_data,
+    stage_transcript,
+    stage_sentence_splitter,
+    stage_tts_postprocess,
+    stage_wav_write,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stage", action="append", help="run only this stage, can be repeated")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed slowdown / extra allocation against the baseline (default 0.3)")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'stage':22s} {'ops/s':>10s} {'p50 us':>9s} {'p99 us':>9s} {'alloc B':>9s}  per")
+    for factory in STAGES:
+        stage = factory()
+        if args.stage and stage.name not in args.stage:
+            continue
+        result = measure(stage)
+        results[stage.name] = result
+        print(f"{stage.name:22s} {result['ops_per_sec']:10.0f} {result['p50_us']:9.1f} {result['p99_us']:9.1f} "
+              f"{result['alloc_peak_bytes']:9d}  {result['unit']}")
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        return 0
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print("\n" + "!" * 72)
+        print(f"PERFORMANCE REGRESSION against {os.path.basename(args.baseline)} (tolerance {args.tolerance:.0%}):")
+        for line in found:
+            print(f"  {line}")
+        print("!" * 72)
+        return 1
+    print(f"\nNo regressions against {os.path.basename(args.baseline)} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
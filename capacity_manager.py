@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+from config import (
+    RTP_PORT_MIN,
+    RTP_PORT_MAX,
+    EXTERNAL_MEDIA_PORT_MIN,
+    EXTERNAL_MEDIA_PORT_MAX,
+    MAX_CONCURRENT_CALLS,
+    ADMISSION_MAX_LOAD_PER_CORE,
+    ADMISSION_MAX_TURN_LATENCY_SECONDS,
+    ADMISSION_QUEUE_MAX_CALLS,
+)
+from metrics import metrics
+from utils import logger
+
+calls_active = metrics.gauge("voicebot_calls_active", "Calls admitted and not yet released")
+admissions = metrics.counter("voicebot_admissions_total", "Admission decisions for new calls", labels=("outcome",))
+admission_queue_depth = metrics.gauge("voicebot_admission_queue_depth", "Calls held waiting for capacity")
+admission_wait = metrics.histogram("voicebot_admission_wait_seconds", "Time queued calls waited for capacity",
+                                   buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0))
+ports_in_use = metrics.gauge("voicebot_ports_in_use", "Ports claimed by calls", labels=("range",))
+
+
+class PortAllocator:
+    """
+    Ports of one range, owned by channels.
+
+    A bytearray bitmap marks the ports in use and a queue holds the free
+    ones, so allocate(), claim() and release() are O(1). claim() takes a
+    specific port (one discovered by sniffing) and leaves it in the queue;
+    allocate() skips queued ports that were claimed that way. Everything a
+    channel holds is freed by release(channel_id) when the channel ends.
+    """
+
+    def __init__(self, name: str, low: int, high: int):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.used = bytearray(high - low + 1)
+        self.queued = bytearray(b"\x01" * (high - low + 1))
+        self.free = deque(range(low, high + 1))
+        self.owners = {}  # channel_id -> list of ports
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, port: int) -> bool:
+        return self.low <= port <= self.high
+
+    def _take(self, port: int, owner: str) -> None:
+        self.used[port - self.low] = 1
+        self.owners.setdefault(owner, []).append(port)
+        self.count += 1
+        ports_in_use.set(self.count, range=self.name)
+
+    def allocate(self, owner: str) -> Optional[int]:
+        """The next free port, None if the range is exhausted."""
+        with self.lock:
+            while self.free:
+                port = self.free.popleft()
+                self.queued[port - self.low] = 0
+                if not self.used[port - self.low]:
+                    self._take(port, owner)
+                    return port
+            return None
+
+    def claim(self, port: int, owner: str) -> bool:
+        """Take a specific port, False if it is outside the range or already in use."""
+        if port not in self:
+            return False
+        with self.lock:
+            if self.used[port - self.low]:
+                return False
+            self._take(port, owner)
+            return True
+
+    def owner_ports(self, owner: str) -> list:
+        with self.lock:
+            return list(self.owners.get(owner, ()))
+
+    def release(self, owner: str) -> list:
+        """Free every port the owner holds, returns them."""
+        with self.lock:
+            ports = self.owners.pop(owner, [])
+            for port in ports:
+                index = port - self.low
+                self.used[index] = 0
+                if not self.queued[index]:
+                    self.queued[index] = 1
+                    self.free.append(port)
+            self.count -= len(ports)
+            ports_in_use.set(self.count, range=self.name)
+            return ports
+
+
+class CapacityManager:
+    """
+    Decides whether this node takes another call, and owns the calls' ports.
+
+    A call is admitted while all of these hold:
+      - fewer than MAX_CONCURRENT_CALLS calls are active (0 = no limit)
+      - the 1-minute load average per core is below ADMISSION_MAX_LOAD_PER_CORE (0 = off)
+      - the recent speech_final to playback latency is below
+        ADMISSION_MAX_TURN_LATENCY_SECONDS (0 = off), so a node whose calls
+        already answer slowly stops taking more
+    Otherwise the caller is rejected as busy or held until capacity frees
+    up, see ari_handler.admit_call().
+
+    Held calls wait on a list, not on a thread each: enqueue() returns at
+    once and one waiter thread admits them in arrival order when release()
+    frees a slot (load and latency are re-checked every second). So the
+    ARI dispatcher's workers stay free for the StasisEnd events that
+    release slots, and at most `max_queued` calls are held.
+    """
+
+    def __init__(self, max_calls: int = MAX_CONCURRENT_CALLS, max_load_per_core: float = ADMISSION_MAX_LOAD_PER_CORE,
+                 max_turn_latency: float = ADMISSION_MAX_TURN_LATENCY_SECONDS,
+                 max_queued: int = ADMISSION_QUEUE_MAX_CALLS):
+        self.max_calls = max_calls
+        self.max_queued = max_queued
+        self.max_load_per_core = max_load_per_core
+        self.max_turn_latency = max_turn_latency
+        self.cores = os.cpu_count() or 1
+        self.calls = set()
+        self.turn_latency = None  # moving average, seconds
+        self.turn_latency_at = 0.0
+        self.condition = threading.Condition()
+        self.waiting = deque()  # (channel_id, started, deadline, on_admitted, on_timeout)
+        self.waiter = None
+        self.rtp_ports = PortAllocator("rtp", RTP_PORT_MIN, RTP_PORT_MAX)
+        self.media_ports = PortAllocator("external_media", EXTERNAL_MEDIA_PORT_MIN, EXTERNAL_MEDIA_PORT_MAX)
+
+    def observe_turn_latency(self, seconds: float) -> None:
+        """Feed the time from speech_final to playback of a finished turn."""
+        with self.condition:
+            if self.turn_latency is None:
+                self.turn_latency = seconds
+            else:
+                self.turn_latency += 0.2 * (seconds - self.turn_latency)
+            self.turn_latency_at = time.monotonic()
+
+    def _overload_reason(self) -> Optional[str]:
+        if self.max_calls and len(self.calls) >= self.max_calls:
+            return f"{len(self.calls)} calls active, limit {self.max_calls}"
+        if self.max_load_per_core:
+            load = os.getloadavg()[0] / self.cores
+            if load >= self.max_load_per_core:
+                return f"load {load:.2f} per core, limit {self.max_load_per_core}"
+        # a latency nobody has measured for a minute says nothing about the node now
+        recent = self.turn_latency is not None and time.monotonic() - self.turn_latency_at < 60
+        if self.max_turn_latency and recent and self.turn_latency >= self.max_turn_latency:
+            return f"turn latency {self.turn_latency:.2f} s, limit {self.max_turn_latency} s"
+        return None
+
+    def try_admit(self, channel_id: str) -> Optional[str]:
+        """Admit the call if there is capacity. Returns None when admitted, otherwise why not."""
+        with self.condition:
+            reason = self._overload_reason()
+            if reason is None:
+                self.calls.add(channel_id)
+                calls_active.set(len(self.calls))
+        admissions.inc(outcome="admitted" if reason is None else "over_capacity")
+        return reason
+
+    def enqueue(self, channel_id: str, timeout: float, on_admitted, on_timeout) -> bool:
+        """
+        Hold the call until capacity frees up. Returns False, without
+        holding it, if max_queued calls are already waiting. Otherwise
+        on_admitted() or, after `timeout`, on_timeout() runs later on the
+        waiter thread; both must return quickly.
+        """
+        with self.condition:
+            full = len(self.waiting) >= self.max_queued
+            if not full:
+                started = time.monotonic()
+                self.waiting.append((channel_id, started, started + timeout, on_admitted, on_timeout))
+                admission_queue_depth.set(len(self.waiting))
+                if self.waiter is None:
+                    self.waiter = threading.Thread(target=self._serve_waiting, name="admission-queue", daemon=True)
+                    self.waiter.start()
+                self.condition.notify_all()
+        if full:
+            admissions.inc(outcome="queue_full")
+        return not full
+
+    def cancel(self, channel_id: str) -> bool:
+        """Drop a held call (the caller hung up), True if it was waiting."""
+        with self.condition:
+            for entry in self.waiting:
+                if entry[0] == channel_id:
+                    self.waiting.remove(entry)
+                    admission_queue_depth.set(len(self.waiting))
+                    return True
+        return False
+
+    def _serve_waiting(self) -> None:
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                expired = [entry for entry in self.waiting if entry[2] <= now]
+                for entry in expired:
+                    self.waiting.remove(entry)
+                admitted = []
+                while self.waiting and self._overload_reason() is None:
+                    entry = self.waiting.popleft()
+                    self.calls.add(entry[0])
+                    admitted.append(entry)
+                calls_active.set(len(self.calls))
+                admission_queue_depth.set(len(self.waiting))
+                if not admitted and not expired:
+                    # woken on release() and enqueue(); load, latency and deadlines are re-checked every second
+                    self.condition.wait(1.0)
+                    continue
+            for channel_id, started, _, on_admitted, _ in admitted:
+                admission_wait.observe(time.monotonic() - started)
+                admissions.inc(outcome="admitted_after_wait")
+                try:
+                    on_admitted()
+                except Exception as e:
+                    logger.error(f"Error resuming admitted channel {channel_id}: {e}")
+                    self.release(channel_id)
+            for channel_id, _, _, _, on_timeout in expired:
+                admissions.inc(outcome="queue_timeout")
+                try:
+                    on_timeout()
+                except Exception as e:
+                    logger.error(f"Error rejecting channel {channel_id} after waiting: {e}")
+
+    def is_admitted(self, channel_id: str) -> bool:
+        with self.condition:
+            return channel_id in self.calls
+
+    def release(self, channel_id: str) -> None:
+        """Call ended or failed to set up: free its slot and every port it held. Safe to call twice."""
+        self.rtp_ports.release(channel_id)
+        self.media_ports.release(channel_id)
+        with self.condition:
+            if channel_id in self.calls:
+                self.calls.discard(channel_id)
+                calls_active.set(len(self.calls))
+                self.condition.notify_all()
+                logger.debug(f"Released capacity of channel {channel_id}, {len(self.calls)} calls active")
+
+    def active_calls(self) -> int:
+        return len(self.calls)
+
+
+# Global instance
+capacity_manager = CapacityManager()
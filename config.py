@@ -6,8 +6,16 @@ load_dotenv()
 # ARI Configuration
 ARI_USERNAME = os.getenv("ARI_USERNAME")
 ARI_PASSWORD = os.getenv("ARI_PASSWORD")
-ARI_BASE_URL = "http://127.0.0.1:8088/ari"
+ARI_BASE_URL = os.getenv("ARI_BASE_URL", "http://127.0.0.1:8088/ari")
 APP_NAME = "voicebot-ari"
+ARI_DISPATCH_WORKERS = int(os.getenv("ARI_DISPATCH_WORKERS", "32"))  # calls set up concurrently
+ARI_TIMEOUT_SECONDS = float(os.getenv("ARI_TIMEOUT_SECONDS", "5"))
+ARI_RETRIES = 2  # extra attempts after the first
+ARI_POOL_SIZE = 32  # keep-alive connections to Asterisk
+ARI_CIRCUIT_FAILURES = 5  # consecutive failures that open the circuit breaker
+ARI_CIRCUIT_RESET_SECONDS = 10
+# Playback completion comes from PlaybackFinished events, the status is polled only as a fallback
+PLAYBACK_STATUS_FALLBACK_SECONDS = 5
 
 # Deepgram Configuration
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
@@ -18,13 +26,115 @@ DG_MODEL = "nova-2"
 # RTP Configuration
 RTP_HOST = "0.0.0.0"
 DEFAULT_RTP_PORT = 12000
+RTP_PORT_MIN = 10000
+RTP_PORT_MAX = 20000
+# Ports our own ExternalMedia sockets bind, kept clear of Asterisk's RTP range
+EXTERNAL_MEDIA_PORT_MIN = int(os.getenv("EXTERNAL_MEDIA_PORT_MIN", "40000"))
+EXTERNAL_MEDIA_PORT_MAX = int(os.getenv("EXTERNAL_MEDIA_PORT_MAX", "44999"))
+
+# Admission control: calls over capacity are rejected as busy ("reject") or held on music
+# on hold until a slot frees up ("queue"). 0 disables a limit
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "40"))
+ADMISSION_MAX_LOAD_PER_CORE = float(os.getenv("ADMISSION_MAX_LOAD_PER_CORE", "0"))
+ADMISSION_MAX_TURN_LATENCY_SECONDS = float(os.getenv("ADMISSION_MAX_TURN_LATENCY_SECONDS", "0"))
+ADMISSION_OVERFLOW = os.getenv("ADMISSION_OVERFLOW", "reject")
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 30
+# callers held at once; more are rejected as busy
+ADMISSION_QUEUE_MAX_CALLS = int(os.getenv("ADMISSION_QUEUE_MAX_CALLS", "16"))
+
+# Multi-process mode: the main process keeps the ARI websocket and places calls on this many
+# worker processes (0 = handle calls in the main process). Call limits and the session pool
+# apply per worker; worker i serves its metrics on METRICS_PORT + 1 + i
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))
+WORKER_HEARTBEAT_SECONDS = 1
+WORKER_HEARTBEAT_TIMEOUT = 5
+
+# RTP capture engine (one AF_PACKET ring shared by all calls)
+RTP_CAPTURE_INTERFACE = os.getenv("RTP_CAPTURE_INTERFACE")  # None = all interfaces
+RTP_CAPTURE_FRAME_SIZE = 2048  # bytes per ring slot, must fit one RTP datagram
+RTP_CAPTURE_BLOCK_SIZE = 1 << 16
+RTP_CAPTURE_BLOCK_COUNT = 128  # 128 * 64 KiB = 8 MiB ring
+
+# Ingest mode: "sniff" finds the caller's RTP port by sniffing, "external_media"
+# bridges the caller to an ARI ExternalMedia channel that streams to our own UDP socket
+INGEST_MODE = os.getenv("INGEST_MODE", "sniff")
+EXTERNAL_MEDIA_HOST = os.getenv("EXTERNAL_MEDIA_HOST", "127.0.0.1")
+EXTERNAL_MEDIA_FORMAT = "ulaw"
+
+# Ingest chunking: frames sent to Deepgram and the per-call ring buffer in front of them
+INGEST_FRAME_MS = int(os.getenv("INGEST_FRAME_MS", "240"))
+INGEST_BUFFER_SECONDS = float(os.getenv("INGEST_BUFFER_SECONDS", "5"))
+
+# Local voice activity gate: only speech (plus a hangover) is streamed to Deepgram.
+# The hangover must outlast Deepgram's endpointing (800 ms) and utterance_end_ms (1500 ms)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "9"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "2000"))
+DG_KEEPALIVE_SECONDS = 5  # Deepgram closes the stream after 10 s without audio
+
+# Warm pool of per-call backend sessions (OpenAI thread + open Deepgram connection), 0 disables it
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "2"))
+SESSION_POOL_TTL_SECONDS = float(os.getenv("SESSION_POOL_TTL_SECONDS", "600"))
+
+# Ingest DSP: "thread" runs each call's chain in its own thread, "batch" runs all calls
+# as one NumPy batch per tick in the shared DSP scheduler
+DSP_MODE = os.getenv("DSP_MODE", "thread")
+DSP_MAX_CHANNELS = int(os.getenv("DSP_MAX_CHANNELS", "256"))
+DSP_TICK_MS = 20
+
+# Metrics endpoint (Prometheus text format), 0 disables it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
 
 # 11 labs Configuration
 ELEVEN_LABS_API_KEY = os.getenv("ELEVEN_LABS_API_KEY")
 ELEVEN_LABS_VOICE_ID = os.getenv("ELEVEN_LABS_VOICE_ID")
+# TTS playback: "file" writes a WAV per sentence and plays it through ARI, "rtp" streams the
+# audio as it arrives as paced G.711 RTP into the ExternalMedia channel (needs INGEST_MODE=external_media)
+TTS_PLAYBACK_MODE = os.getenv("TTS_PLAYBACK_MODE", "file")
+RTP_STREAM_PTIME_MS = 20
+TTS_PIPELINE_WORKERS = int(os.getenv("TTS_PIPELINE_WORKERS", "3"))  # sentences of a call synthesized at once
+TTS_MODEL_ID = "eleven_flash_v2_5"
+TTS_OUTPUT_FORMAT = "pcm_8000"
+TTS_LANGUAGE = "bg"
+# Synthesized sentences are cached as sound files where Asterisk plays them from, keyed by
+# content. Least recently used entries go once the cache outgrows its size or age limit
+TTS_SOUNDS_DIR = os.getenv("TTS_SOUNDS_DIR", "/var/lib/asterisk/sounds/tts_audio")
+# Format of the cached files: the trunk's codec ("ulaw" or "alaw") plays without transcoding,
+# "sln" is raw 16-bit 8 kHz, "wav" the old WAV files
+TTS_FILE_FORMAT = os.getenv("TTS_FILE_FORMAT", "ulaw")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_MAX_AGE_DAYS = float(os.getenv("TTS_CACHE_MAX_AGE_DAYS", "30"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))  # hot in-memory tier
+# Scripted phrases synthesized ahead of calls (see prompt_builder.py), checked at startup
+PROMPT_MANIFEST = os.getenv("PROMPT_MANIFEST", "phrases.json")
+PROMPT_BUILD_WORKERS = int(os.getenv("PROMPT_BUILD_WORKERS", "4"))
+PROMPT_PREWARM = os.getenv("PROMPT_PREWARM", "true").lower() == "true"
 
 # OPENAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point the client at another OpenAI-compatible server, e.g. tools/mock_llm_server.py
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# "assistants" keeps the conversation in an Assistants API thread, "chat" keeps it in memory
+# per call and streams each turn from one Chat Completions request
+LLM_BACKEND = os.getenv("LLM_BACKEND", "assistants")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o")
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "40"))  # older turns are dropped
+# Local BM25 index of the knowledge document (see knowledge_index.py), the chat backend adds the
+# top passages to each turn. Rebuilt when the document changes, 0 passages disables it
+KNOWLEDGE_DOCX = os.getenv("KNOWLEDGE_DOCX", "openai_functions/Knowledge.docx")
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", "knowledge.idx")
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "3"))
+# FAQ fast path (see faq_matcher.py): a caller turn that matches a curated question with at least
+# this confidence is answered with the entry's pre-rendered answer instead of the LLM. Above 1 disables it
+FAQ_FILE = os.getenv("FAQ_FILE", "faq.json")
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.75"))
+# Speculative replies (chat backend, see speculation.py): once the caller's words look like a complete
+# question the reply is drafted before Deepgram's speech_final, and played only if speech_final confirms
+# the same text. Statements need SPECULATION_MIN_WORDS words, questions always qualify
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "false").lower() == "true"
+SPECULATIVE_TTS = os.getenv("SPECULATIVE_TTS", "true").lower() == "true"  # also render the first sentence
+SPECULATION_MIN_WORDS = int(os.getenv("SPECULATION_MIN_WORDS", "3"))
 
 # SHOPIFY Configuration
 SHOPIFY_API_KEY = os.getenv("SHOPIFY_API_KEY")
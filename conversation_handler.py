@@ -1,4 +1,5 @@
 from typing import Optional
+import threading
 from tts_handler import TTSHandler
 import time
 from typing_extensions import override
@@ -9,6 +10,11 @@ from utils import logger
 from openai_functions.OpenAIClient import openai_client
 from openai_functions.OpenAI_EventHandler import OpenAI_EventHandler
 from openai_functions.prompts import assistant_instructions
+from openai_functions.chat_engine import ChatEngine
+from faq_matcher import faq_matcher
+from speculation import Speculation, looks_complete, normalize_turn
+from turn_trace import TurnTrace
+from config import LLM_BACKEND, SPECULATIVE_GENERATION
 
 class ConversationHandler:
     def __init__(self, openai_thread_id, caller_number, tts_handler: TTSHandler):
@@ -25,6 +31,12 @@ class ConversationHandler:
         self.is_generating = False
         self.is_interrupted = False
         self.caller_number = caller_number
+        self.turn_number = 0
+        self.current_trace = None
+        # the chat backend keeps the conversation here instead of in an OpenAI thread
+        self.chat_engine = ChatEngine(caller_number) if LLM_BACKEND == "chat" else None
+        self.speculation = None
+        self.speculation_lock = threading.Lock()
 
     def handle_transcript(self, transcript: str, timestamp: float) -> None:
         """Handle incoming transcripts and determine when to trigger AI response"""
@@ -32,6 +44,43 @@ class ConversationHandler:
             self.accumulated_transcript += " " + transcript.strip()
         return None
 
+    def speculate(self, interim: str = "") -> None:
+        """
+        Called on results before speech_final: start drafting the reply to
+        what the caller said so far (the final segments plus `interim`) if
+        it looks like a complete question, and drop a draft the caller has
+        talked past.
+        """
+        if not SPECULATIVE_GENERATION or not self.chat_engine:
+            return
+        text = normalize_turn(f"{self.accumulated_transcript} {interim}")
+        with self.speculation_lock:
+            if self.speculation and self.speculation.text == text:
+                return
+            if self.speculation:
+                self.speculation.discard()
+                self.speculation = None
+            # a FAQ question is answered at once anyway, and nothing is started while a reply is running
+            if self.is_generating or not looks_complete(text) or faq_matcher.match(text, record=False):
+                return
+            logger.debug(f"Speculating on '{text}'")
+            self.speculation = Speculation(self.chat_engine, text, self)
+
+    def discard_speculation(self, outcome: str = "discarded") -> None:
+        with self.speculation_lock:
+            speculation, self.speculation = self.speculation, None
+        if speculation:
+            speculation.discard(outcome)
+
+    def _take_speculation(self, transcript: str) -> Optional[Speculation]:
+        """The draft for this turn if it was drafted from the same words, else drops it."""
+        with self.speculation_lock:
+            speculation, self.speculation = self.speculation, None
+        if speculation and speculation.text != normalize_turn(transcript):
+            speculation.discard()
+            return None
+        return speculation
+
     def generate_and_stream_test(self, timestamp: float) -> None:
         tts_transcripts = self.accumulated_transcript
         self.accumulated_transcript =""
@@ -42,7 +91,13 @@ class ConversationHandler:
     def generate_and_stream(self, timestamp: float) -> None:
 
         if self.accumulated_transcript.strip():
-            self.tts_handler.play_thinking_sound()
+            # a FAQ answer or a drafted reply plays at once, no thinking sound in front of it
+            faq_text = self.accumulated_transcript.strip()
+            # provisional, only the check that decides the turn below goes into the FAQ metrics
+            faq = faq_matcher.match(faq_text, record=False)
+            drafted = self.speculation and self.speculation.text == normalize_turn(faq_text)
+            if not faq and not drafted:
+                self.tts_handler.play_thinking_sound()
             # Log the accumulated transcript
             logger.debug(f"generate_and_stream called with accumulated transcript: '{self.accumulated_transcript}'")
             
@@ -63,26 +118,32 @@ class ConversationHandler:
             logger.debug(f"Starting to generate response")
             self.is_generating = True
 
-            # Adding the user's question to the message
-            message = self.openai_client.beta.threads.messages.create(
-                thread_id=self.openai_thread_id,
-                role="user",
-                content=self.accumulated_transcript
-            )
+            # A turn that never reached playback is logged with the stages it got to
+            if self.current_trace:
+                self.current_trace.finish()
+            self.turn_number += 1
+            trace = TurnTrace(self.tts_handler.channel_id, self.turn_number, started_at=timestamp)
+            self.current_trace = trace
 
+            transcript = self.accumulated_transcript
             # Resetting the transcripts
             self.accumulated_transcript = ""
+            # the caller may have said more while the previous reply was stopping
+            faq = faq_matcher.match(transcript.strip())
+            speculation = self._take_speculation(transcript)
+            if speculation and faq:
+                speculation.discard("faq")
+                speculation = None
 
-            # Creating a stream for the response
             try:
-                logger.debug(f"Starting OpenAI stream with thread_id: {self.openai_thread_id}")
-                with self.openai_client.beta.threads.runs.stream(
-                    thread_id=self.openai_thread_id,
-                    assistant_id=self.openai_assistant_id,
-                    instructions=assistant_instructions + f"The person is calling from this number: {int(self.caller_number)}",
-                    event_handler=OpenAI_EventHandler(self),
-                ) as stream:
-                    stream.until_done()
+                if faq:
+                    self._answer_from_faq(transcript.strip(), faq[0]["answer"], trace)
+                elif speculation and speculation.commit(trace):
+                    self._finish_speculation(speculation, transcript.strip(), trace)
+                elif self.chat_engine:
+                    self.chat_engine.respond(transcript, self, trace)
+                else:
+                    self._stream_assistant_run(transcript, trace)
             except Exception as e:
                 logger.error(f"Error in OpenAI stream: {e}")
             finally:
@@ -93,5 +154,49 @@ class ConversationHandler:
 
         return None
 
+    def _finish_speculation(self, speculation: Speculation, transcript: str, trace: TurnTrace) -> None:
+        """Let a committed draft stream to its end and keep the exchange."""
+        speculation.finish()
+        if speculation.tool_calls:
+            # tools are not run speculatively: run them now and go on from what the draft already said
+            self.chat_engine.respond(transcript, self, trace, draft=(speculation.content, speculation.tool_calls))
+        elif speculation.error and not speculation.content:
+            self.chat_engine.respond(transcript, self, trace)
+        else:
+            self.chat_engine.add_exchange(transcript, speculation.content)
+
+    def _answer_from_faq(self, transcript: str, answer: str, trace: TurnTrace) -> None:
+        """Speak the pre-rendered FAQ answer, then record the exchange so the LLM knows it was said."""
+        trace.mark("first_sentence_to_tts")
+        self.tts_handler.synthesize_and_play(answer, trace=trace)
+        if self.chat_engine:
+            self.chat_engine.add_exchange(transcript, answer)
+            return
+        for role, content in (("user", transcript), ("assistant", answer)):
+            self.openai_client.beta.threads.messages.create(
+                thread_id=self.openai_thread_id,
+                role=role,
+                content=content
+            )
+
+    def _stream_assistant_run(self, transcript: str, trace: TurnTrace) -> None:
+        # Adding the user's question to the message
+        message = self.openai_client.beta.threads.messages.create(
+            thread_id=self.openai_thread_id,
+            role="user",
+            content=transcript
+        )
+        trace.mark("message_created")
+
+        # Creating a stream for the response
+        logger.debug(f"Starting OpenAI stream with thread_id: {self.openai_thread_id}")
+        with self.openai_client.beta.threads.runs.stream(
+            thread_id=self.openai_thread_id,
+            assistant_id=self.openai_assistant_id,
+            instructions=assistant_instructions + f"The person is calling from this number: {int(self.caller_number)}",
+            event_handler=OpenAI_EventHandler(self, trace),
+        ) as stream:
+            stream.until_done()
+
     def stop_speaking(self):
         self.tts_handler.clear_queue()
@@ -0,0 +1,118 @@
+import socket
+from config import (
+    APP_NAME,
+    EXTERNAL_MEDIA_HOST,
+    EXTERNAL_MEDIA_FORMAT,
+)
+from utils import logger
+from ari_client import ari_client
+
+EXTERNAL_MEDIA_CHANNEL_PREFIX = "UnicastRTP/"
+
+
+def is_external_media_channel(channel: dict) -> bool:
+    """ExternalMedia channels enter our Stasis app too, they are not callers."""
+    return channel.get('name', '').startswith(EXTERNAL_MEDIA_CHANNEL_PREFIX)
+
+
+class ExternalMediaSession:
+    """
+    Receives a caller's audio through an ARI ExternalMedia channel.
+
+    Instead of discovering the caller's RTP port by sniffing, we bind our own
+    UDP socket, ask Asterisk for an ExternalMedia channel that streams to it
+    and bridge that channel with the caller.
+    """
+
+    def __init__(self, channel_id: str, host: str = EXTERNAL_MEDIA_HOST, port: int = 0):
+        self.channel_id = channel_id
+        self.host = host
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.external_channel_id = None
+        self.bridge_id = None
+        self.remote_address = None  # Asterisk's side of the RTP stream
+        self.packets_received = 0
+
+    def open(self) -> bool:
+        """Create the ExternalMedia channel and bridge it with the caller."""
+        try:
+            response = ari_client.post(
+                "/channels/externalMedia",
+                params={
+                    "app": APP_NAME,
+                    "channelId": f"{self.channel_id}-media",
+                    "external_host": f"{self.host}:{self.port}",
+                    "format": EXTERNAL_MEDIA_FORMAT,
+                    "encapsulation": "rtp",
+                    "transport": "udp",
+                    "direction": "both",
+                },
+            )
+            if not response.ok:
+                logger.error(f"Failed to create ExternalMedia channel: {response.text}")
+                return False
+            channel = response.json()
+            self.external_channel_id = channel.get('id')
+            # where Asterisk receives our RTP; otherwise learned from the first packet it sends
+            variables = channel.get('channelvars') or {}
+            if variables.get('UNICASTRTP_LOCAL_ADDRESS') and variables.get('UNICASTRTP_LOCAL_PORT'):
+                self.remote_address = (variables['UNICASTRTP_LOCAL_ADDRESS'], int(variables['UNICASTRTP_LOCAL_PORT']))
+
+            response = ari_client.post(
+                "/bridges",
+                params={"type": "mixing", "bridgeId": f"{self.channel_id}-bridge"},
+            )
+            if not response.ok:
+                logger.error(f"Failed to create bridge: {response.text}")
+                return False
+            self.bridge_id = response.json().get('id')
+
+            response = ari_client.post(
+                f"/bridges/{self.bridge_id}/addChannel",
+                params={"channel": f"{self.channel_id},{self.external_channel_id}"},
+            )
+            if not response.ok:
+                logger.error(f"Failed to add channels to bridge {self.bridge_id}: {response.text}")
+                return False
+
+            logger.info(f"ExternalMedia for channel {self.channel_id} streaming to {self.host}:{self.port}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error opening ExternalMedia for channel {self.channel_id}: {e}")
+            return False
+
+    def serve(self, handler, should_stop) -> None:
+        """Hand every received RTP datagram to handler(memoryview) until should_stop()."""
+        buffer = bytearray(2048)
+        view = memoryview(buffer)
+        while not should_stop():
+            try:
+                length, address = self.sock.recvfrom_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.remote_address = address
+            self.packets_received += 1
+            handler(view[:length])
+
+    def _delete(self, path: str) -> None:
+        try:
+            response = ari_client.delete(path)
+            if response.status_code not in (200, 204, 404):
+                logger.error(f"Error deleting {path}: {response.text}")
+        except Exception as e:
+            logger.error(f"Error deleting {path}: {e}")
+
+    def close(self) -> None:
+        if self.external_channel_id:
+            self._delete(f"/channels/{self.external_channel_id}")
+            self.external_channel_id = None
+        if self.bridge_id:
+            self._delete(f"/bridges/{self.bridge_id}")
+            self.bridge_id = None
+        self.sock.close()
@@ -0,0 +1,155 @@
+"""
+FAQ fast path: answers the frequent questions without the LLM.
+
+Most calls ask the same few things (delivery, returns, store hours).
+faq.json lists them as entries of {"id", "questions": [phrasings],
+"answer"}. Before a turn goes to OpenAI, ConversationHandler matches
+the caller's transcript against every phrasing. If the best entry's
+confidence reaches FAQ_MATCH_THRESHOLD, the bot speaks that entry's
+answer. The answers are synthesized ahead of time with the phrase
+manifest (prompt_builder.py), so they play straight from the TTS cache.
+
+Text is normalized the way the knowledge index does it (lowercase,
+stop words dropped, words cut to a stem), then compared as character
+trigrams with IDF weights. Confidence is the cosine similarity, from 0
+to 1. Trigrams tolerate the spelling slips of speech recognition. A
+long turn that mixes a FAQ question with something else scores lower
+and goes to the LLM.
+
+    python faq_matcher.py "Колко струва доставката?"    # confidence per entry
+"""
+import json
+import sys
+from typing import Optional
+import numpy as np
+from config import FAQ_FILE, FAQ_MATCH_THRESHOLD
+from knowledge_index import tokenize
+from metrics import metrics
+from utils import logger
+
+faq_requests = metrics.counter("voicebot_faq_requests_total", "Caller turns checked against the FAQ",
+                               labels=("outcome",))
+faq_confidence = metrics.histogram("voicebot_faq_confidence", "Confidence of the best FAQ entry for a caller turn",
+                                   buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0))
+
+
+def trigrams(text: str) -> list:
+    grams = []
+    for word in tokenize(text):
+        padded = f" {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FAQMatcher:
+    """
+    The curated FAQ table and its trigram vectors.
+
+    match() returns (entry, confidence) for a transcript at or above the
+    threshold, otherwise None. It records the check in the metrics unless
+    told not to.
+    Every phrasing is one row of a unit-length matrix, so scoring a
+    transcript is one matrix-vector product.
+    """
+
+    def __init__(self, path: str = FAQ_FILE, threshold: float = FAQ_MATCH_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.entries = []
+        self.loaded = None  # not tried yet
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            for entry in entries:
+                if not entry.get("answer", "").strip() or not entry.get("questions"):
+                    raise ValueError(f"FAQ entry without questions or answer: {entry.get('id')}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load FAQ from {self.path}: {e}")
+            self.loaded = False
+            return False
+
+        rows = [(i, trigrams(question)) for i, entry in enumerate(entries) for question in entry["questions"]]
+        vocabulary = {}
+        for _, grams in rows:
+            for gram in grams:
+                vocabulary.setdefault(gram, len(vocabulary))
+        counts = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+        for row, (_, grams) in enumerate(rows):
+            for gram in grams:
+                counts[row, vocabulary[gram]] += 1
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = np.log((1 + len(rows)) / (1 + document_frequency)).astype(np.float32) + 1
+        vectors = counts * self.idf
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+        self.entries = entries
+        self.vocabulary = vocabulary
+        self.vectors = vectors
+        self.row_entry = np.array([i for i, _ in rows], dtype=np.intp)
+        self.loaded = True
+        logger.info(f"Loaded {len(entries)} FAQ entries ({len(rows)} phrasings) from {self.path}")
+        return True
+
+    def scores(self, text: str) -> list:
+        """(confidence, entry) for every entry, best first."""
+        if self.loaded is None:
+            self.load()
+        if not self.loaded:
+            return []
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        unknown = 0
+        for gram in trigrams(text):
+            index = self.vocabulary.get(gram)
+            if index is None:
+                unknown += 1
+            else:
+                query[index] += 1
+        # unknown trigrams still count towards the length, a turn mostly about something else scores low
+        query *= self.idf
+        norm = np.sqrt(float(query @ query) + unknown * float(self.idf.max()) ** 2)
+        if norm == 0:
+            return [(0.0, entry) for entry in self.entries]
+        similarity = self.vectors @ query / norm
+        best = np.zeros(len(self.entries), dtype=np.float32)
+        np.maximum.at(best, self.row_entry, similarity)
+        order = np.argsort(-best)
+        return [(float(best[i]), self.entries[i]) for i in order]
+
+    def match(self, text: str, record: bool = True) -> Optional[tuple]:
+        """
+        (entry, confidence) if the transcript is a FAQ question, else None.
+        record=False leaves the metrics alone, for provisional checks (unfinished
+        turns, the early check before the thinking sound).
+        """
+        if self.threshold > 1:
+            return None
+        scores = self.scores(text)
+        if not scores:
+            return None
+        confidence, entry = scores[0]
+        if not record:
+            return (entry, confidence) if confidence >= self.threshold else None
+        faq_confidence.observe(confidence)
+        if confidence < self.threshold:
+            faq_requests.inc(outcome="miss")
+            return None
+        faq_requests.inc(outcome="hit")
+        logger.info(f"FAQ match {entry['id']} ({confidence:.2f}) for '{text}'")
+        return entry, confidence
+
+    def phrases(self) -> list:
+        """The answers as phrase-manifest entries, so prompt_builder renders their audio ahead of time."""
+        if self.loaded is None:
+            self.load()
+        return [{"text": entry["answer"]} for entry in self.entries]
+
+
+# Global instance
+faq_matcher = FAQMatcher()
+
+
+if __name__ == "__main__":
+    for confidence, entry in faq_matcher.scores(" ".join(sys.argv[1:])):
+        print(f"{confidence:.3f}  {entry['id']}")
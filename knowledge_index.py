@@ -0,0 +1,278 @@
+"""
+Local retrieval over Knowledge.docx for the chat backend.
+
+The Assistants backend answers delivery and return questions through a
+remote file_search vector store, one more round trip per turn. This
+builds a BM25 index of the document offline and searches it in
+process, and the chat engine adds the best passages to the turn's
+prompt.
+
+The document is cut into passages at its headings: every FAQ question
+with its answer, and the longer policy sections in parts of up to
+CHUNK_CHARS. Every (term, passage) pair gets its BM25 weight at build
+time. A query then only sums the weights of its terms per passage.
+The index is one file:
+    magic, header length, JSON header (source hash, vocabulary, passages,
+    array offsets), then the CSR arrays term -> passages and weights,
+which is memory-mapped on load. It is rebuilt only when the sha256 of
+the document changes.
+
+    python knowledge_index.py [--rebuild] [--query "Колко струва доставката?"]
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List
+import numpy as np
+from config import KNOWLEDGE_DOCX, KNOWLEDGE_INDEX_PATH, KNOWLEDGE_TOP_K
+from utils import logger
+
+MAGIC = b"KIDX1\n"
+HEADER_LENGTH = struct.Struct("<I")
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+CHUNK_CHARS = 600
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Bulgarian inflects by suffix, cutting words to a prefix is a cheap stemmer ("доставката" -> "достав")
+STEM_CHARS = 6
+STOP_WORDS = {
+    "и", "в", "във", "на", "с", "със", "за", "от", "до", "по", "при", "към", "да", "се", "ще", "не",
+    "е", "са", "си", "ли", "как", "какво", "какъв", "каква", "кои", "кой", "мога", "може", "моля",
+    "ми", "ме", "ви", "вас", "вие", "аз", "то", "че", "или", "а", "но", "ако", "това", "тази", "този",
+    "искам", "направя", "направи", "здравейте", "кога", "колко",
+}
+# roots the prefix gets wrong: ones that change inside the word ("върна" / "връщане") and
+# words that share their prefix with unrelated ones ("маратонки" / "маратона"). A word that
+# starts with any form of a root stems to the root's shared form
+ROOT_ALIASES = {"върн": "връщ", "връщ": "връщ", "замен": "замян", "замян": "замян", "маратонк": "маратонк"}
+TOKEN = re.compile(r"\w+")
+# an index built with other tokenizer or scoring settings is rebuilt
+INDEX_PARAMETERS = hashlib.sha256(json.dumps(
+    [STEM_CHARS, CHUNK_CHARS, K1, B, sorted(STOP_WORDS), ROOT_ALIASES], ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def stem(word: str) -> str:
+    for root, alias in ROOT_ALIASES.items():
+        if word.startswith(root):
+            return alias
+    return word[:STEM_CHARS]
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(word) for word in TOKEN.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_docx(path: str) -> list:
+    """(style, text) of every non-empty paragraph of a .docx, in order."""
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NS}p"):
+        style = paragraph.find(f"{WORD_NS}pPr/{WORD_NS}pStyle")
+        text = "".join(node.text or "" for node in paragraph.iter(f"{WORD_NS}t"))
+        text = " ".join(text.split())
+        if text.strip(" ."):
+            paragraphs.append((style.get(f"{WORD_NS}val") if style is not None else "", text))
+    return paragraphs
+
+
+def chunk_paragraphs(paragraphs: list, max_chars: int = CHUNK_CHARS) -> list:
+    """
+    Passages of {"title", "text"}: the paragraphs under each heading,
+    split into parts of up to max_chars. The heading is kept as the title
+    so the question of an FAQ entry is searched along with its answer.
+    """
+    chunks = []
+    title, body = "", []
+
+    def flush():
+        part = []
+        for text in body:
+            if part and sum(len(p) + 1 for p in part) + len(text) > max_chars:
+                chunks.append({"title": title, "text": "\n".join(part)})
+                part = []
+            part.append(text)
+        if part:
+            chunks.append({"title": title, "text": "\n".join(part)})
+
+    for style, text in paragraphs:
+        if style.startswith("Heading"):
+            flush()
+            title, body = text, []
+        else:
+            body.append(text)
+    flush()
+    return chunks
+
+
+def _aligned(position: int) -> int:
+    return (position + 63) // 64 * 64
+
+
+def build_index(chunks: list, source_hash: str, path: str) -> None:
+    """Write the BM25 index of chunks to path (atomically)."""
+    documents = [tokenize(f"{chunk['title']} {chunk['text']}") for chunk in chunks]
+    lengths = np.array([len(terms) for terms in documents], dtype=np.float64)
+    average_length = max(float(lengths.mean()) if len(lengths) else 0.0, 1.0)
+
+    postings = {}
+    for doc, terms in enumerate(documents):
+        for term in set(terms):
+            postings.setdefault(term, []).append((doc, terms.count(term)))
+
+    vocabulary = sorted(postings)
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int32)
+    docs, weights = [], []
+    for i, term in enumerate(vocabulary):
+        entries = postings[term]
+        idf = math.log(1 + (len(documents) - len(entries) + 0.5) / (len(entries) + 0.5))
+        for doc, tf in entries:
+            norm = K1 * (1 - B + B * lengths[doc] / average_length)
+            docs.append(doc)
+            weights.append(idf * tf * (K1 + 1) / (tf + norm))
+        offsets[i + 1] = len(docs)
+    arrays = {
+        "offsets": offsets,
+        "docs": np.array(docs, dtype=np.int32),
+        "weights": np.array(weights, dtype=np.float32),
+    }
+
+    header = {"source_hash": source_hash, "parameters": INDEX_PARAMETERS,
+              "vocabulary": vocabulary, "chunks": chunks, "arrays": {}}
+    position = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [position, array.dtype.str, len(array)]
+        position = _aligned(position + array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode()
+    data_start = _aligned(len(MAGIC) + HEADER_LENGTH.size + len(header_bytes))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name][0])
+            f.write(array.tobytes())
+    os.replace(temporary, path)
+
+
+class KnowledgeIndex:
+    """
+    The memory-mapped BM25 index of the knowledge document.
+
+    load() maps the index file, rebuilding it first when it is missing or
+    was built from another version of the document. search() returns the
+    top `k` passages for a query. It is safe to call from every call's
+    thread, and it loads the index on first use.
+    """
+
+    def __init__(self, source: str = KNOWLEDGE_DOCX, path: str = KNOWLEDGE_INDEX_PATH):
+        self.source = source
+        self.path = path
+        self.lock = threading.Lock()
+        self.loaded = None  # not tried yet
+        self.vocabulary = {}
+        self.chunks = []
+        self.offsets = self.docs = self.weights = None
+        self.mapping = None
+
+    def load(self, rebuild: bool = False) -> bool:
+        with self.lock:
+            try:
+                source_hash = file_hash(self.source)
+                if rebuild or not self._is_current(source_hash):
+                    started = time.monotonic()
+                    chunks = chunk_paragraphs(read_docx(self.source))
+                    build_index(chunks, source_hash, self.path)
+                    logger.info(f"Built knowledge index {self.path}: {len(chunks)} passages "
+                                f"in {(time.monotonic() - started) * 1000:.0f} ms")
+                self._map()
+                self.loaded = True
+            except Exception as e:
+                logger.error(f"Could not load knowledge index from {self.source}: {e}")
+                self.loaded = False
+            return self.loaded
+
+    def _is_current(self, source_hash: str) -> bool:
+        """Whether the index file was built from this document with the current parameters."""
+        try:
+            header = self._read_header()
+        except (OSError, ValueError):
+            return False
+        return (header.get("source_hash"), header.get("parameters")) == (source_hash, INDEX_PARAMETERS)
+
+    def _read_header(self) -> dict:
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a knowledge index")
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header = json.loads(f.read(length))
+        header["data_start"] = _aligned(len(MAGIC) + HEADER_LENGTH.size + length)
+        return header
+
+    def _map(self) -> None:
+        header = self._read_header()
+        with open(self.path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        arrays = {name: np.frombuffer(mapping, dtype=np.dtype(dtype), count=count, offset=header["data_start"] + offset)
+                  for name, (offset, dtype, count) in header["arrays"].items()}
+        self.vocabulary = {term: i for i, term in enumerate(header["vocabulary"])}
+        self.chunks = header["chunks"]
+        self.offsets, self.docs, self.weights = arrays["offsets"], arrays["docs"], arrays["weights"]
+        self.mapping = mapping
+
+    def search(self, query: str, k: int = KNOWLEDGE_TOP_K) -> list:
+        """The top k passages for query as (score, {"title", "text"}), best first."""
+        if self.loaded is None:
+            self.load()
+        if not self.loaded:
+            return []
+        terms = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not terms or k <= 0:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in terms:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            # a passage appears once per term, so plain fancy-index addition is exact
+            scores[self.docs[start:end]] += self.weights[start:end]
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), self.chunks[i]) for i in best if scores[i] > 0]
+
+    def context(self, query: str, k: int = KNOWLEDGE_TOP_K) -> str:
+        """The top passages as prompt text, empty when nothing matches."""
+        return "\n\n".join(f"{chunk['title']}\n{chunk['text']}" for _, chunk in self.search(query, k))
+
+
+# Global instance
+knowledge_index = KnowledgeIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local knowledge index")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild even if the document is unchanged")
+    parser.add_argument("--query", help="print the top passages for a question")
+    parser.add_argument("-k", type=int, default=KNOWLEDGE_TOP_K)
+    args = parser.parse_args()
+    if not knowledge_index.load(rebuild=args.rebuild):
+        raise SystemExit(1)
+    print(f"{len(knowledge_index.chunks)} passages, {len(knowledge_index.vocabulary)} terms, "
+          f"{os.path.getsize(knowledge_index.path)} bytes")
+    if args.query:
+        for score, chunk in knowledge_index.search(args.query, args.k):
+            print(f"\n[{score:.2f}] {chunk['title']}\n{chunk['text']}")
@@ -2,16 +2,41 @@ import sys
 import time
 import threading
 from utils import logger
-from ari_handler import handle_ari_events, active_channels, cleanup_channel
+from ari_handler import handle_ari_events, on_ari_message, active_channels, cleanup_channel
 from openai_functions.OpenAIClient import openai_client
+from metrics import metrics
+from session_pool import session_pool
+from worker_supervisor import WorkerSupervisor
+from prompt_builder import prewarm_prompts
+from knowledge_index import knowledge_index
+from config import WORKER_PROCESSES, PROMPT_PREWARM, LLM_BACKEND
 
 def main():
+    supervisor = None
     try:
         logger.info("Initializing openai client...")
-        openai_client.create_assistant()
+        if LLM_BACKEND == "assistants":
+            openai_client.create_assistant()
+        else:
+            openai_client.connect()
+            # built here once so the workers only map it
+            knowledge_index.load()
+        if PROMPT_PREWARM:
+            logger.info("Building scripted prompts...")
+            prewarm_prompts()
+        if WORKER_PROCESSES > 0:
+            # workers load the assistant created above
+            logger.info(f"Starting {WORKER_PROCESSES} worker processes...")
+            supervisor = WorkerSupervisor(WORKER_PROCESSES)
+            supervisor.start()
+        else:
+            session_pool.start()
+
+        metrics.start_server()
 
         logger.info("Starting ARI listener...")
-        ari_thread = threading.Thread(target=handle_ari_events, daemon=True)
+        on_message = supervisor.route if supervisor else on_ari_message
+        ari_thread = threading.Thread(target=handle_ari_events, args=(on_message,), daemon=True)
         ari_thread.start()
         
         logger.info(f"ARI listener running. Awaiting calls...")
@@ -21,6 +46,9 @@ def main():
             
     except KeyboardInterrupt:
         logger.info("Shutting down...")
+        if supervisor:
+            supervisor.stop()
+        session_pool.stop()
         # Cleanup all active channels
         for channel_id in list(active_channels.keys()):
             cleanup_channel(channel_id)
@@ -1,37 +1,81 @@
 import threading
-from queue import Queue, Empty
-from scapy.all import sniff, IP, UDP
 from deepgram import DeepgramClient, LiveTranscriptionEvents, LiveOptions
-from config import DEEPGRAM_API_KEY, DG_LANGUAGE, DG_MODEL
+from config import (DEEPGRAM_API_KEY, DG_LANGUAGE, DG_MODEL, DG_SAMPLE_RATE, INGEST_FRAME_MS, INGEST_BUFFER_SECONDS,
+                    VAD_ENABLED, VAD_THRESHOLD_DB, VAD_HANGOVER_MS, DG_KEEPALIVE_SECONDS, DSP_MODE,
+                    TTS_PLAYBACK_MODE)
 from utils import logger
-import audioop
-import noisereduce as nr
-import numpy as np
 import time
 from conversation_handler import ConversationHandler
 from tts_handler import TTSHandler
+from rtp_sender import RTPStreamSender
+from rtp_capture import rtp_capture_engine
+from rtp_jitter_buffer import JitterBuffer
+from audio_dsp import IngestDSP, DECODE_TABLES
+from noise_suppressor import StreamingNoiseSuppressor
+from ring_buffer import FrameRingBuffer
+from vad import VoiceActivityGate
+from dsp_scheduler import dsp_scheduler
+
+
+def live_options() -> LiveOptions:
+    return LiveOptions(
+        language=DG_LANGUAGE,
+        model=DG_MODEL,
+        sample_rate=8000,
+        encoding="linear16",
+        channels=1,
+        interim_results=True,
+        utterance_end_ms=1500,  # Increased from 1000 to allow more time between phrases
+        endpointing=800,  # Increased from 600 to be more lenient with pauses
+        punctuate=True,
+        vad_events=True,  # Enable Voice Activity Detection events
+        keywords=["здравейте", "благодаря", "довиждане"],  # Add common keywords to improve recognition
+        smart_format=True  # Enable smart formatting
+    )
+
+
+def new_deepgram_connection():
+    return DeepgramClient(api_key=DEEPGRAM_API_KEY).listen.websocket.v("1")
+
 
 class MediaReceiver:
-    def __init__(self, channel_id, openai_thread_id, caller_number, codec="PCMU"):
+    def __init__(self, channel_id, openai_thread_id, caller_number, codec="PCMU", media_session=None):
         self.channel_id = channel_id
         self.codec = codec 
         self.rtp_port = 0
+        self.media_session = media_session  # ExternalMediaSession when not using the capture engine
         self.stop_flag = False
         self.dg_connection = None
         self.packets_received = 0
-        self.audio_queue = Queue()
+        self.jitter_buffer = JitterBuffer(codec)
         self.processing_thread = None
-        self.buffer = bytearray()
-        self.CHUNK_SIZE = 1920  # 240 ms at 8kHz mono
+        self.dsp_slot = None  # row in the shared DSP scheduler when DSP_MODE is "batch"
+        self.CHUNK_SIZE = DG_SAMPLE_RATE * INGEST_FRAME_MS // 1000  # G.711 bytes per chunk, 1920 = 240 ms
+        self.audio_ring = FrameRingBuffer(
+            self.CHUNK_SIZE, max(3, round(INGEST_BUFFER_SECONDS * 1000 / INGEST_FRAME_MS))
+        )
+        self.reported_drops = 0
+        self.dsp = IngestDSP(self.CHUNK_SIZE, codec if codec in DECODE_TABLES else "PCMU")
+        self.noise_suppressor = StreamingNoiseSuppressor(prop_decrease=0.8)
+        self.vad = VoiceActivityGate(threshold_db=VAD_THRESHOLD_DB, hangover_ms=VAD_HANGOVER_MS) if VAD_ENABLED else None
+        self.preroll = None  # last suppressed chunk, sent ahead of the next speech onset
+        self.last_dg_activity = time.time()
         self.volume_multiplier = 1.85  # Slight volume boost
-        self.conversation_handler = ConversationHandler(openai_thread_id, caller_number, TTSHandler(channel_id))
+        rtp_sender = None
+        if TTS_PLAYBACK_MODE == "rtp" and media_session:
+            # answers go back over the ExternalMedia channel's own socket
+            rtp_sender = RTPStreamSender(media_session.sock, lambda: media_session.remote_address,
+                                         codec if codec in DECODE_TABLES else "PCMU", channel_id=channel_id)
+        self.conversation_handler = ConversationHandler(openai_thread_id, caller_number,
+                                                        TTSHandler(channel_id, rtp_sender=rtp_sender))
         self.last_transcript_time = time.time()
         self.openai_thread_id = openai_thread_id
     
-    def start_deepgram(self):
+    def start_deepgram(self, dg_connection=None):
+        """Start transcription. dg_connection is an already started connection from the session pool, if any."""
         try:
-            deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)
-            self.dg_connection = deepgram.listen.websocket.v("1")
+            warm = dg_connection is not None
+            self.dg_connection = dg_connection if warm else new_deepgram_connection()
             
             def on_transcript(client, result, **kwargs):
                 try:
@@ -54,6 +98,9 @@ class MediaReceiver:
                             
                             logger.info(f"[Channel {self.channel_id}] Transcript: {sentence}")
                             
+                        if not speech_final:
+                            # an interim result holds the words after the last final segment
+                            self.conversation_handler.speculate("" if is_final else sentence)
                         if speech_final:
                             logger.info(f"[Channel {self.channel_id}] Detected end of speech")
                             # Add debug logging before generating response
@@ -77,28 +124,16 @@ class MediaReceiver:
             self.dg_connection.on(LiveTranscriptionEvents.Error, on_error)
             self.dg_connection.on(LiveTranscriptionEvents.Close, on_close)
             
-            options = LiveOptions(
-                language=DG_LANGUAGE,
-                model=DG_MODEL,
-                sample_rate=8000,
-                encoding="linear16",
-                channels=1,
-                interim_results=True,
-                utterance_end_ms=1500,  # Increased from 1000 to allow more time between phrases
-                endpointing=800,  # Increased from 600 to be more lenient with pauses
-                punctuate=True,
-                vad_events=True,  # Enable Voice Activity Detection events
-                keywords=["здравейте", "благодаря", "довиждане"],  # Add common keywords to improve recognition
-                smart_format=True  # Enable smart formatting
-            )
-            
-            if not self.dg_connection.start(options):
+            if not warm and not self.dg_connection.start(live_options()):
                 logger.error("Failed to start Deepgram connection")
                 return False
             
-            self.processing_thread = threading.Thread(target=self._process_audio_queue)
-            self.processing_thread.daemon = True
-            self.processing_thread.start()
+            if DSP_MODE == "batch":
+                self.dsp_slot = dsp_scheduler.register(self)
+            else:
+                self.processing_thread = threading.Thread(target=self._process_audio_queue)
+                self.processing_thread.daemon = True
+                self.processing_thread.start()
             
             return True
 
@@ -107,109 +142,128 @@ class MediaReceiver:
             return False
 
     def _decode_audio(self, raw_audio):
-        """Decode audio from G.711 mu-law or A-law to linear PCM."""
+        """Decode audio from G.711 mu-law or A-law to linear PCM (int16 array)."""
         try:
-            if self.codec == "PCMU":  # mu-law
-                return audioop.ulaw2lin(raw_audio, 2)
-            elif self.codec == "PCMA":  # A-law
-                return audioop.alaw2lin(raw_audio, 2)
-            else:
+            if self.codec not in DECODE_TABLES:
                 logger.error(f"Unsupported codec: {self.codec}")
                 return None
+            return self.dsp.decode(raw_audio)
         except Exception as e:
             logger.error(f"Error decoding audio: {e}")
             return None
 
-    def _process_audio_data(self, audio_data):
-        """Preprocess audio data before sending to Deepgram."""
+    def _process_audio_data(self, audio_array):
+        """Preprocess audio data before sending to Deepgram. Returns the chunk and whether it holds speech."""
         try:
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-            # High-pass filter to remove low-frequency noise - increase alpha for speakerphone
-            alpha = 0.97  # Increased from 0.95 to filter more low-frequency noise
-            shifted = np.roll(audio_array, 1)
-            highpassed = audio_array.astype(np.float32) - alpha * shifted.astype(np.float32)
-            highpassed[0] = audio_array[0]  # Avoid initial jump
-            audio_array = highpassed.astype(np.int16)
+            # High-pass filter to remove low-frequency noise - alpha 0.97 for speakerphone
+            highpassed = self.dsp.highpass(audio_array)
 
-            # Noise reduction - increase prop_decrease for speakerphone
-            reduced_noise = nr.reduce_noise(y=audio_array, sr=8000, prop_decrease=0.8)  # Increased from 0.7
+            # Streaming noise suppression, the noise profile carries over between chunks
+            reduced_noise = self.noise_suppressor.process(highpassed)
 
-            # Convert back to bytes
-            processed_data = reduced_noise.astype(np.int16).tobytes()
+            # Gate on the cleaned signal, before AGC lifts silence to speech level
+            is_speech = self.vad.process(reduced_noise) if self.vad else True
 
-            # DC offset removal
-            avg_val = audioop.avg(processed_data, 2)
-            if avg_val != 0:
-                processed_data = audioop.bias(processed_data, 2, -avg_val)
+            # DC offset removal, AGC to an RMS of 2000 and a 2.0 volume boost, in one pass
+            return self.dsp.finalize(reduced_noise), is_speech
 
-            # Dynamic gain control (AGC) - increase target_rms for speakerphone
-            target_rms = 2000  # Increased from 1500 for better sensitivity
-            current_rms = audioop.rms(processed_data, 2)
-            if current_rms > 0:
-                ratio = float(target_rms) / current_rms
-                processed_data = audioop.mul(processed_data, 2, ratio)
+        except Exception as e:
+            logger.error(f"Error processing audio data: {e}")
+            return audio_array.tobytes(), True
 
-            # Apply a higher volume boost for speakerphone
-            volume_boost = 2.0  # Increased from 1.85
-            processed_data = audioop.mul(processed_data, 2, volume_boost)
+    def _send_keepalive_if_idle(self):
+        """Keep the Deepgram stream open while the gate holds back silence."""
+        if self.dg_connection and time.time() - self.last_dg_activity >= DG_KEEPALIVE_SECONDS:
+            self.dg_connection.keep_alive()
+            self.last_dg_activity = time.time()
 
-            return processed_data
+    def _report_ring_drops(self):
+        if self.audio_ring.frames_dropped != self.reported_drops:
+            logger.warning(f"[Channel {self.channel_id}] Ingest falling behind, "
+                           f"dropped {self.audio_ring.frames_dropped - self.reported_drops} oldest chunks")
+            self.reported_drops = self.audio_ring.frames_dropped
 
-        except Exception as e:
-            logger.error(f"Error processing audio data: {e}")
-            return audio_data
+    def _deliver_chunk(self, processed_chunk, is_speech):
+        """Stream a processed chunk to Deepgram, or hold it back as pre-roll while the gate is closed."""
+        if not self.dg_connection:
+            return
+        if not is_speech:
+            self.preroll = processed_chunk
+            self._send_keepalive_if_idle()
+            return
+        if self.preroll:
+            # the chunk before the onset usually holds the start of the first word
+            self.dg_connection.send(self.preroll)
+            self.preroll = None
+        self.dg_connection.send(processed_chunk)
+        self.last_dg_activity = time.time()
 
     def _process_audio_queue(self):
         while not self.stop_flag:
             try:
-                audio_data = self.audio_queue.get(timeout=0.1)
-                if self.dg_connection and audio_data:
-                    self.buffer.extend(audio_data)
+                chunk = self.audio_ring.read_frame(timeout=0.1)
+                if chunk is None:
+                    self._send_keepalive_if_idle()
+                    continue
+                # decode straight out of the ring, then hand the slot back to the writer
+                decoded_audio = self._decode_audio(chunk)
+                self.audio_ring.release_frame()
+                self._report_ring_drops()
 
-                    while len(self.buffer) >= self.CHUNK_SIZE:
-                        chunk = bytes(self.buffer[:self.CHUNK_SIZE])
-                        self.buffer = self.buffer[self.CHUNK_SIZE:]
+                if self.dg_connection and decoded_audio is not None:
+                    self._deliver_chunk(*self._process_audio_data(decoded_audio))
 
-                        decoded_audio = self._decode_audio(chunk)
-                        if decoded_audio:
-                            processed_chunk = self._process_audio_data(decoded_audio)
-                            self.dg_connection.send(processed_chunk)
-
-            except Empty:
-                continue
             except Exception as e:
+                self.audio_ring.release_frame()
                 logger.error(f"Error in audio processing thread: {e}")
 
+    def _on_rtp_packet(self, packet):
+        """Called by the capture engine or ExternalMedia socket with a view of one RTP datagram."""
+        if self.stop_flag:
+            return
+        for rtp_payload in self.jitter_buffer.push(packet):
+            self.audio_ring.write(rtp_payload)
+        self.packets_received += 1
+        if self.packets_received % 100 == 0:
+            logger.info(f"Processed {self.packets_received} packets for channel {self.channel_id}")
+
     def run(self):
         try:
             logger.info(f"Started processing for channel {self.channel_id} on port {self.rtp_port}")
-
-            def process_packet(packet):
-                if self.stop_flag:
-                    return True
-                if packet.haslayer(IP) and packet.haslayer(UDP):
-                    if packet[UDP].dport == self.rtp_port:
-                        rtp_payload = bytes(packet[UDP].payload)[12:]  # Skip RTP header
-                        if rtp_payload:
-                            self.audio_queue.put(rtp_payload)
-                            self.packets_received += 1
-                            if self.packets_received % 100 == 0:
-                                logger.info(f"Processed {self.packets_received} packets for channel {self.channel_id}")
-                return False
-
-            sniff(filter=f"udp port {self.rtp_port}", prn=process_packet, stop_filter=lambda x: self.stop_flag)
+            if self.media_session:
+                self.media_session.serve(self._on_rtp_packet, lambda: self.stop_flag)
+            else:
+                rtp_capture_engine.register(self.rtp_port, self._on_rtp_packet)
+                while not self.stop_flag:
+                    time.sleep(0.1)
 
         except Exception as e:
             logger.error(f"Error in receiver for channel {self.channel_id}: {e}")
         finally:
+            if not self.media_session:
+                rtp_capture_engine.unregister(self.rtp_port)
             self.cleanup()
 
     def cleanup(self):
         logger.info(f"Cleaning up channel {self.channel_id}")
+        logger.info(f"RTP stats for channel {self.channel_id}: {self.jitter_buffer.stats()}")
+        logger.info(f"Ingest buffer stats for channel {self.channel_id}: {self.audio_ring.stats()}")
         self.stop_flag = True
+        self.audio_ring.close()
+        if self.dsp_slot is not None:
+            vad_stats = dsp_scheduler.vad_stats(self.dsp_slot)
+            dsp_scheduler.unregister(self.dsp_slot)
+            self.dsp_slot = None
+        else:
+            vad_stats = self.vad.stats() if self.vad else None
+        if vad_stats:
+            logger.info(f"VAD stats for channel {self.channel_id}: {vad_stats}")
         if self.processing_thread and self.processing_thread.is_alive():
             self.processing_thread.join(timeout=5)
         if self.dg_connection:
             self.dg_connection.finish()
         self.dg_connection = None
+        if self.media_session:
+            self.media_session.close()
+        self.conversation_handler.discard_speculation()
+        self.conversation_handler.tts_handler.stop()
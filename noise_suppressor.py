@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class StreamingNoiseSuppressor:
+    """
+    Stateful spectral-gating noise suppressor.
+
+    Replaces per-chunk noisereduce calls, which re-estimated the noise
+    profile from every isolated 240 ms chunk. The STFT (sqrt-Hann window,
+    50% overlap) and overlap-add state carry over between chunks, so chunk
+    boundaries leave no artifacts. The noise power spectrum is a running
+    average of the frames that look like noise (below `noise_gate` times the
+    current estimate); bins where every frame looks like speech only creep
+    upwards, so speech does not leak into the estimate.
+
+    process() takes chunks of any length but works in whole hops: it
+    returns the largest multiple of `hop` samples it has, delayed by `hop`
+    samples (16 ms at 8 kHz), and keeps the remainder for the next call.
+    Over a stream the output keeps pace with the input; a single chunk
+    that is not a multiple of `hop` comes back shorter or longer. With
+    `channels` > 1 the state is kept per channel and process_rows() handles
+    one chunk of several channels at once (whole hops only).
+    """
+
+    def __init__(self, frame_size: int = 256, prop_decrease: float = 0.8, oversubtraction: float = 1.5,
+                 noise_gate: float = 4.0, noise_smoothing: float = 0.3, noise_rise: float = 0.05,
+                 channels: int = 1):
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.bins = frame_size // 2 + 1
+        self.prop_decrease = prop_decrease
+        self.oversubtraction = oversubtraction
+        self.noise_gate = noise_gate
+        # mean of an exponential distribution truncated at noise_gate times its mean, inverted
+        self.gate_bias = (1 - np.exp(-noise_gate)) / (1 - (1 + noise_gate) * np.exp(-noise_gate))
+        self.noise_smoothing = noise_smoothing
+        self.noise_rise = noise_rise
+        self.channels = channels
+        # sqrt of a periodic Hann window on analysis and synthesis sums to 1 at 50% overlap
+        self.window = np.sqrt(np.hanning(frame_size + 1)[:frame_size]).astype(np.float32)
+        self.input_tail = np.zeros((channels, frame_size - self.hop), dtype=np.float32)
+        self.output_tail = np.zeros((channels, frame_size - self.hop), dtype=np.float32)
+        self.previous_gain = np.ones((channels, self.bins), dtype=np.float32)
+        self.noise_power = np.zeros((channels, self.bins))
+        self.noise_ready = np.zeros(channels, dtype=bool)
+        self.reset()
+
+    def reset(self, rows=slice(None)) -> None:
+        self.input_tail[rows] = 0
+        self.output_tail[rows] = 0
+        self.previous_gain[rows] = 1
+        self.noise_ready[rows] = False
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def _update_noise(self, power: np.ndarray, noise_power: np.ndarray, ready: np.ndarray) -> np.ndarray:
+        median = np.median(power, axis=-2)
+        noise_like = power < self.noise_gate * noise_power[:, np.newaxis]
+        count = noise_like.sum(axis=-2)
+        noise_mean = (power * noise_like).sum(axis=-2) / np.maximum(count, 1) * self.gate_bias
+        # bins without any noise-like frame creep up towards the chunk median,
+        # a quieter estimate is taken at once
+        target = np.where(count > 0, noise_mean, median)
+        rate = np.where(count > 0, self.noise_smoothing, self.noise_rise)
+        rate = np.where(target < noise_power, 1.0, rate)
+        updated = noise_power + rate * (target - noise_power)
+        # a channel's first chunk: median of an exponentially distributed power is ln(2) times its mean
+        return np.where(ready[:, np.newaxis], updated, median / np.log(2))
+
+    def _gains(self, power: np.ndarray, noise_power: np.ndarray, previous_gain: np.ndarray):
+        gain = 1.0 - self.oversubtraction * noise_power[:, np.newaxis] / np.maximum(power, 1e-6)
+        np.clip(gain, 0.0, 1.0, out=gain)
+        gain = 1.0 - self.prop_decrease * (1.0 - gain)
+        # average with the previous frame against musical noise
+        smoothed = np.empty_like(gain)
+        smoothed[:, 0] = 0.5 * (gain[:, 0] + previous_gain)
+        smoothed[:, 1:] = 0.5 * (gain[:, 1:] + gain[:, :-1])
+        return smoothed, gain[:, -1]
+
+    def process_rows(self, rows, samples: np.ndarray) -> np.ndarray:
+        """
+        Suppress noise in a (batch, samples) array, each row continuing its
+        own channel's state. The chunk length must be a multiple of `hop`.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.shape[1] % self.hop:
+            raise ValueError(f"batch chunks must be a multiple of {self.hop} samples")
+        stream = np.concatenate((self.input_tail[rows], samples), axis=1)
+        self.input_tail[rows] = stream[:, -(self.frame_size - self.hop):]
+        frames = np.lib.stride_tricks.sliding_window_view(stream, self.frame_size, axis=-1)[:, ::self.hop]
+
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        noise_power = self._update_noise(power, self.noise_power[rows], self.noise_ready[rows])
+        self.noise_power[rows] = noise_power
+        self.noise_ready[rows] = True
+        gains, self.previous_gain[rows] = self._gains(power, noise_power, self.previous_gain[rows])
+        spectrum *= gains
+        output_frames = np.fft.irfft(spectrum, n=self.frame_size, axis=-1).astype(np.float32)
+        output_frames *= self.window
+
+        # overlap-add: first half of each frame plus second half of the one before
+        overlap = np.concatenate((self.output_tail[rows][:, np.newaxis], output_frames[:, :-1, self.hop:]), axis=1)
+        output = output_frames[:, :, :self.hop] + overlap
+        self.output_tail[rows] = output_frames[:, -1, self.hop:]
+        return output.reshape(len(samples), -1)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Suppress noise in one chunk of channel 0, any length."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if len(self.pending):
+            samples = np.concatenate((self.pending, samples))
+        usable = len(samples) - len(samples) % self.hop
+        self.pending = samples[usable:].copy()
+        if usable == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.process_rows(slice(0, 1), samples[np.newaxis, :usable])[0]
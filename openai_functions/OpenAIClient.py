@@ -1,10 +1,11 @@
 # openai_client.py
 import openai
 from threading import Lock
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, OPENAI_BASE_URL
 import os
 import json
 from openai_functions.prompts import assistant_instructions
+from openai_functions.assistant_functions import TRACK_ORDER_TOOL
 from utils import logger
 
 class OpenAIClient:
@@ -21,10 +22,17 @@ class OpenAIClient:
                 cls._instance.vector_store_id = None
             return cls._instance
 
+    def connect(self):
+        """Initializes the OpenAI client alone, for the chat backend that needs no assistant."""
+        with self._lock:
+            if self.client is None:
+                self.client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        return self.client
+
     def create_assistant(self):
         """Initializes the OpenAI client and stores the assistant ID."""
         if self.client is None:
-            self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+            self.connect()
             
             assistant_file_path = 'assistant.json'
 
@@ -60,29 +68,7 @@ class OpenAIClient:
                 assistant = self.client.beta.assistants.create(
                     instructions=assistant_instructions,
                     model="gpt-4o",
-                    tools=[{
-                        "type": "file_search",
-                        "type": "function",
-                        "function": {
-                            "name": "track_order",
-                            "description": "Tracking orders by customer's either: 1. Phone number 2. Email 3. Order number",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "order_identifier": {
-                                        "type": "string",
-                                        "description": "The customer's either email, phone number or order number"
-                                    }
-                                },
-                                "required": [
-                                    "order_identifier"
-                                ],
-                                "additionalProperties": False
-                            },
-                                "strict": True
-                        },
-                    }
-                    ],
+                    tools=[TRACK_ORDER_TOOL],
                     tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}},
                 )
 
@@ -7,21 +7,24 @@ from openai_functions.OpenAIClient import openai_client
 from openai_functions.assistant_functions import track_order
 import time
 
-class OpenAI_EventHandler(AssistantEventHandler):
-    def __init__(self, conversation_handler):
-        super().__init__()
+class SentenceStreamer:
+    """
+    Cuts streamed reply text into sentences and sends each to TTS as soon as
+    it ends, so playback starts before the reply is complete. Shared by the
+    Assistants event handler and the chat engine.
+    """
+
+    def __init__(self, conversation_handler, trace=None):
         self.conversation_handler = conversation_handler
+        self.trace = trace
         self.current_sentence = ""
-        
-    @override
-    def on_text_created(self, text) -> None:
-        full_response = text
-        
-    @override
-    def on_text_delta(self, delta, snapshot):
-        
+
+    def feed(self, text: str) -> None:
+        if self.trace:
+            self.trace.mark("first_text_delta")
+
         # Add new text to our current sentence
-        self.current_sentence += delta.value
+        self.current_sentence += text
         
         # Look for sentence endings
         if any(ending in self.current_sentence for ending in ['.', '!', '?']):
@@ -35,12 +38,61 @@ class OpenAI_EventHandler(AssistantEventHandler):
             if last_end != -1 and not self.conversation_handler.is_interrupted:
                 # Get the complete sentence
                 complete_sentence = self.current_sentence[:last_end + 1].strip()
-                # Keep the remaining text
-                self.current_sentence = self.current_sentence[last_end + 1:].strip()
+                # Keep the remaining text, its trailing space separates it from the next delta
+                self.current_sentence = self.current_sentence[last_end + 1:].lstrip()
                 
                 # Send to TTS if it's a valid sentence and we haven't exceeded responses
                 if complete_sentence:
-                    self.conversation_handler.tts_handler.synthesize_and_play(complete_sentence)
+                    self._speak(complete_sentence)
+
+    def flush(self) -> None:
+        # an answer can end without punctuation, speak what is left of it
+        remainder = self.current_sentence.strip()
+        self.current_sentence = ""
+        if remainder and not self.conversation_handler.is_interrupted:
+            self._speak(remainder)
+
+    def _speak(self, sentence: str) -> None:
+        if self.trace:
+            self.trace.mark("first_sentence_to_tts")
+        self.conversation_handler.tts_handler.synthesize_and_play(sentence, trace=self.trace)
+
+
+def run_track_order(conversation_handler, trace, arguments: str) -> str:
+    """The track_order tool call: tells the caller to wait and returns the output for the model."""
+    if trace:
+        trace.mark("first_sentence_to_tts")
+    conversation_handler.tts_handler.synthesize_and_play("Проследявам поръчката Ви... Един момент..", trace=trace)
+    time.sleep(3.3)
+
+    # arguments = json.loads(arguments)
+    # order_identifier = arguments.get("order_identifier")
+    # logger.info(f"Tracking order: {order_identifier}")
+    
+    # order_info = track_order(order_identifier)
+    # logger.info(f"Order info: {order_info}")
+    # return json.dumps(order_info, ensure_ascii=False)
+    return "не е намерина такава поръчка"
+
+
+class OpenAI_EventHandler(AssistantEventHandler):
+    def __init__(self, conversation_handler, trace=None):
+        super().__init__()
+        self.conversation_handler = conversation_handler
+        self.trace = trace
+        self.sentences = SentenceStreamer(conversation_handler, trace)
+        
+    @override
+    def on_text_created(self, text) -> None:
+        full_response = text
+        
+    @override
+    def on_text_delta(self, delta, snapshot):
+        self.sentences.feed(delta.value)
+
+    @override
+    def on_text_done(self, text) -> None:
+        self.sentences.flush()
         
     @override
     def on_tool_call_created(self, tool_call):
@@ -59,17 +111,8 @@ class OpenAI_EventHandler(AssistantEventHandler):
             
         for tool in data.required_action.submit_tool_outputs.tool_calls:
             if tool.function.name == "track_order":
-                self.conversation_handler.tts_handler.synthesize_and_play("Проследявам поръчката Ви... Един момент..")
-                time.sleep(3.3)
-
-                # arguments = json.loads(tool.function.arguments)
-                # order_identifier = arguments.get("order_identifier")
-                # logger.info(f"Tracking order: {order_identifier}")
-                
-                # order_info = track_order(order_identifier)
-                # logger.info(f"Order info: {order_info}")
-                # tool_outputs.append({"tool_call_id": tool.id, "output": order_info})
-                tool_outputs.append({"tool_call_id": tool.id, "output": "не е намерина такава поръчка"})
+                output = run_track_order(self.conversation_handler, self.trace, tool.function.arguments)
+                tool_outputs.append({"tool_call_id": tool.id, "output": output})
                 
             elif tool.function.name == "escalate_to_human":
                 logger.info("Assistant requested to end the conversation.")
@@ -85,7 +128,7 @@ class OpenAI_EventHandler(AssistantEventHandler):
             thread_id=self.current_run.thread_id,
             run_id=self.current_run.id,
             tool_outputs=tool_outputs,
-            event_handler=OpenAI_EventHandler(self.conversation_handler),
+            event_handler=OpenAI_EventHandler(self.conversation_handler, self.trace),
         ) as stream:
             stream.until_done()
 
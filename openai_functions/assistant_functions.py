@@ -13,6 +13,29 @@ SHOP_NAME = 'ballistic-sport.myshopify.com'
 # Base URL for Shopify API requests
 BASE_URL = f"https://{API_KEY}:{PASSWORD}@{SHOP_NAME}/admin/api/{API_VERSION}/"
 
+# track_order() as a function tool, the same definition for the assistant and the chat backend
+TRACK_ORDER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "track_order",
+        "description": "Tracking orders by customer's either: 1. Phone number 2. Email 3. Order number",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "order_identifier": {
+                    "type": "string",
+                    "description": "The customer's either email, phone number or order number"
+                }
+            },
+            "required": [
+                "order_identifier"
+            ],
+            "additionalProperties": False
+        },
+        "strict": True
+    },
+}
+
 def get_order_details_by_id(order_id):
     order_url = f"{BASE_URL}orders/{order_id}.json"
     fulfillment_url = f"{BASE_URL}orders/{order_id}/fulfillments.json"
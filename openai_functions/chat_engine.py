@@ -0,0 +1,199 @@
+"""
+Chat Completions backend (LLM_BACKEND=chat).
+
+The Assistants backend spends two round trips per turn (add the message to
+the thread, then start a run) and keeps the conversation on OpenAI's side.
+Here each call keeps its own history in memory and a turn is a single
+streamed chat.completions request.
+
+The request always starts with the same system prompt, so OpenAI's prompt
+cache applies to it. The per-call details go into a second system message
+after it, and the turns follow. The passages of the local knowledge index
+that match the caller's turn take the place of the Assistants file_search.
+They go in a system message right before that turn and are not kept in
+the history, so the earlier turns stay a cacheable prefix.
+"""
+import json
+from config import CHAT_MODEL, CHAT_HISTORY_MAX_MESSAGES, KNOWLEDGE_TOP_K
+from knowledge_index import knowledge_index
+from metrics import metrics
+from openai_functions.OpenAIClient import openai_client
+from openai_functions.OpenAI_EventHandler import SentenceStreamer, run_track_order
+from openai_functions.assistant_functions import TRACK_ORDER_TOOL
+from openai_functions.prompts import assistant_instructions
+from utils import logger
+
+# tool rounds allowed in one turn before the model has to answer in text
+MAX_TOOL_ROUNDS = 3
+
+llm_requests = metrics.counter("voicebot_llm_requests_total", "Chat Completions requests", labels=("outcome",))
+llm_prompt_tokens = metrics.counter("voicebot_llm_prompt_tokens_total",
+                                    "Prompt tokens sent to Chat Completions, by whether the prompt cache served them",
+                                    labels=("cached",))
+
+TOOLS = {"track_order": run_track_order}
+
+
+class ChatEngine:
+    """
+    One call's conversation for the Chat Completions backend.
+
+    respond() adds the caller's turn to the history and streams the reply
+    through the same sentence splitting as the Assistants event handler.
+    It runs any track_order call and streams again with the tool's output,
+    until the model answers in text. Only the last `max_history` messages
+    are sent, trimmed at a user turn so that no tool call is cut off
+    from its output.
+    """
+
+    def __init__(self, caller_number, model: str = CHAT_MODEL, max_history: int = CHAT_HISTORY_MAX_MESSAGES,
+                 client=None, knowledge=knowledge_index, knowledge_k: int = KNOWLEDGE_TOP_K):
+        self.client = client or openai_client.connect()
+        self.model = model
+        self.max_history = max_history
+        self.knowledge = knowledge
+        self.knowledge_k = knowledge_k
+        self.system = [
+            {"role": "system", "content": assistant_instructions},
+            {"role": "system", "content": f"The person is calling from this number: {caller_number}"},
+        ]
+        self.history = []
+
+    def respond(self, text: str, conversation_handler, trace=None, draft: tuple = None) -> None:
+        """
+        draft, if given, is (reply text, tool calls) of a committed
+        speculative reply: it was already streamed and spoken, so it stands
+        in for the first request and the turn goes on from its tool calls.
+        """
+        turn_start = len(self.history)
+        self.history.append({"role": "user", "content": text})
+        knowledge = self._knowledge(text)
+        for _ in range(MAX_TOOL_ROUNDS + 1):
+            if draft:
+                (content, tool_calls), draft = draft, None
+            else:
+                messages = self.system + self.history[:turn_start] + knowledge + self.history[turn_start:]
+                content, tool_calls = self._stream(messages, conversation_handler, trace)
+            interrupted = conversation_handler.is_interrupted
+            message = {"role": "assistant", "content": content or None}
+            # a tool call cut off by barge-in is forgotten, its output would never be sent
+            if tool_calls and not interrupted:
+                message["tool_calls"] = [
+                    {"id": call["id"], "type": "function",
+                     "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    for call in tool_calls
+                ]
+            if message["content"] or "tool_calls" in message:
+                self.history.append(message)
+            if "tool_calls" not in message:
+                break
+            for call in tool_calls:
+                self.history.append({"role": "tool", "tool_call_id": call["id"],
+                                     "content": self._run_tool(call, conversation_handler, trace)})
+        self._trim()
+
+    def draft(self, text: str, conversation_handler, usage: dict = None):
+        """
+        Stream a reply to text without adding anything to the history
+        (speculative replies). Returns (reply text, tool calls); the tool
+        calls are not run.
+        """
+        messages = self.system + self.history + self._knowledge(text) + [{"role": "user", "content": text}]
+        return self._stream(messages, conversation_handler, None, usage)
+
+    def add_exchange(self, text: str, answer: str) -> None:
+        """A turn answered outside respond() (FAQ fast path, speculative reply), kept so later turns see it."""
+        self.history.append({"role": "user", "content": text})
+        if answer:
+            self.history.append({"role": "assistant", "content": answer})
+        self._trim()
+
+    def _knowledge(self, text: str) -> list:
+        """The system message with the knowledge passages for this turn, or none."""
+        if self.knowledge is None or self.knowledge_k <= 0:
+            return []
+        context = self.knowledge.context(text, self.knowledge_k)
+        if not context:
+            return []
+        return [{"role": "system",
+                 "content": "Information from the Ballistic Sport knowledge base (your file search results) "
+                            f"for the customer's next message:\n\n{context}"}]
+
+    def _stream(self, messages: list, conversation_handler, trace, usage: dict = None):
+        """
+        One streamed request. Returns (reply text, tool calls). `usage`, if
+        given, is filled with the request's prompt and completion tokens.
+        """
+        sentences = SentenceStreamer(conversation_handler, trace)
+        parts = []
+        calls = {}
+        usage = {} if usage is None else usage
+        # estimates until the usage chunk at the end of the stream, which a stopped stream never gets
+        usage["prompt_tokens"] = sum(len(message.get("content") or "") for message in messages) // 4
+        usage["completion_tokens"] = 0
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=[TRACK_ORDER_TOOL],
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        except Exception:
+            llm_requests.inc(outcome="error")
+            raise
+        if trace:
+            trace.mark("message_created")
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    self._count_usage(chunk.usage)
+                    usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                    usage["completion_tokens"] = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                usage["completion_tokens"] += 1  # a streamed chunk carries about one token
+                if delta.content:
+                    parts.append(delta.content)
+                    sentences.feed(delta.content)
+                for tool_call in delta.tool_calls or ():
+                    # a call arrives in pieces: id and name first, then the arguments a few characters at a time
+                    call = calls.setdefault(tool_call.index, {"id": "", "name": "", "arguments": ""})
+                    call["id"] = tool_call.id or call["id"]
+                    if tool_call.function:
+                        call["name"] += tool_call.function.name or ""
+                        call["arguments"] += tool_call.function.arguments or ""
+                if conversation_handler.is_interrupted:
+                    break
+        finally:
+            stream.close()
+        sentences.flush()
+        llm_requests.inc(outcome="interrupted" if conversation_handler.is_interrupted else "ok")
+        return "".join(parts), [calls[index] for index in sorted(calls)]
+
+    def _run_tool(self, call: dict, conversation_handler, trace) -> str:
+        tool = TOOLS.get(call["name"])
+        if tool is None:
+            logger.error(f"Model called unknown tool {call['name']}")
+            return f"Unknown tool {call['name']}"
+        logger.info(f"Tool call {call['name']}({call['arguments']})")
+        try:
+            return tool(conversation_handler, trace, call["arguments"])
+        except Exception as e:
+            logger.error(f"Error in tool {call['name']}: {e}")
+            return json.dumps({"error": str(e)})
+
+    def _count_usage(self, usage) -> None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        llm_prompt_tokens.inc(cached, cached="yes")
+        llm_prompt_tokens.inc(usage.prompt_tokens - cached, cached="no")
+
+    def _trim(self) -> None:
+        """Drop the oldest turns, whole, until the history fits max_history."""
+        while len(self.history) > self.max_history:
+            next_turn = next((i for i, message in enumerate(self.history) if i > 0 and message["role"] == "user"), None)
+            if next_turn is None:
+                break
+            del self.history[:next_turn]
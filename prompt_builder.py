@@ -0,0 +1,135 @@
+"""
+Builds the audio of the scripted phrases in the phrase manifest.
+
+Every phrase is synthesized into the TTS cache (pinned, so eviction keeps
+it), so the sentence is a cache hit whenever a call says it. A phrase
+with a "name" is also written as <name>.<TTS_FILE_FORMAT> in the sounds
+directory, for prompts played by name such as start_message. Phrases
+already in the cache, and named files built from the same content, are
+skipped, so running it again only synthesizes what changed.
+
+    python prompt_builder.py [--manifest phrases.json] [--workers 4] [--force]
+
+The answers of the FAQ fast path (faq.json) are built along with the
+manifest, so a matched question plays from the cache.
+
+main.py runs the same build at startup (PROMPT_PREWARM).
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import PROMPT_MANIFEST, PROMPT_BUILD_WORKERS
+from tts_cache import tts_cache, cache_key, write_sound
+from tts_handler import synthesize
+from faq_matcher import faq_matcher
+from utils import logger
+
+# name -> cache key each named prompt file was last written from
+BUILT_NAMES_FILE = ".prompts.json"
+
+
+def load_manifest(path: str = PROMPT_MANIFEST) -> list:
+    """The manifest's phrases: a JSON list of {"text": ..., "name": optional file name}."""
+    with open(path, encoding="utf-8") as f:
+        phrases = json.load(f)
+    for phrase in phrases:
+        if not phrase.get("text", "").strip():
+            raise ValueError(f"Phrase without text in {path}: {phrase}")
+    return phrases
+
+
+def load_phrases(path: str = PROMPT_MANIFEST) -> list:
+    """The manifest's phrases followed by the FAQ answers."""
+    return load_manifest(path) + faq_matcher.phrases()
+
+
+def _load_built_names() -> dict:
+    try:
+        with open(os.path.join(tts_cache.directory, BUILT_NAMES_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_built_names(built: dict) -> None:
+    path = os.path.join(tts_cache.directory, BUILT_NAMES_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(built, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _build_phrase(phrase: dict, force: bool, synthesize_missing: bool):
+    """Make sure the phrase is cached. Returns (outcome, PCM or None)."""
+    text = phrase["text"]
+    key = cache_key(text)
+    if not force and tts_cache.contains(key):
+        tts_cache.pin(key)
+        return "unchanged", tts_cache.preload(key)
+    if not synthesize_missing:
+        return "missing", None
+    try:
+        pcm = synthesize(text)
+    except Exception as e:
+        logger.error(f"Failed to synthesize phrase '{text}': {e}")
+        return "failed", None
+    tts_cache.put(key, pcm, text, pinned=True)
+    return "synthesized", pcm
+
+
+def build_prompts(phrases: list, workers: int = PROMPT_BUILD_WORKERS, force: bool = False,
+                  synthesize_missing: bool = True) -> dict:
+    """
+    Cache every phrase, synthesizing the missing ones `workers` at a time,
+    and write the named ones. With synthesize_missing=False only loads
+    what is cached into memory (worker processes). Returns the number of
+    phrases per outcome.
+    """
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda phrase: _build_phrase(phrase, force, synthesize_missing), phrases))
+
+    built = _load_built_names()
+    counts = {}
+    for phrase, (outcome, pcm) in zip(phrases, results):
+        counts[outcome] = counts.get(outcome, 0) + 1
+        name = phrase.get("name")
+        if not name or pcm is None:
+            continue
+        key = cache_key(phrase["text"])
+        path = os.path.join(tts_cache.directory, f"{name}.{tts_cache.file_format}")
+        if not force and built.get(name) == key and os.path.exists(path):
+            continue
+        try:
+            write_sound(path + ".tmp", pcm, tts_cache.file_format)
+            os.replace(path + ".tmp", path)
+            built[name] = key
+            logger.info(f"Wrote prompt {path}")
+        except OSError as e:
+            logger.error(f"Error writing prompt {path}: {e}")
+    if synthesize_missing:
+        _save_built_names(built)
+        tts_cache.unpin_except(cache_key(phrase["text"]) for phrase in phrases)
+
+    logger.info(f"Built {len(phrases)} prompts in {time.monotonic() - started:.1f} s: "
+                + ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
+    return counts
+
+
+def prewarm_prompts(synthesize_missing: bool = True) -> None:
+    """Startup stage: build the manifest's prompts, never fatal."""
+    try:
+        build_prompts(load_phrases(), synthesize_missing=synthesize_missing)
+    except Exception as e:
+        logger.error(f"Prompt prewarm failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthesize the scripted phrases into the TTS cache")
+    parser.add_argument("--manifest", default=PROMPT_MANIFEST)
+    parser.add_argument("--workers", type=int, default=PROMPT_BUILD_WORKERS)
+    parser.add_argument("--force", action="store_true", help="synthesize every phrase again")
+    args = parser.parse_args()
+    counts = build_prompts(load_phrases(args.manifest), workers=args.workers, force=args.force)
+    raise SystemExit(1 if counts.get("failed") else 0)
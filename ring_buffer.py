@@ -0,0 +1,109 @@
+import threading
+
+
+class FrameRingBuffer:
+    """
+    Fixed-capacity byte ring between a channel's RTP receive path and its
+    audio processing thread.
+
+    The buffer is allocated once and holds `capacity_frames` frames of
+    `frame_size` bytes. Frames are read as zero-copy memoryviews: since the
+    capacity is a whole number of frames and reads always start on a frame
+    boundary, a frame never wraps. The frame handed to the reader stays
+    pinned until release_frame(), so the writer never overwrites it.
+
+    When the reader falls behind, the oldest unread frames are dropped to
+    make room and counted in frames_dropped, so memory stays flat however
+    long the consumer stalls. While a frame is pinned the space behind it
+    cannot be reused, so a write that does not fit is dropped instead; the
+    reader should release frames as soon as it has copied them out.
+    """
+
+    def __init__(self, frame_size: int, capacity_frames: int):
+        if capacity_frames < 3:
+            raise ValueError("capacity_frames must be at least 3")
+        self.frame_size = frame_size
+        self.capacity = frame_size * capacity_frames
+        self.buffer = bytearray(self.capacity)
+        self.view = memoryview(self.buffer)
+        # absolute byte offsets, positions in the ring are taken modulo capacity
+        self.read_pos = 0
+        self.write_pos = 0
+        self.pinned = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.bytes_written = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.bytes_dropped = 0
+        self.max_backlog = 0
+
+    def _oldest(self) -> int:
+        return self.read_pos if self.pinned is None else self.pinned
+
+    def write(self, data) -> None:
+        data = memoryview(data).cast("B")
+        n = len(data)
+        with self.condition:
+            if self.pinned is None:
+                # drop whole unread frames, oldest first, until the data fits
+                while (self.write_pos + n - self.read_pos > self.capacity
+                       and self.write_pos - self.read_pos >= self.frame_size):
+                    self.read_pos += self.frame_size
+                    self.frames_dropped += 1
+                    self.bytes_dropped += self.frame_size
+
+            if self.write_pos + n - self._oldest() > self.capacity:
+                # the reader holds the oldest frame, space behind it cannot be reused yet
+                self.bytes_dropped += n
+                return
+
+            start = self.write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self.view[start:start + first] = data[:first]
+            if first < n:
+                self.view[:n - first] = data[first:n]
+            self.write_pos += n
+            self.bytes_written += n
+            self.max_backlog = max(self.max_backlog, self.write_pos - self.read_pos)
+
+            if self.write_pos - self.read_pos >= self.frame_size:
+                self.condition.notify()
+
+    def read_frame(self, timeout=None):
+        """
+        Wait for a full frame and return it as a memoryview into the ring,
+        or None on timeout or close. Call release_frame() when done with it.
+        """
+        with self.condition:
+            self.pinned = None
+            ready = self.condition.wait_for(
+                lambda: self.closed or self.write_pos - self.read_pos >= self.frame_size,
+                timeout,
+            )
+            if not ready or self.write_pos - self.read_pos < self.frame_size:
+                return None
+            start = self.read_pos % self.capacity
+            self.pinned = self.read_pos
+            self.read_pos += self.frame_size
+            self.frames_read += 1
+            return self.view[start:start + self.frame_size]
+
+    def release_frame(self) -> None:
+        with self.condition:
+            self.pinned = None
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "bytes_dropped": self.bytes_dropped,
+            "backlog_bytes": self.write_pos - self.read_pos,
+            "max_backlog_bytes": self.max_backlog,
+            "capacity_bytes": self.capacity,
+        }
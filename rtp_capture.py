@@ -0,0 +1,236 @@
+import ctypes
+import mmap
+import select
+import socket
+import struct
+import threading
+from config import (
+    RTP_CAPTURE_INTERFACE,
+    RTP_CAPTURE_FRAME_SIZE,
+    RTP_CAPTURE_BLOCK_SIZE,
+    RTP_CAPTURE_BLOCK_COUNT,
+    RTP_PORT_MIN,
+    RTP_PORT_MAX,
+)
+from utils import logger
+
+# Linux packet socket constants (linux/if_packet.h, linux/if_ether.h)
+ETH_P_IP = 0x0800
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V2 = 1
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+SO_ATTACH_FILTER = 26
+
+# struct tpacket2_hdr: status, len, snaplen, mac, net, sec, nsec, vlan_tci, vlan_tpid, padding
+TPACKET2_HDR = struct.Struct("IIIHHIIHH4x")
+# struct sockaddr_ll follows the aligned header, sll_pkttype sits at byte 10 of it
+SLL_PKTTYPE_OFFSET = TPACKET2_HDR.size + 10
+
+IPPROTO_UDP = 17
+RTP_HEADER_SIZE = 12
+
+
+def build_udp_port_filter(port_min: int, port_max: int) -> bytes:
+    """
+    Classic BPF program accepting unfragmented IPv4/UDP datagrams whose
+    destination port is in [port_min, port_max]. The socket is SOCK_DGRAM,
+    so offsets are relative to the IP header.
+    """
+    program = [
+        (0x30, 0, 0, 9),            # ldb [9]             ; IP protocol
+        (0x15, 0, 6, IPPROTO_UDP),  # jeq #17             ; else drop
+        (0x28, 0, 0, 6),            # ldh [6]             ; flags + fragment offset
+        (0x45, 4, 0, 0x1FFF),       # jset #0x1fff        ; fragment -> drop
+        (0xB1, 0, 0, 0),            # ldxb 4*([0]&0xf)    ; x = IP header length
+        (0x48, 0, 0, 2),            # ldh [x+2]           ; UDP destination port
+        (0x35, 0, 1, port_min),     # jge #port_min       ; else drop
+        (0x25, 0, 1, port_max),     # jgt #port_max       ; drop, else accept
+        (0x06, 0, 0, 0),            # ret #0              ; drop
+        (0x06, 0, 0, 0x40000),      # ret #262144         ; accept
+    ]
+    return b"".join(struct.pack("HBBI", *instruction) for instruction in program)
+
+
+def parse_udp_packet(buf, offset: int, length: int):
+    """
+    Parse an IPv4/UDP datagram by fixed offsets.
+
+    Returns (destination_port, payload_start, payload_end) relative to buf,
+    or None when the packet is not a complete IPv4/UDP datagram.
+    """
+    if length < 28:
+        return None
+    version_ihl = buf[offset]
+    if version_ihl >> 4 != 4 or buf[offset + 9] != IPPROTO_UDP:
+        return None
+    udp = offset + (version_ihl & 0x0F) * 4
+    dst_port = (buf[udp + 2] << 8) | buf[udp + 3]
+    udp_length = (buf[udp + 4] << 8) | buf[udp + 5]
+    payload_end = min(udp + udp_length, offset + length)
+    payload_start = udp + 8
+    if payload_end <= payload_start:
+        return None
+    return dst_port, payload_start, payload_end
+
+
+class RTPCaptureEngine:
+    """
+    Process-wide RTP capture shared by every call.
+
+    One AF_PACKET socket with a kernel BPF filter and an mmap'd TPACKET_V2
+    ring replaces the per-call scapy sniff(). Packets are parsed by offset
+    and the raw UDP payload (RTP header included) is handed to the handler
+    registered for the destination port as a memoryview into the ring.
+    The view is only valid during the callback, handlers must copy what
+    they keep.
+    """
+
+    def __init__(self, interface=RTP_CAPTURE_INTERFACE, port_min=RTP_PORT_MIN, port_max=RTP_PORT_MAX):
+        self.interface = interface
+        self.port_min = port_min
+        self.port_max = port_max
+        self.handlers = {}
+        self.handlers_lock = threading.Lock()
+        self.packets_captured = 0
+        self.packets_unclaimed = 0
+        self.sock = None
+        self.ring = None
+        self.frame_count = 0
+        self.thread = None
+        self.stop_flag = False
+
+    def register(self, port: int, handler) -> None:
+        """Route packets for a destination port to handler(memoryview)."""
+        with self.handlers_lock:
+            handlers = dict(self.handlers)
+            handlers[port] = handler
+            self.handlers = handlers
+        self.start()
+
+    def unregister(self, port: int) -> None:
+        with self.handlers_lock:
+            if port in self.handlers:
+                handlers = dict(self.handlers)
+                del handlers[port]
+                self.handlers = handlers
+
+    def start(self) -> None:
+        with self.handlers_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.stop_flag = False
+            # a ring thread that died leaves its socket and ring behind
+            self._close_socket()
+            self._open_socket()
+            target = self._run_ring if self.ring is not None else self._run_recv
+            self.thread = threading.Thread(target=target, daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_flag = True
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        self.thread = None
+        self._close_socket()
+
+    def _close_socket(self) -> None:
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _open_socket(self) -> None:
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(ETH_P_IP))
+        if self.interface:
+            self.sock.bind((self.interface, ETH_P_IP))
+
+        bpf = build_udp_port_filter(self.port_min, self.port_max)
+        bpf_buffer = ctypes.create_string_buffer(bpf)
+        fprog = struct.pack("HL", len(bpf) // 8, ctypes.addressof(bpf_buffer))
+        self.sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+        try:
+            frames_per_block = RTP_CAPTURE_BLOCK_SIZE // RTP_CAPTURE_FRAME_SIZE
+            frame_count = frames_per_block * RTP_CAPTURE_BLOCK_COUNT
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            self.sock.setsockopt(
+                SOL_PACKET,
+                PACKET_RX_RING,
+                struct.pack("IIII", RTP_CAPTURE_BLOCK_SIZE, RTP_CAPTURE_BLOCK_COUNT,
+                            RTP_CAPTURE_FRAME_SIZE, frame_count),
+            )
+            self.ring = mmap.mmap(
+                self.sock.fileno(),
+                RTP_CAPTURE_BLOCK_SIZE * RTP_CAPTURE_BLOCK_COUNT,
+                mmap.MAP_SHARED,
+                mmap.PROT_READ | mmap.PROT_WRITE,
+            )
+            self.frame_count = frame_count
+            logger.info(f"RTP capture engine using a {frame_count}-frame mmap ring on {self.interface or 'all interfaces'}")
+        except OSError as e:
+            self.ring = None
+            logger.error(f"RX ring unavailable ({e}), RTP capture falls back to recv_into")
+
+    def _dispatch(self, buf, offset: int, length: int) -> None:
+        parsed = parse_udp_packet(buf, offset, length)
+        if parsed is None:
+            return
+        dst_port, payload_start, payload_end = parsed
+        self.packets_captured += 1
+        handler = self.handlers.get(dst_port)
+        if handler is None:
+            self.packets_unclaimed += 1
+            return
+        try:
+            handler(buf[payload_start:payload_end])
+        except Exception as e:
+            logger.error(f"Error in RTP handler for port {dst_port}: {e}")
+
+    def _run_ring(self) -> None:
+        ring = self.ring
+        view = memoryview(ring)
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN | select.POLLERR)
+        frame = 0
+        try:
+            while not self.stop_flag:
+                base = frame * RTP_CAPTURE_FRAME_SIZE
+                status, _, snaplen, _, net, _, _, _, _ = TPACKET2_HDR.unpack_from(ring, base)
+                if not status & TP_STATUS_USER:
+                    poller.poll(100)
+                    continue
+
+                if ring[base + SLL_PKTTYPE_OFFSET] != PACKET_OUTGOING:
+                    self._dispatch(view, base + net, snaplen)
+
+                struct.pack_into("I", ring, base, TP_STATUS_KERNEL)
+                frame = (frame + 1) % self.frame_count
+        except Exception as e:
+            logger.error(f"RTP capture engine stopped: {e}")
+        finally:
+            view.release()
+
+    def _run_recv(self) -> None:
+        buffer = bytearray(RTP_CAPTURE_FRAME_SIZE)
+        view = memoryview(buffer)
+        self.sock.settimeout(0.1)
+        while not self.stop_flag:
+            try:
+                length, address = self.sock.recvfrom_into(buffer)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                logger.error(f"RTP capture engine stopped: {e}")
+                break
+            if address[2] != PACKET_OUTGOING:
+                self._dispatch(view, 0, length)
+
+
+# Global instance
+rtp_capture_engine = RTPCaptureEngine()
@@ -0,0 +1,214 @@
+import math
+import threading
+import time
+from collections import deque
+from utils import logger
+
+RTP_VERSION = 2
+RTP_FIXED_HEADER_SIZE = 12
+PAYLOAD_TYPE_PCMU = 0
+PAYLOAD_TYPE_PCMA = 8
+SILENCE_BYTE = {"PCMU": 0xFF, "PCMA": 0xD5}
+MAX_DROPOUT = 3000  # sequence jump treated as a stream restart (RFC 3550 A.1)
+
+
+class RTPPacket:
+    __slots__ = ("marker", "payload_type", "seq", "timestamp", "ssrc", "payload")
+
+    def __init__(self, marker, payload_type, seq, timestamp, ssrc, payload):
+        self.marker = marker
+        self.payload_type = payload_type
+        self.seq = seq
+        self.timestamp = timestamp
+        self.ssrc = ssrc
+        self.payload = payload
+
+
+def parse_rtp(packet):
+    """
+    Parse an RTP datagram (RFC 3550), honouring CSRC count, header
+    extension and padding. Returns an RTPPacket whose payload is a slice
+    of the input, or None for malformed packets.
+    """
+    length = len(packet)
+    if length < RTP_FIXED_HEADER_SIZE:
+        return None
+    first, second = packet[0], packet[1]
+    if first >> 6 != RTP_VERSION:
+        return None
+
+    start = RTP_FIXED_HEADER_SIZE + (first & 0x0F) * 4
+    if first & 0x10:  # header extension: 16-bit profile, 16-bit length in words
+        if length < start + 4:
+            return None
+        start += 4 + ((packet[start + 2] << 8) | packet[start + 3]) * 4
+    end = length
+    if first & 0x20:  # padding, last byte holds the padding length
+        end -= packet[length - 1]
+    if end < start:
+        return None
+
+    return RTPPacket(
+        marker=bool(second & 0x80),
+        payload_type=second & 0x7F,
+        seq=(packet[2] << 8) | packet[3],
+        timestamp=(packet[4] << 24) | (packet[5] << 16) | (packet[6] << 8) | packet[7],
+        ssrc=(packet[8] << 24) | (packet[9] << 16) | (packet[10] << 8) | packet[11],
+        payload=packet[start:end],
+    )
+
+
+class JitterBuffer:
+    """
+    Reorders RTP packets of one channel by sequence number.
+
+    In-order packets are released immediately. When a packet is missing the
+    buffer waits for it until `target_depth` later packets have arrived,
+    then conceals the gap: the previous frame is repeated once and longer
+    gaps are filled with silence. The wait depth adapts to the RFC 3550
+    interarrival jitter estimate.
+    """
+
+    def __init__(self, codec="PCMU", clock_rate=8000, frame_ms=20, min_depth=2, max_depth=10):
+        self.codec = codec
+        self.clock_rate = clock_rate
+        self.frame_ms = frame_ms
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.silence_byte = SILENCE_BYTE.get(codec, 0xFF)
+        self.lock = threading.Lock()
+
+        self.packets = {}
+        self.next_seq = None
+        self.highest_seq = None
+        self.ssrc = None
+        self.last_payload = b""
+        self.frame_size = clock_rate * frame_ms // 1000
+        self.concealed_seqs = deque(maxlen=64)
+        self.played_seqs = deque(maxlen=64)
+        self.last_transit = None
+        self.jitter = 0.0  # in timestamp units
+
+        self.received = 0
+        self.released = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.late = 0
+        self.lost = 0
+        self.concealed = 0
+        self.resyncs = 0
+
+    @property
+    def jitter_ms(self) -> float:
+        return self.jitter * 1000 / self.clock_rate
+
+    @property
+    def target_depth(self) -> int:
+        depth = self.min_depth + math.ceil(2 * self.jitter_ms / self.frame_ms)
+        return min(depth, self.max_depth)
+
+    def _extend(self, seq: int) -> int:
+        """Map a 16-bit sequence number onto the extended sequence space."""
+        delta = (seq - self.highest_seq) & 0xFFFF
+        if delta >= 0x8000:
+            delta -= 0x10000
+        return self.highest_seq + delta
+
+    def _payload_for(self, rtp: RTPPacket) -> bytes:
+        if rtp.payload_type in (PAYLOAD_TYPE_PCMU, PAYLOAD_TYPE_PCMA):
+            return bytes(rtp.payload)
+        # Comfort noise, telephone events etc. still occupy a sequence slot
+        return bytes([self.silence_byte]) * (len(self.last_payload) or self.frame_size)
+
+    def _conceal(self) -> bytes:
+        self.lost += 1
+        self.concealed += 1
+        self.concealed_seqs.append(self.next_seq)
+        if self.last_payload and self.next_seq - 1 not in self.concealed_seqs:
+            return self.last_payload
+        return bytes([self.silence_byte]) * (len(self.last_payload) or self.frame_size)
+
+    def _release(self, force: bool = False) -> list:
+        ready = []
+        if not force and not self.released and len(self.packets) < self.min_depth:
+            return ready  # prime with a few packets so early reordering is caught
+        while self.packets:
+            payload = self.packets.pop(self.next_seq, None)
+            if payload is None:
+                if not force and self.highest_seq - self.next_seq < self.target_depth:
+                    break
+                payload = self._conceal()
+            else:
+                self.last_payload = payload
+                self.played_seqs.append(self.next_seq)
+            ready.append(payload)
+            self.released += 1
+            self.next_seq += 1
+        return ready
+
+    def _update_jitter(self, rtp: RTPPacket, arrival: float) -> None:
+        transit = arrival * self.clock_rate - rtp.timestamp
+        if self.last_transit is not None and not rtp.marker:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+        self.last_transit = transit
+
+    def push(self, packet, arrival=None) -> list:
+        """Add one RTP datagram, return the payloads that are ready, in order."""
+        rtp = parse_rtp(packet)
+        with self.lock:
+            if rtp is None:
+                self.invalid += 1
+                return []
+            self.received += 1
+
+            if self.next_seq is None:
+                self.ssrc = rtp.ssrc
+                self.next_seq = self.highest_seq = rtp.seq
+
+            ext_seq = self._extend(rtp.seq)
+            if rtp.ssrc != self.ssrc or abs(ext_seq - self.highest_seq) > MAX_DROPOUT:
+                logger.info(f"RTP stream restarted (ssrc {self.ssrc:#x} -> {rtp.ssrc:#x}, seq {rtp.seq})")
+                ready = self._release(force=True)
+                self.resyncs += 1
+                self.ssrc = rtp.ssrc
+                self.next_seq = self.highest_seq = ext_seq = rtp.seq
+                self.last_transit = None
+            else:
+                ready = []
+
+            if ext_seq < self.next_seq and not self.released:
+                self.next_seq = ext_seq  # arrived before the stream's first packet
+            if ext_seq < self.next_seq:
+                if ext_seq in self.played_seqs:
+                    self.duplicates += 1
+                else:
+                    self.late += 1
+                return ready
+            if ext_seq in self.packets:
+                self.duplicates += 1
+                return ready
+
+            self._update_jitter(rtp, time.monotonic() if arrival is None else arrival)
+            self.packets[ext_seq] = self._payload_for(rtp)
+            self.highest_seq = max(self.highest_seq, ext_seq)
+            ready.extend(self._release())
+            return ready
+
+    def flush(self) -> list:
+        """Release everything still buffered, concealing remaining gaps."""
+        with self.lock:
+            return self._release(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "released": self.released,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "late": self.late,
+            "lost": self.lost,
+            "concealed": self.concealed,
+            "resyncs": self.resyncs,
+            "jitter_ms": round(self.jitter_ms, 2),
+            "target_depth": self.target_depth,
+        }
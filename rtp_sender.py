@@ -0,0 +1,156 @@
+import random
+import struct
+import threading
+import time
+from collections import deque
+from config import RTP_STREAM_PTIME_MS
+from audio_dsp import encode_g711
+from metrics import metrics
+from utils import logger
+
+PAYLOAD_TYPES = {"PCMU": 0, "PCMA": 8}
+SAMPLE_RATE = 8000
+
+packets_sent = metrics.counter("voicebot_rtp_stream_packets_total", "TTS RTP packets sent into calls")
+stream_flushes = metrics.counter("voicebot_rtp_stream_flushes_total", "TTS streams flushed on barge-in")
+send_lateness = metrics.histogram("voicebot_rtp_stream_send_lateness_seconds",
+                                  "How late each TTS RTP packet left against its 20 ms schedule",
+                                  buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05))
+
+
+class RTPStreamSender:
+    """
+    Plays 8 kHz 16-bit PCM into a call as paced G.711 RTP.
+
+    feed() appends audio as it arrives from TTS; a sender thread encodes
+    and sends one `ptime_ms` packet per tick on an absolute schedule, so
+    pacing does not drift with the send cost. Audio fed back to back
+    plays back to back. When the buffer runs dry the talkspurt ends and
+    the next one starts with the marker bit and a timestamp that covers
+    the pause. flush() drops everything not yet sent, for barge-in.
+
+    `address_provider` returns where to send (Asterisk's side of the
+    ExternalMedia channel), or None while it is unknown.
+    """
+
+    def __init__(self, sock, address_provider, codec: str = "PCMU", ptime_ms: int = RTP_STREAM_PTIME_MS,
+                 channel_id: str = ""):
+        self.sock = sock
+        self.address_provider = address_provider
+        self.codec = codec
+        self.payload_type = PAYLOAD_TYPES[codec]
+        self.channel_id = channel_id
+        self.ptime = ptime_ms / 1000
+        self.samples_per_packet = SAMPLE_RATE * ptime_ms // 1000
+        self.frame_bytes = 2 * self.samples_per_packet
+        self.pending = bytearray()  # PCM not sent yet
+        self.carry = b""  # odd trailing byte of the last feed
+        self.fed = 0  # PCM bytes fed since the start
+        self.sent = 0  # PCM bytes sent (or flushed) since the start
+        self.markers = deque()  # (offset in the fed audio, callback run when it starts playing)
+        self.sequence = random.getrandbits(16)
+        self.timestamp = random.getrandbits(32)
+        self.ssrc = random.getrandbits(32)
+        self.condition = threading.Condition()
+        self.stop_flag = False
+        self.warned_no_address = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def feed(self, pcm: bytes, on_start=None) -> None:
+        """Queue PCM for playback. on_start() runs when its first packet is sent."""
+        with self.condition:
+            data = self.carry + pcm
+            whole = len(data) & ~1
+            self.carry = data[whole:]
+            if on_start:
+                self.markers.append((self.fed, on_start))
+            self.pending += data[:whole]
+            self.fed += whole
+            self.condition.notify()
+
+    def flush(self) -> None:
+        """Drop all audio not sent yet, takes effect from the next packet."""
+        with self.condition:
+            if self.pending:
+                stream_flushes.inc()
+            self.sent = self.fed
+            self.pending.clear()
+            self.carry = b""
+            self.markers.clear()
+
+    def is_idle(self) -> bool:
+        return not self.pending
+
+    def _send(self, frame: bytes, marker: bool) -> None:
+        address = self.address_provider()
+        if address is None:
+            if not self.warned_no_address:
+                logger.warning(f"No RTP address for channel {self.channel_id} yet, dropping TTS audio")
+                self.warned_no_address = True
+            return
+        header = struct.pack("!BBHII", 0x80, (0x80 if marker else 0) | self.payload_type,
+                             self.sequence, self.timestamp, self.ssrc)
+        try:
+            self.sock.sendto(header + encode_g711(frame, self.codec), address)
+            packets_sent.inc()
+        except OSError as e:
+            logger.error(f"Error sending TTS RTP for channel {self.channel_id}: {e}")
+
+    def _run(self) -> None:
+        next_at = None  # send time of the next packet, None between talkspurts
+        last_sent_at = None
+        while True:
+            with self.condition:
+                while not self.pending and not self.stop_flag:
+                    next_at = None
+                    self.condition.wait()
+                if self.stop_flag:
+                    return
+
+            now = time.monotonic()
+            marker = next_at is None
+            if marker:
+                next_at = now
+                if last_sent_at is not None:
+                    # the receiver measures the pause by the timestamp, one packet was already counted
+                    self.timestamp = (self.timestamp +
+                                      max(0, int((now - last_sent_at - self.ptime) * SAMPLE_RATE))) & 0xFFFFFFFF
+            elif next_at > now:
+                time.sleep(next_at - now)
+
+            with self.condition:
+                if not self.pending:
+                    continue  # flushed while we slept
+                frame = bytes(self.pending[:self.frame_bytes])
+                del self.pending[:self.frame_bytes]
+                start = self.sent
+                self.sent += len(frame)
+                started = []
+                while self.markers and self.markers[0][0] < self.sent:
+                    offset, callback = self.markers.popleft()
+                    if offset >= start:
+                        started.append(callback)
+
+            if len(frame) < self.frame_bytes:
+                frame += bytes(self.frame_bytes - len(frame))  # end of the audio or an underrun: pad with silence
+            last_sent_at = time.monotonic()
+            send_lateness.observe(max(0.0, last_sent_at - next_at))
+            self._send(frame, marker)
+            for callback in started:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Error in TTS stream callback: {e}")
+
+            self.sequence = (self.sequence + 1) & 0xFFFF
+            self.timestamp = (self.timestamp + self.samples_per_packet) & 0xFFFFFFFF
+            next_at += self.ptime
+            if last_sent_at - next_at > 0.1:
+                next_at = last_sent_at  # fell far behind (machine stalled), do not burst to catch up
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stop_flag = True
+            self.pending.clear()
+            self.condition.notify()
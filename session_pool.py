@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+from config import SESSION_POOL_SIZE, SESSION_POOL_TTL_SECONDS, DG_KEEPALIVE_SECONDS, LLM_BACKEND
+from media_receiver import new_deepgram_connection, live_options
+from metrics import metrics
+from openai_functions.OpenAIClient import openai_client
+from tts_handler import shared_elevenlabs_client
+from utils import logger
+
+pool_requests = metrics.counter("voicebot_session_pool_requests_total", "Warm sessions requested at call setup",
+                                labels=("outcome",))
+pool_ready = metrics.gauge("voicebot_session_pool_ready", "Warm sessions ready to be taken")
+pool_refill = metrics.histogram("voicebot_session_pool_refill_seconds",
+                                "Time to create one warm session (OpenAI thread and Deepgram connect)")
+pool_discarded = metrics.counter("voicebot_session_pool_discarded_total", "Warm sessions thrown away unused",
+                                 labels=("reason",))
+
+
+class WarmSession:
+    """Backend state for one call, created before the call arrives."""
+
+    def __init__(self, openai_thread_id: Optional[str], dg_connection):
+        self.openai_thread_id = openai_thread_id
+        self.dg_connection = dg_connection
+        self.created_at = time.monotonic()
+        self.last_keepalive = self.created_at
+
+    def close(self) -> None:
+        try:
+            self.dg_connection.finish()
+        except Exception as e:
+            logger.error(f"Error closing pooled Deepgram connection: {e}")
+        if not self.openai_thread_id:
+            return
+        try:
+            openai_client.get_client().beta.threads.delete(self.openai_thread_id)
+        except Exception as e:
+            logger.error(f"Error deleting pooled OpenAI thread {self.openai_thread_id}: {e}")
+
+
+class SessionPool:
+    """
+    Keeps `target_size` sessions ready so call setup does not wait on the
+    backends.
+
+    A background thread creates OpenAI threads and opens Deepgram live
+    connections ahead of time, keeps the idle connections open with
+    KeepAlive, and replaces sessions older than `ttl_seconds` or whose
+    connection dropped. acquire() takes a ready session without blocking,
+    or returns None and the call sets up its own as before. The ElevenLabs
+    client is shared by all calls and created when the pool starts.
+    """
+
+    def __init__(self, target_size: int = SESSION_POOL_SIZE, ttl_seconds: float = SESSION_POOL_TTL_SECONDS):
+        self.target_size = target_size
+        self.ttl_seconds = ttl_seconds
+        self.sessions = deque()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.stop_flag = False
+
+    def start(self) -> None:
+        if self.thread or self.target_size <= 0:
+            return
+        shared_elevenlabs_client()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f"Session pool started, target size {self.target_size}")
+
+    def acquire(self) -> Optional[WarmSession]:
+        """A ready session, or None if the pool is empty."""
+        session = None
+        with self.lock:
+            while self.sessions:
+                candidate = self.sessions.popleft()
+                if candidate.dg_connection.is_connected():
+                    session = candidate
+                    break
+                pool_discarded.inc(reason="disconnected")
+                threading.Thread(target=candidate.close, daemon=True).start()
+            pool_ready.set(len(self.sessions))
+        pool_requests.inc(outcome="hit" if session else "miss")
+        self.wakeup.set()
+        return session
+
+    def _create(self) -> Optional[WarmSession]:
+        started = time.monotonic()
+        dg_connection = None
+        try:
+            # the chat backend has no thread, a warm session is only the Deepgram connection
+            openai_thread_id = openai_client.get_client().beta.threads.create().id if LLM_BACKEND == "assistants" else None
+            dg_connection = new_deepgram_connection()
+            if not dg_connection.start(live_options()):
+                raise RuntimeError("Deepgram connection did not start")
+        except Exception as e:
+            logger.error(f"Failed to create a warm session: {e}")
+            if dg_connection:
+                dg_connection.finish()
+            return None
+        pool_refill.observe(time.monotonic() - started)
+        return WarmSession(openai_thread_id, dg_connection)
+
+    def _maintain(self) -> None:
+        """Evict expired or dropped sessions and send KeepAlive on the idle connections."""
+        now = time.monotonic()
+        evicted = []
+        with self.lock:
+            for session in list(self.sessions):
+                if now - session.created_at > self.ttl_seconds:
+                    reason = "expired"
+                elif not session.dg_connection.is_connected():
+                    reason = "disconnected"
+                else:
+                    continue
+                self.sessions.remove(session)
+                evicted.append(session)
+                pool_discarded.inc(reason=reason)
+            ready = list(self.sessions)
+            pool_ready.set(len(self.sessions))
+
+        for session in evicted:
+            session.close()
+        for session in ready:
+            if now - session.last_keepalive >= DG_KEEPALIVE_SECONDS:
+                try:
+                    session.dg_connection.keep_alive()
+                    session.last_keepalive = now
+                except Exception as e:
+                    logger.error(f"KeepAlive failed on a pooled Deepgram connection: {e}")
+
+    def _run(self) -> None:
+        failures = 0
+        while not self.stop_flag:
+            self._maintain()
+            with self.lock:
+                missing = self.target_size - len(self.sessions)
+            if missing > 0:
+                session = self._create()
+                if session:
+                    failures = 0
+                    with self.lock:
+                        self.sessions.append(session)
+                        pool_ready.set(len(self.sessions))
+                    continue
+                failures += 1
+            # back off while the backends fail, otherwise wake for the next acquire or KeepAlive
+            self.wakeup.wait(min(60, 2 ** failures) if failures else 1.0)
+            self.wakeup.clear()
+
+    def stop(self) -> None:
+        self.stop_flag = True
+        self.wakeup.set()
+        with self.lock:
+            sessions = list(self.sessions)
+            self.sessions.clear()
+            pool_ready.set(0)
+        for session in sessions:
+            session.close()
+
+
+# Global instance
+session_pool = SessionPool()
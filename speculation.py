@@ -0,0 +1,168 @@
+"""
+Speculative replies on unfinished turns (SPECULATIVE_GENERATION, chat backend).
+
+A reply normally starts at Deepgram's speech_final, which comes
+endpointing (800 ms) after the caller stops talking. The interim and
+is_final results carry the finished, punctuated words before that. Once
+they look like a complete question, ConversationHandler starts drafting
+the reply: the LLM request runs, and the first sentence is optionally
+rendered into the TTS cache. Nothing is played.
+
+If speech_final arrives with the same text, the draft is committed: its
+sentences play and the rest of the stream goes straight to TTS. If the
+caller keeps talking, or speech_final brings other words, the draft is
+discarded and its tokens are counted as wasted.
+
+The Assistants backend cannot take part: a draft would have to add the
+message to the thread before it is confirmed.
+"""
+import threading
+import time
+from config import SPECULATIVE_TTS, SPECULATION_MIN_WORDS
+from metrics import metrics
+from utils import logger
+
+speculations = metrics.counter("voicebot_speculation_total", "Speculative replies, by how they ended",
+                               labels=("outcome",))
+wasted_tokens = metrics.counter("voicebot_speculation_wasted_tokens_total",
+                                "LLM tokens spent on discarded speculative replies", labels=("kind",))
+wasted_tts_characters = metrics.counter("voicebot_speculation_wasted_tts_characters_total",
+                                        "Characters synthesized for discarded speculative replies")
+speculation_lead = metrics.histogram("voicebot_speculation_lead_seconds",
+                                     "Head start of committed speculative replies over speech_final")
+
+
+def normalize_turn(text: str) -> str:
+    return " ".join(text.split())
+
+
+def looks_complete(text: str, min_words: int = SPECULATION_MIN_WORDS) -> bool:
+    """A question, or a statement of at least min_words that ends a sentence."""
+    text = text.strip()
+    if not text or text[-1] not in "?.!":
+        return False
+    return text.endswith("?") or len(text.split()) >= min_words
+
+
+class Speculation:
+    """
+    A reply drafted for `text` before the caller's turn is confirmed over.
+
+    The draft streams on its own thread through ChatEngine.draft(), with
+    this object standing in for the conversation handler. Its sentences
+    are held back until commit(), and the first is prefetched into the
+    TTS cache when `prefetch_tts` is set. After commit() it behaves like
+    the real turn: sentences go to TTS as they arrive and barge-in stops
+    it. discard() stops the draft and books its cost as wasted.
+    """
+
+    def __init__(self, chat_engine, text: str, conversation_handler, prefetch_tts: bool = SPECULATIVE_TTS):
+        self.chat_engine = chat_engine
+        self.text = text
+        self.conversation = conversation_handler
+        self.prefetch_tts = prefetch_tts
+        self.tts_handler = self  # the sentence streamer speaks through conversation_handler.tts_handler
+        self.lock = threading.Lock()
+        self.held = []
+        self.prefetched_characters = 0
+        self.committed = False
+        self.discarded = False
+        self.finished = False
+        self.trace = None
+        self.content = ""
+        self.tool_calls = []
+        self.usage = {}
+        self.error = None
+        self.started_at = time.monotonic()
+        self.done = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def is_interrupted(self) -> bool:
+        return self.discarded or (self.committed and self.conversation.is_interrupted)
+
+    def _run(self) -> None:
+        try:
+            self.content, self.tool_calls = self.chat_engine.draft(self.text, self, self.usage)
+        except Exception as e:
+            logger.error(f"Speculative reply failed: {e}")
+            self.error = e
+        finally:
+            with self.lock:
+                self.finished = True
+                discarded = self.discarded
+            if discarded:
+                self._count_wasted_tokens()
+            self.done.set()
+
+    def synthesize_and_play(self, sentence: str, trace=None) -> None:
+        with self.lock:
+            if not self.committed:
+                self.held.append(sentence)
+                if self.prefetch_tts and len(self.held) == 1:
+                    self.conversation.tts_handler.prefetch(sentence, self._on_prefetched)
+                return
+        if self.trace:
+            self.trace.mark("first_sentence_to_tts")
+        self.conversation.tts_handler.synthesize_and_play(sentence, trace=self.trace)
+
+    def _on_prefetched(self, sentence: str) -> None:
+        with self.lock:
+            discarded = self.discarded
+            if not discarded:
+                self.prefetched_characters += len(sentence)
+        if discarded:
+            wasted_tts_characters.inc(len(sentence))
+
+    def commit(self, trace) -> bool:
+        """
+        Take the draft as the reply to the confirmed turn: play what it has
+        so far and let the rest stream. A draft that ends in tool calls is
+        still taken, the turn goes on from them. False if it failed before
+        it was committed, then the turn is generated as usual.
+        """
+        with self.lock:
+            if self.discarded:
+                return False
+            unusable = self.finished and self.error
+            if not unusable:
+                self.committed = True
+                self.trace = trace
+                # the draft's request and first delta happened before the turn was confirmed
+                trace.mark("message_created")
+                if self.held:
+                    trace.mark("first_text_delta")
+                # queued under the lock: the draft's next sentence waits for it and plays after these
+                for sentence in self.held:
+                    trace.mark("first_sentence_to_tts")
+                    self.conversation.tts_handler.synthesize_and_play(sentence, trace=trace)
+                self.held = []
+        if unusable:
+            self.discard("error")
+            return False
+        lead = time.monotonic() - self.started_at
+        speculation_lead.observe(lead)
+        logger.info(f"Committing speculative reply started {lead * 1000:.0f} ms ago for '{self.text}'")
+        return True
+
+    def finish(self) -> None:
+        """Wait for a committed draft to end and book its outcome."""
+        self.done.wait()
+        speculations.inc(outcome="tool_call" if self.tool_calls else "error" if self.error else "committed")
+
+    def discard(self, outcome: str = "discarded") -> None:
+        with self.lock:
+            if self.committed or self.discarded:
+                return
+            self.discarded = True
+            finished = self.finished
+            characters = self.prefetched_characters
+        speculations.inc(outcome=outcome)
+        wasted_tts_characters.inc(characters)
+        # a draft still streaming stops at its next chunk and books its tokens then
+        if finished:
+            self._count_wasted_tokens()
+
+    def _count_wasted_tokens(self) -> None:
+        wasted_tokens.inc(self.usage.get("prompt_tokens", 0), kind="prompt")
+        wasted_tokens.inc(self.usage.get("completion_tokens", 0), kind="completion")
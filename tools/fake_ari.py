@@ -0,0 +1,168 @@
+"""
+Minimal fake of the Asterisk ARI REST interface for local testing.
+
+Answers the endpoints the bot uses and, when an ExternalMedia channel is
+created, starts streaming RTP to the requested external_host the way
+Asterisk would bridge a caller's audio.
+
+    python tools/fake_ari.py --port 8089           # serve until Ctrl+C
+    python tools/fake_ari.py --check               # time ExternalMedia setup and ingest
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.rtp_generator import RTPGenerator  # noqa: E402
+
+
+class FakeARI:
+    def __init__(self, stream_seconds: float = 60.0):
+        self.stream_seconds = stream_seconds
+        self.generators = {}
+        self.bridges = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def handle(self, method: str, path: str, params: dict):
+        """Returns (status, json body or None)."""
+        with self.lock:
+            self.requests.append((method, path))
+
+        if method == "POST" and path == "/ari/channels/externalMedia":
+            channel_id = params.get("channelId") or str(uuid.uuid4())
+            host, port = params["external_host"].rsplit(":", 1)
+            generator = RTPGenerator(host, int(port))
+            generator.start(self.stream_seconds)
+            with self.lock:
+                self.generators[channel_id] = generator
+            return 200, {"id": channel_id, "name": f"UnicastRTP/{host}:{port}-{channel_id}"}
+
+        if method == "POST" and path == "/ari/bridges":
+            bridge_id = params.get("bridgeId") or str(uuid.uuid4())
+            with self.lock:
+                self.bridges[bridge_id] = []
+            return 200, {"id": bridge_id, "bridge_type": params.get("type", "mixing")}
+
+        match = re.fullmatch(r"/ari/bridges/([^/]+)/addChannel", path)
+        if method == "POST" and match:
+            with self.lock:
+                if match.group(1) not in self.bridges:
+                    return 404, {"message": "Bridge not found"}
+                self.bridges[match.group(1)].extend(params.get("channel", "").split(","))
+            return 204, None
+
+        match = re.fullmatch(r"/ari/channels/([^/]+)", path)
+        if method == "DELETE" and match:
+            with self.lock:
+                generator = self.generators.pop(match.group(1), None)
+            if generator:
+                generator.stop()
+            return 204, None
+
+        match = re.fullmatch(r"/ari/bridges/([^/]+)", path)
+        if method == "DELETE" and match:
+            with self.lock:
+                self.bridges.pop(match.group(1), None)
+            return 204, None
+
+        if method == "GET" and re.fullmatch(r"/ari/channels/[^/]+/rtp_statistics", path):
+            return 200, {}
+
+        if method == "POST" and re.fullmatch(r"/ari/channels/[^/]+/play", path):
+            playback_id = params.get("playbackId") or str(uuid.uuid4())
+            return 201, {"id": playback_id, "media_uri": params.get("media"), "state": "queued"}
+
+        if method == "GET" and re.fullmatch(r"/ari/playbacks/[^/]+", path):
+            return 200, {"state": "done"}
+
+        if method == "DELETE" and re.fullmatch(r"/ari/playbacks/[^/]+", path):
+            return 204, None
+
+        return 404, {"message": f"Unsupported {method} {path}"}
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, as Asterisk does
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def _respond(self, method):
+                url = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, body = fake.handle(method, url.path, params)
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def do_DELETE(self):
+                self._respond("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def check(port: int) -> None:
+    """Open an ExternalMediaSession against the fake and count received RTP."""
+    os.environ["ARI_BASE_URL"] = f"http://127.0.0.1:{port}/ari"
+    fake = FakeARI(stream_seconds=2.0)
+    server = fake.serve(port)
+
+    from external_media import ExternalMediaSession
+
+    session = ExternalMediaSession("fake-channel")
+    start = time.monotonic()
+    assert session.open(), "ExternalMedia setup failed"
+    setup_ms = (time.monotonic() - start) * 1000
+
+    first_packet = []
+    deadline = time.monotonic() + 1.0
+
+    def on_packet(packet):
+        if not first_packet:
+            first_packet.append((time.monotonic() - start) * 1000)
+
+    session.serve(on_packet, lambda: time.monotonic() > deadline)
+    session.close()
+    server.shutdown()
+
+    print(f"setup: {setup_ms:.1f} ms over {len(fake.requests) - 2} requests")
+    print(f"first RTP packet: {first_packet[0]:.1f} ms after setup started" if first_packet else "no RTP received")
+    print(f"received {session.packets_received} packets in 1 s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    if args.check:
+        check(args.port)
+    else:
+        FakeARI().serve(args.port)
+        print(f"Fake ARI listening on http://127.0.0.1:{args.port}/ari")
+        while True:
+            time.sleep(1)
@@ -0,0 +1,147 @@
+"""
+Local stand-in for the OpenAI Chat Completions streaming endpoint.
+
+Answers POST /v1/chat/completions with server-sent events in OpenAI's
+chunk format, so the chat backend runs unchanged against it:
+
+    python tools/mock_llm_server.py --port 8099
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=mock LLM_BACKEND=chat python main.py
+
+The reply is scripted. A user turn that asks about an order ("поръчк")
+gets a track_order tool call when tools are offered. The turn after the
+tool output gets an answer about the order, and anything else gets the
+generic REPLY. With `tool_preamble` the tool call follows that text,
+as models often say a sentence first. Each request waits `latency`
+before its first byte and `token_delay` between words. The usage chunk
+reports the system prompt as cached when the previous request started
+with the same one, the way OpenAI's prompt cache would.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Здравейте. Доставката е безплатна над 200 лева. Мога ли да помогна с нещо друго?"
+ORDER_REPLY = "Не намерих такава поръчка. Моля, проверете номера."
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class MockLLM:
+    def __init__(self, latency: float = 0.2, token_delay: float = 0.02, tool_preamble: str = ""):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tool_preamble = tool_preamble
+        self.requests = []
+        self.last_system = None
+        self.lock = threading.Lock()
+
+    def plan(self, body: dict):
+        """What to answer: ("tool", arguments) or ("text", reply)."""
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        if last.get("role") == "tool":
+            return "text", ORDER_REPLY
+        if last.get("role") == "user" and "поръчк" in (last.get("content") or "").lower() and body.get("tools"):
+            return "tool", json.dumps({"order_identifier": "0888123456"})
+        return "text", REPLY
+
+    def usage(self, messages: list) -> dict:
+        system = messages[0]["content"] if messages and messages[0].get("role") == "system" else ""
+        prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        with self.lock:
+            cached = estimate_tokens(system) if system and system == self.last_system else 0
+            self.last_system = system
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "total_tokens": prompt_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+    def chunks(self, body: dict):
+        """The SSE chunks of one streamed completion, as dicts."""
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "mock")}
+        kind, payload = self.plan(body)
+        yield dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        if kind == "tool":
+            if self.tool_preamble:
+                yield dict(base, choices=[{"index": 0, "delta": {"content": self.tool_preamble}, "finish_reason": None}])
+            call_id = f"call_{uuid.uuid4().hex[:12]}"
+            yield dict(base, choices=[{"index": 0, "finish_reason": None, "delta": {"tool_calls": [
+                {"index": 0, "id": call_id, "type": "function",
+                 "function": {"name": "track_order", "arguments": ""}}]}}])
+            for start in range(0, len(payload), 8):
+                yield dict(base, choices=[{"index": 0, "finish_reason": None, "delta": {"tool_calls": [
+                    {"index": 0, "function": {"arguments": payload[start:start + 8]}}]}}])
+            finish = "tool_calls"
+        else:
+            for i, word in enumerate(payload.split(" ")):
+                yield dict(base, choices=[{"index": 0, "finish_reason": None,
+                                           "delta": {"content": word if i == 0 else " " + word}}])
+            finish = "stop"
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": finish}])
+        if body.get("stream_options", {}).get("include_usage"):
+            yield dict(base, choices=[], usage=self.usage(body.get("messages", [])))
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Start serving in a background thread, returns the server (server_address has the port)."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with mock.lock:
+                    mock.requests.append(body)
+                if self.path.rstrip("/") != "/v1/chat/completions" or not body.get("stream"):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(mock.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in mock.chunks(body):
+                        if chunk["choices"] and chunk["choices"][0]["delta"].get("content"):
+                            time.sleep(mock.token_delay)
+                        self._write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+                    self._write("data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client stopped reading: barge-in or a discarded speculative reply
+                    self.close_connection = True
+
+            def _write(self, text: str):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI Chat Completions streaming server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between words")
+    args = parser.parse_args()
+    server = MockLLM(args.latency, args.token_delay).serve(args.host, args.port)
+    print(f"Mock Chat Completions on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
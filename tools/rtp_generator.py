@@ -0,0 +1,113 @@
+"""
+Paced G.711 mu-law RTP generator for local testing.
+
+Streams a tone as 20 ms RTP packets to host:port, the way Asterisk streams
+a caller's audio to an ExternalMedia socket.
+
+    python tools/rtp_generator.py 127.0.0.1 12000 --seconds 5
+    python tools/rtp_generator.py 127.0.0.1 12000 --loss 0.02 --reorder 0.05 --duplicate 0.01
+"""
+import argparse
+import math
+import random
+import socket
+import struct
+import threading
+import time
+
+SAMPLE_RATE = 8000
+SAMPLES_PER_PACKET = 160  # 20 ms
+
+
+def linear_to_ulaw(sample: int) -> int:
+    """Encode one 16-bit linear sample as G.711 mu-law (same rounding as audioop)."""
+    value = sample >> 2
+    if value < 0:
+        value, mask = -value, 0x7F
+    else:
+        mask = 0xFF
+    value = min(value, 8159) + 0x21
+    segment = value.bit_length() - 6
+    if segment > 7:
+        return 0x7F ^ mask
+    return ((segment << 4) | ((value >> (segment + 1)) & 0x0F)) ^ mask
+
+
+def tone_payloads(frequency: float = 440.0, amplitude: int = 8000):
+    """Endless 20 ms mu-law payloads of a sine tone."""
+    n = 0
+    while True:
+        yield bytes(
+            linear_to_ulaw(int(amplitude * math.sin(2 * math.pi * frequency * (n + i) / SAMPLE_RATE)))
+            for i in range(SAMPLES_PER_PACKET)
+        )
+        n += SAMPLES_PER_PACKET
+
+
+class RTPGenerator:
+    def __init__(self, host: str, port: int, payload_type: int = 0, ssrc: int = 0x5EED,
+                 loss: float = 0.0, reorder: float = 0.0, duplicate: float = 0.0):
+        self.address = (host, port)
+        self.loss = loss
+        self.reorder = reorder
+        self.duplicate = duplicate
+        self.payload_type = payload_type
+        self.ssrc = ssrc
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stop_flag = False
+        self.packets_sent = 0
+        self.thread = None
+
+    def build_packet(self, seq: int, timestamp: int, payload: bytes, marker: bool = False) -> bytes:
+        second_byte = (0x80 if marker else 0) | self.payload_type
+        return struct.pack("!BBHII", 0x80, second_byte, seq & 0xFFFF, timestamp & 0xFFFFFFFF, self.ssrc) + payload
+
+    def run(self, seconds: float) -> None:
+        start = time.monotonic()
+        payloads = tone_payloads()
+        total = int(seconds * SAMPLE_RATE / SAMPLES_PER_PACKET)
+        held = None
+        for seq in range(total):
+            if self.stop_flag:
+                break
+            packet = self.build_packet(seq, seq * SAMPLES_PER_PACKET, next(payloads), marker=seq == 0)
+            if random.random() < self.loss:
+                packet = None
+            elif held is None and random.random() < self.reorder:
+                held, packet = packet, None  # sent after the next packet
+            for outgoing in (packet, held if packet else None):
+                if outgoing:
+                    self.sock.sendto(outgoing, self.address)
+                    self.packets_sent += 1
+                    if random.random() < self.duplicate:
+                        self.sock.sendto(outgoing, self.address)
+            if packet:
+                held = None
+            delay = start + (seq + 1) * SAMPLES_PER_PACKET / SAMPLE_RATE - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def start(self, seconds: float) -> None:
+        self.thread = threading.Thread(target=self.run, args=(seconds,), daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_flag = True
+        if self.thread:
+            self.thread.join(timeout=1)
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="probability a packet is dropped")
+    parser.add_argument("--reorder", type=float, default=0.0, help="probability a packet is swapped with the next")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="probability a packet is sent twice")
+    args = parser.parse_args()
+
+    generator = RTPGenerator(args.host, args.port, loss=args.loss, reorder=args.reorder, duplicate=args.duplicate)
+    generator.run(args.seconds)
+    print(f"Sent {generator.packets_sent} packets to {args.host}:{args.port}")
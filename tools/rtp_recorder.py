@@ -0,0 +1,80 @@
+"""
+Record the RTP arriving on a UDP port to an rtpdump file, and read it back.
+
+The file uses the rtptools rtpdump format, so recordings also open in
+Wireshark and rtpplay. The benchmark suite replays them as recorded G.711.
+
+    python tools/rtp_recorder.py 12000 call.rtpdump --seconds 10
+"""
+import argparse
+import socket
+import struct
+import time
+
+RTPDUMP_MAGIC = b"#!rtpplay1.0 "
+# RD_hdr_t: start time (sec, usec), source address, source port, padding
+RTPDUMP_HEADER = struct.Struct("!IIIHH")
+# RD_packet_t: record length incl. this header, RTP packet length, ms since start
+RTPDUMP_PACKET = struct.Struct("!HHI")
+
+
+def write_rtpdump(path: str, packets, address=("127.0.0.1", 0), start: float = 0.0) -> None:
+    """Write (seconds since start, datagram) pairs as an rtpdump file."""
+    with open(path, "wb") as f:
+        f.write(RTPDUMP_MAGIC + f"{address[0]}/{address[1]}\n".encode())
+        f.write(RTPDUMP_HEADER.pack(int(start), int(start % 1 * 1e6), struct.unpack("!I", socket.inet_aton(address[0]))[0],
+                                    address[1], 0))
+        for offset, datagram in packets:
+            f.write(RTPDUMP_PACKET.pack(RTPDUMP_PACKET.size + len(datagram), len(datagram), int(offset * 1000)))
+            f.write(datagram)
+
+
+def read_rtpdump(path: str) -> list:
+    """Read an rtpdump file, returns (seconds since start, datagram) pairs. RTCP records are skipped."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(RTPDUMP_MAGIC):
+        raise ValueError(f"{path} is not an rtpdump file")
+    position = data.index(b"\n") + 1 + RTPDUMP_HEADER.size
+    packets = []
+    while position + RTPDUMP_PACKET.size <= len(data):
+        length, packet_length, offset_ms = RTPDUMP_PACKET.unpack_from(data, position)
+        body = data[position + RTPDUMP_PACKET.size:position + length]
+        if packet_length:
+            packets.append((offset_ms / 1000, body))
+        position += length
+    return packets
+
+
+def record(port: int, seconds: float, host: str = "0.0.0.0") -> list:
+    """Receive datagrams on host:port for `seconds`, returns (seconds since the first packet, datagram) pairs."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.settimeout(0.1)
+    packets = []
+    first = None
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            try:
+                datagram = sock.recv(2048)
+            except socket.timeout:
+                continue
+            now = time.monotonic()
+            first = now if first is None else first
+            packets.append((now - first, datagram))
+    finally:
+        sock.close()
+    return packets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("port", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    recorded = record(args.port, args.seconds)
+    write_rtpdump(args.output, recorded, ("127.0.0.1", args.port), time.time())
+    print(f"Recorded {len(recorded)} packets to {args.output}")
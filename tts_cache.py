@@ -0,0 +1,340 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import wave
+from collections import OrderedDict
+from typing import Optional
+from config import (
+    ELEVEN_LABS_VOICE_ID,
+    TTS_MODEL_ID,
+    TTS_OUTPUT_FORMAT,
+    TTS_LANGUAGE,
+    TTS_SOUNDS_DIR,
+    TTS_FILE_FORMAT,
+    TTS_CACHE_MAX_BYTES,
+    TTS_CACHE_MAX_AGE_DAYS,
+    TTS_CACHE_MEMORY_BYTES,
+)
+from audio_dsp import encode_g711, decode_g711
+from metrics import metrics
+from utils import logger
+
+cache_requests = metrics.counter("voicebot_tts_cache_requests_total",
+                                 "TTS cache lookups by where the audio came from (memory, disk, "
+                                 "coalesced with a synthesis in flight, miss)", labels=("outcome",))
+cache_bytes = metrics.gauge("voicebot_tts_cache_bytes", "Size of the WAV files in the TTS cache")
+cache_evictions = metrics.counter("voicebot_tts_cache_evictions_total", "TTS cache entries evicted",
+                                  labels=("reason",))
+
+# file names of the old per-process hash() keys, never hit again after a restart
+LEGACY_FILE = re.compile(r"^tts_\d+\.wav$")
+# formats Asterisk plays from the sounds directory, by file extension
+SOUND_FORMATS = ("ulaw", "alaw", "sln", "wav")
+G711_CODECS = {"ulaw": "PCMU", "alaw": "PCMA"}
+
+
+def write_wav(path: str, pcm: bytes, sample_rate: int = 8000) -> None:
+    """Write mono 16-bit PCM as a WAV file Asterisk can play."""
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+
+
+def read_wav(path: str) -> bytes:
+    """PCM frames of a WAV file written by write_wav()."""
+    with wave.open(path, 'rb') as wf:
+        return wf.readframes(wf.getnframes())
+
+
+def write_sound(path: str, pcm: bytes, sound_format: str) -> None:
+    """Write 8 kHz 16-bit PCM as a sound file of the given format."""
+    if sound_format == "wav":
+        write_wav(path, pcm)
+        return
+    with open(path, "wb") as f:
+        f.write(encode_g711(pcm, G711_CODECS[sound_format]) if sound_format in G711_CODECS else pcm)
+
+
+def read_sound(path: str, sound_format: str) -> bytes:
+    """8 kHz 16-bit PCM of a sound file written by write_sound()."""
+    if sound_format == "wav":
+        return read_wav(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    return decode_g711(data, G711_CODECS[sound_format]).tobytes() if sound_format in G711_CODECS else data
+
+
+def normalize_text(text: str) -> str:
+    """The same sentence must map to the same key however the model spaced it."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, voice_id: str = ELEVEN_LABS_VOICE_ID, model_id: str = TTS_MODEL_ID,
+              output_format: str = TTS_OUTPUT_FORMAT, language: str = TTS_LANGUAGE) -> str:
+    """Stable digest of everything that decides the audio."""
+    material = "\x1f".join((normalize_text(text), voice_id or "", model_id, output_format, language))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+class TTSCache:
+    """
+    Synthesized sentences, keyed by content.
+
+    Every entry is a sound file `tts_<key>.<file_format>` in the Asterisk
+    sounds directory (played as sound:tts_audio/tts_<key>; in the trunk's
+    codec Asterisk plays it without transcoding) and a row in a SQLite
+    index next to it with its size and last use. Once the files outgrow
+    `max_bytes`, or an entry has not been used for `max_age_days`, the
+    least recently used entries are deleted; pinned entries (the scripted
+    phrases) are kept. The most recently used PCM is also held in memory
+    up to `memory_bytes`.
+
+    acquire() is the only lookup: on a miss exactly one caller gets None
+    and synthesizes the sentence, then calls put() (or release() if it
+    failed); other callers asking for the same key meanwhile wait for it.
+    Files are written under a temporary name and renamed, so Asterisk and
+    other worker processes never see a partial WAV.
+    """
+
+    def __init__(self, directory: str = TTS_SOUNDS_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES,
+                 max_age_days: float = TTS_CACHE_MAX_AGE_DAYS, memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 file_format: str = TTS_FILE_FORMAT):
+        if file_format not in SOUND_FORMATS:
+            raise ValueError(f"Unknown TTS file format {file_format}, expected one of {SOUND_FORMATS}")
+        self.directory = directory
+        self.file_format = file_format
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.memory_bytes = memory_bytes
+        self.memory = OrderedDict()  # key -> PCM, least recently used first
+        self.memory_size = 0
+        self.in_flight = {}  # key -> Event set when its synthesis ends
+        self.lock = threading.Lock()
+        self.db = None
+        self.db_lock = threading.RLock()
+
+    def _open(self):
+        """Open the index on first use, so importing the module touches no files."""
+        if self.db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.directory, "tts_cache.sqlite"), timeout=10,
+                                 check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+                "pinned INTEGER NOT NULL DEFAULT 0, text TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self.db = db
+            self._remove_legacy_files()
+            self._evict()
+        return self.db
+
+    def base_name(self, key: str) -> str:
+        return f"tts_{key}"
+
+    def path(self, key: str, sound_format: str = None) -> str:
+        return os.path.join(self.directory, f"{self.base_name(key)}.{sound_format or self.file_format}")
+
+    def read_named(self, base_name: str) -> bytes:
+        """PCM of a named prompt, in the cache's format or a hand-made WAV."""
+        for sound_format in (self.file_format, "wav"):
+            path = os.path.join(self.directory, f"{base_name}.{sound_format}")
+            if os.path.exists(path):
+                return read_sound(path, sound_format)
+        raise FileNotFoundError(f"No {base_name}.{self.file_format} or {base_name}.wav in {self.directory}")
+
+    def _remember(self, key: str, pcm: bytes) -> None:
+        if len(pcm) > self.memory_bytes:
+            return
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return
+            self.memory[key] = pcm
+            self.memory_size += len(pcm)
+            while self.memory_size > self.memory_bytes:
+                _, old = self.memory.popitem(last=False)
+                self.memory_size -= len(old)
+
+    def _forget(self, key: str) -> None:
+        with self.lock:
+            pcm = self.memory.pop(key, None)
+            if pcm is not None:
+                self.memory_size -= len(pcm)
+
+    def _touch(self, key: str) -> bool:
+        """Record a use of the entry, False if it is not in the index."""
+        with self.db_lock:
+            cursor = self._open().execute(
+                "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            return cursor.rowcount > 0
+
+    def _load(self, key: str):
+        """(PCM, outcome) from memory or disk, (None, None) if the key is not cached."""
+        with self.lock:
+            pcm = self.memory.get(key)
+            if pcm is not None:
+                self.memory.move_to_end(key)
+        if pcm is not None:
+            if self._touch(key):
+                return pcm, "memory"
+            self._forget(key)  # evicted by another worker process
+            return None, None
+        if not self._touch(key):
+            return None, None
+        try:
+            pcm = read_sound(self.path(key), self.file_format)
+        except (OSError, EOFError, wave.Error) as e:
+            logger.error(f"TTS cache entry {key} is unreadable, dropping it: {e}")
+            self._delete(key)
+            return None, None
+        self._remember(key, pcm)
+        return pcm, "disk"
+
+    def contains(self, key: str) -> bool:
+        """Whether the key is cached, without counting a lookup."""
+        with self.db_lock:
+            found = self._open().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return found is not None and os.path.exists(self.path(key))
+
+    def pin(self, key: str) -> None:
+        """Keep the entry through eviction."""
+        with self.db_lock:
+            self._open().execute("UPDATE entries SET pinned = 1 WHERE key = ?", (key,))
+
+    def unpin_except(self, keys) -> None:
+        """Let eviction take pinned entries not in `keys` (phrases removed from the manifest)."""
+        keys = list(keys)
+        with self.db_lock:
+            self._open().execute(
+                f"UPDATE entries SET pinned = 0 WHERE pinned = 1 AND key NOT IN ({','.join('?' * len(keys))})", keys
+            )
+
+    def preload(self, key: str) -> Optional[bytes]:
+        """Load a cached entry into the memory tier, returns its PCM."""
+        try:
+            pcm = read_sound(self.path(key), self.file_format)
+        except (OSError, EOFError, wave.Error) as e:
+            logger.error(f"Could not preload TTS cache entry {key}: {e}")
+            return None
+        self._remember(key, pcm)
+        return pcm
+
+    def acquire(self, key: str, timeout: float = 30.0) -> Optional[bytes]:
+        """
+        The cached PCM of the key, or None: then the caller owns the key and
+        must synthesize it and call put(), or release() on failure.
+        """
+        waited = False
+        while True:
+            pcm, outcome = self._load(key)
+            if pcm is not None:
+                cache_requests.inc(outcome="coalesced" if waited else outcome)
+                return pcm
+            with self.lock:
+                event = self.in_flight.get(key)
+                if event is None:
+                    self.in_flight[key] = threading.Event()
+                    cache_requests.inc(outcome="miss")
+                    return None
+            # another call is synthesizing the same sentence, use its result
+            if not event.wait(timeout):
+                logger.warning(f"Still waiting for the synthesis of TTS cache entry {key}")
+            waited = True
+
+    def release(self, key: str) -> None:
+        """End the caller's ownership of a missed key, waking the callers waiting for it."""
+        with self.lock:
+            event = self.in_flight.pop(key, None)
+        if event:
+            event.set()
+
+    def put(self, key: str, pcm: bytes, text: str = "", pinned: bool = False) -> None:
+        """Store the synthesized PCM of an owned (or new) key and release it."""
+        try:
+            path = self.path(key)
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self._open()
+            write_sound(temporary, pcm, self.file_format)
+            os.replace(temporary, path)
+            now = time.time()
+            with self.db_lock:
+                self.db.execute(
+                    "INSERT INTO entries (key, size, created_at, last_used, pinned, text) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_used = excluded.last_used, "
+                    "pinned = MAX(pinned, excluded.pinned)",
+                    (key, os.path.getsize(path), now, now, int(pinned), text),
+                )
+            self._remember(key, pcm)
+            self._evict()
+        except Exception as e:
+            logger.error(f"Error storing TTS cache entry {key}: {e}")
+        finally:
+            self.release(key)
+
+    def _delete(self, key: str) -> None:
+        self._forget(key)
+        with self.db_lock:
+            self._open().execute("DELETE FROM entries WHERE key = ?", (key,))
+        # the entry may have been written before TTS_FILE_FORMAT changed
+        for sound_format in SOUND_FORMATS:
+            try:
+                os.remove(self.path(key, sound_format))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error deleting TTS cache file {key}: {e}")
+
+    def _evict(self) -> None:
+        """Drop entries unused for max_age, then the least recently used until the cache fits max_bytes."""
+        with self.db_lock:
+            expired = [row[0] for row in self.db.execute(
+                "SELECT key FROM entries WHERE pinned = 0 AND last_used < ?", (time.time() - self.max_age,)
+            )]
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            oversize = []
+            if total > self.max_bytes:
+                for key, size in self.db.execute(
+                    "SELECT key, size FROM entries WHERE pinned = 0 ORDER BY last_used"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    if key not in expired:
+                        oversize.append(key)
+                    total -= size
+        for reason, keys in (("age", expired), ("size", oversize)):
+            for key in keys:
+                self._delete(key)
+                cache_evictions.inc(reason=reason)
+        with self.db_lock:
+            cache_bytes.set(self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+
+    def _remove_legacy_files(self) -> None:
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # temporary files of writes that died, not ones another worker is writing right now
+            abandoned = name.endswith(".tmp") and now - os.path.getmtime(path) > 3600
+            if LEGACY_FILE.match(name) or abandoned:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"Error removing stale TTS file {name}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} stale TTS files from {self.directory}")
+
+
+# Global instance
+tts_cache = TTSCache()
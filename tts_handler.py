@@ -1,49 +1,141 @@
 import os
-import wave
 import logging
-import requests
-import numpy as np
-import time
 from typing import Optional, Dict
 from collections import deque
-from threading import Thread, Lock
+import uuid
+from threading import Thread, Condition, Event, Lock
+from concurrent.futures import ThreadPoolExecutor
 from elevenlabs import ElevenLabs
 from config import (
     ELEVEN_LABS_API_KEY,
     ELEVEN_LABS_VOICE_ID,
-    ARI_BASE_URL,
-    ARI_USERNAME,
-    ARI_PASSWORD,
+    PLAYBACK_STATUS_FALLBACK_SECONDS,
+    TTS_MODEL_ID,
+    TTS_OUTPUT_FORMAT,
+    TTS_LANGUAGE,
+    TTS_SOUNDS_DIR,
+    TTS_PIPELINE_WORKERS,
 )
+from ari_client import ari_client
+from audio_dsp import apply_gain
+from tts_cache import tts_cache, cache_key, write_wav  # noqa: F401 (write_wav re-exported)
 
 logger = logging.getLogger(__name__)
 
+_elevenlabs_client = None
+_elevenlabs_lock = Lock()
+
+
+def shared_elevenlabs_client() -> ElevenLabs:
+    """One ElevenLabs client, and its keep-alive connection pool, shared by every call."""
+    global _elevenlabs_client
+    with _elevenlabs_lock:
+        if _elevenlabs_client is None:
+            _elevenlabs_client = ElevenLabs(api_key=ELEVEN_LABS_API_KEY)
+        return _elevenlabs_client
+
+
+def boost_volume(audio_data: bytes, gain: float = 2.0) -> bytes:
+    """Scale 16-bit PCM from ElevenLabs by gain, clipped to int16."""
+    return apply_gain(audio_data, gain).tobytes()
+
+
+def synthesize(text: str, client: ElevenLabs = None, trace=None) -> bytes:
+    """The whole sentence as volume-boosted PCM. `trace` gets tts_first_byte."""
+    audio_generator = (client or shared_elevenlabs_client()).text_to_speech.convert(
+        text=text,
+        voice_id=ELEVEN_LABS_VOICE_ID,
+        model_id=TTS_MODEL_ID,
+        output_format=TTS_OUTPUT_FORMAT,
+        language_code=TTS_LANGUAGE
+    )
+    chunks = []
+    for chunk in audio_generator:
+        if trace and not chunks:
+            trace.mark("tts_first_byte")
+        chunks.append(chunk)
+    return boost_volume(b''.join(chunks))
+
+
+class SentenceJob:
+    """One sentence (or stored prompt) in a call's synthesis pipeline."""
+
+    def __init__(self, seq: int, text: Optional[str], trace, epoch: int):
+        self.seq = seq
+        self.text = text
+        self.trace = trace
+        self.epoch = epoch
+        self.chunks = []  # PCM synthesized so far, for the RTP stream
+        self.delivered = 0  # chunks already fed to the RTP stream
+        self.base_name = None  # sound file to play, set once synthesized
+        self.done = False
+        self.future = None
+
+
 class TTSHandler:
-    def __init__(self, channel_id: str):
+    """
+    Speaks a call's answers.
+
+    synthesize_and_play() does not block the LLM stream: each sentence
+    becomes a job that a per-call pool of TTS_PIPELINE_WORKERS threads
+    synthesizes, several sentences at once, while the jobs are handed to
+    playback strictly in the order they were queued. Stored prompts
+    (start_message, thinking) take their place in the same order.
+    clear_queue() (barge-in) drops every pending job and bumps the epoch,
+    so sentences still synthesizing are thrown away when they finish.
+
+    In "file" mode a finished sentence is a WAV file that a playback
+    thread plays through ARI. With an RTPStreamSender (TTS_PLAYBACK_MODE
+    "rtp") the sentence at the head of the order is streamed into the
+    ExternalMedia channel as its audio arrives, later ones are buffered
+    until their turn. Either way a sentence synthesized before comes from
+    the TTS cache.
+    """
+
+    def __init__(self, channel_id: str, rtp_sender=None):
         self.channel_id = channel_id
-        self.client = ElevenLabs(api_key=ELEVEN_LABS_API_KEY)
-        self.asterisk_sounds_dir = "/var/lib/asterisk/sounds/tts_audio"
+        self.rtp_sender = rtp_sender
+        self.client = shared_elevenlabs_client()
+        self.asterisk_sounds_dir = TTS_SOUNDS_DIR
+
+        # Synthesis pipeline
+        self.epoch = 0  # bumped on barge-in, jobs of an older epoch are dropped
+        self.jobs = {}  # seq -> SentenceJob not yet handed to playback
+        self.next_job_seq = 0
+        self.next_play_seq = 0
+        self.pipeline_lock = Lock()
+        self.synthesis_pool = ThreadPoolExecutor(max_workers=TTS_PIPELINE_WORKERS,
+                                                 thread_name_prefix=f"tts-{channel_id}")
         
         # Queue management
         self.audio_queue = deque()
         self.currently_playing = None
         self.current_playback_id = None  # Track current playback ID
-        self.queue_lock = Lock()
-        self.playback_thread = Thread(target=self._process_queue, daemon=True)
-        self.playback_thread.start()
+        self.current_trace = None
+        self.queue_lock = Condition()
+        self.playback_finished = Event()  # set by the PlaybackFinished ARI event
+        self.stop_flag = False
+        self.playback_thread = None
+        if not rtp_sender:
+            self.playback_thread = Thread(target=self._process_queue, daemon=True)
+            self.playback_thread.start()
         
         os.makedirs(self.asterisk_sounds_dir, exist_ok=True)
 
         self.play_start_message()
 
+    def _enqueue(self, base_name: str, trace=None) -> None:
+        with self.queue_lock:
+            self.audio_queue.append((base_name, trace))
+            self.queue_lock.notify()
+
     def play_start_message(self):
-        self.audio_queue.append("start_message")
+        self._play_prompt("start_message")
 
     def _get_playback_status(self, playback_id: str) -> Optional[str]:
         """Check the status of a playback through ARI."""
         try:
-            status_url = f"{ARI_BASE_URL}/playbacks/{playback_id}"
-            response = requests.get(status_url, auth=(ARI_USERNAME, ARI_PASSWORD))
+            response = ari_client.get(f"/playbacks/{playback_id}", timeout=1.0)
             
             if response.ok:
                 return response.json().get('state')
@@ -52,14 +144,14 @@ class TTSHandler:
             logger.error(f"Error checking playback status: {e}")
             return None
 
-    def _play_through_ari(self, base_sound_name: str) -> Optional[str]:
-        """Play audio through ARI and return the playback ID."""
+    def _play_through_ari(self, base_sound_name: str, playback_id: str) -> Optional[str]:
+        """Play audio through ARI under our own playback ID, so its events can be matched before the reply arrives."""
         try:
-            play_url = f"{ARI_BASE_URL}/channels/{self.channel_id}/play"
             params = {
-                "media": f"sound:tts_audio/{base_sound_name}"
+                "media": f"sound:tts_audio/{base_sound_name}",
+                "playbackId": playback_id,
             }
-            response = requests.post(play_url, params=params, auth=(ARI_USERNAME, ARI_PASSWORD))
+            response = ari_client.post(f"/channels/{self.channel_id}/play", params=params)
             
             if not response.ok:
                 logger.error(
@@ -67,7 +159,6 @@ class TTSHandler:
                 )
                 return None
 
-            playback_id = response.json().get('id')
             logger.info(f"Successfully queued audio playback in ARI. Playback ID: {playback_id}")
             return playback_id
 
@@ -78,8 +169,7 @@ class TTSHandler:
     def _stop_playback(self, playback_id: str) -> bool:
         """Stop a specific playback through ARI."""
         try:
-            stop_url = f"{ARI_BASE_URL}/playbacks/{playback_id}"
-            response = requests.delete(stop_url, auth=(ARI_USERNAME, ARI_PASSWORD))
+            response = ari_client.delete(f"/playbacks/{playback_id}")
             return response.ok
         except Exception as e:
             logger.error(f"Error stopping playback: {e}")
@@ -88,7 +178,17 @@ class TTSHandler:
     def clear_queue(self) -> None:
         """Clear the audio queue and stop current playback."""
         logger.info("Clearing audio queue and stopping current playback...")
-        
+
+        with self.pipeline_lock:
+            self.epoch += 1
+            for job in self.jobs.values():
+                if job.future:
+                    job.future.cancel()
+            self.jobs.clear()
+            self.next_play_seq = self.next_job_seq
+        if self.rtp_sender:
+            self.rtp_sender.flush()
+
         # Clear the queue
         with self.queue_lock:
             self.audio_queue.clear()
@@ -102,71 +202,242 @@ class TTSHandler:
                 
                 self.current_playback_id = None
                 self.currently_playing = None
+                self.playback_finished.set()
         
         logger.info("Queue cleared and playback stopped")
 
+    def on_playback_event(self, event_type: str, playback: dict) -> None:
+        """PlaybackStarted / PlaybackFinished from the ARI websocket for this channel."""
+        if playback.get('id') != self.current_playback_id:
+            return
+        if event_type == "PlaybackStarted":
+            if self.current_trace:
+                self.current_trace.mark("playback_started")
+        elif event_type == "PlaybackFinished":
+            self.playback_finished.set()
+
+    def _wait_for_playback(self, playback_id: str) -> None:
+        """
+        Block until PlaybackFinished. The status is only polled every
+        PLAYBACK_STATUS_FALLBACK_SECONDS, in case the event was lost while
+        the websocket reconnected.
+        """
+        while not self.stop_flag:
+            if self.playback_finished.wait(PLAYBACK_STATUS_FALLBACK_SECONDS):
+                return
+            if self._get_playback_status(playback_id) in [None, 'done', 'canceled', 'failed']:
+                return
+
     def _process_queue(self):
-        """Background thread to process the audio queue."""
+        """Background thread to process the audio queue, exits when the call ends."""
         while True:
-            if self.audio_queue and not self.currently_playing:
-                with self.queue_lock:
-                    base_name = self.audio_queue.popleft()
-                    self.currently_playing = base_name
-                
-                playback_id = self._play_through_ari(base_name)
-                if playback_id:
-                    self.current_playback_id = playback_id
-                    # Wait for playback to complete
-                    while True:
-                        status = self._get_playback_status(playback_id)
-                        if status in [None, 'done', 'canceled', 'failed']:
-                            break
-                        time.sleep(0.1)  # Check every 100ms
-                
-                self.currently_playing = None
-                self.current_playback_id = None
-            
-            time.sleep(0.1)  # Prevent CPU spinning
+            with self.queue_lock:
+                while not self.audio_queue and not self.stop_flag:
+                    self.queue_lock.wait()
+                if self.stop_flag:
+                    return
+                base_name, trace = self.audio_queue.popleft()
+                self.currently_playing = base_name
+                self.current_trace = trace
+                self.current_playback_id = playback_id = f"tts-{uuid.uuid4().hex}"
+                self.playback_finished.clear()
 
-    def synthesize_and_play(self, ai_answer: str) -> None:
-        base_name = f"tts_{abs(hash(ai_answer))}"
-        asterisk_wav_path = os.path.join(self.asterisk_sounds_dir, base_name + ".wav")
+            if self._play_through_ari(base_name, playback_id):
+                if trace:
+                    trace.mark("ari_play_accepted")
+                if self.current_playback_id != playback_id:
+                    # clear_queue() ran while the play request was in flight
+                    self._stop_playback(playback_id)
+                else:
+                    self._wait_for_playback(playback_id)
 
-        if not os.path.exists(asterisk_wav_path):
-            try:
-                audio_generator = self.client.text_to_speech.convert(
-                    text=ai_answer,
-                    voice_id=ELEVEN_LABS_VOICE_ID,
-                    model_id="eleven_flash_v2_5",
-                    output_format="pcm_8000",
-                    language_code="bg"
-                )
-                audio_data = b''.join(chunk for chunk in audio_generator)
+            with self.queue_lock:
+                if self.current_playback_id == playback_id:
+                    self.currently_playing = None
+                    self.current_playback_id = None
+                    self.current_trace = None
+
+    def stop(self) -> None:
+        """End the synthesis pipeline and the playback thread, called when the call ends."""
+        with self.pipeline_lock:
+            self.epoch += 1
+            self.jobs.clear()
+        self.synthesis_pool.shutdown(wait=False, cancel_futures=True)
+        with self.queue_lock:
+            self.stop_flag = True
+            self.audio_queue.clear()
+            self.queue_lock.notify()
+        self.playback_finished.set()
+        if self.rtp_sender:
+            self.rtp_sender.stop()
+
+    def _on_stream_start(self, trace):
+        """on_start callback of a streamed sentence: its first packet has been sent."""
+        if trace:
+            return lambda: trace.mark("playback_started")
+        return None
+
+    def _add_job(self, text: Optional[str], trace=None) -> SentenceJob:
+        with self.pipeline_lock:
+            job = SentenceJob(self.next_job_seq, text, trace, self.epoch)
+            self.next_job_seq += 1
+            self.jobs[job.seq] = job
+        return job
+
+    def _job_output(self, job: SentenceJob, pcm: bytes) -> bool:
+        """Add audio of a job, False once the job was dropped by barge-in or the end of the call."""
+        with self.pipeline_lock:
+            if job.epoch != self.epoch:
+                return False
+            job.chunks.append(pcm)
+            self._hand_over()
+            return True
+
+    def _job_done(self, job: SentenceJob) -> None:
+        with self.pipeline_lock:
+            job.done = True
+            if job.epoch == self.epoch:
+                self._hand_over()
+
+    def _hand_over(self) -> None:
+        """Pass finished jobs (and the head job's audio so far, when streaming) to playback in order. Holds pipeline_lock."""
+        while True:
+            job = self.jobs.get(self.next_play_seq)
+            if job is None:
+                return
+            if self.rtp_sender:
+                while job.delivered < len(job.chunks):
+                    on_start = self._on_stream_start(job.trace) if job.delivered == 0 else None
+                    self.rtp_sender.feed(job.chunks[job.delivered], on_start=on_start)
+                    job.chunks[job.delivered] = None  # the sender has its own copy
+                    job.delivered += 1
+            if not job.done:
+                return
+            if not self.rtp_sender and job.base_name:
+                self._enqueue(job.base_name, job.trace)
+                logger.info(f"Added '{job.base_name}' to the playback queue. Queue size: {len(self.audio_queue)}")
+            del self.jobs[self.next_play_seq]
+            self.next_play_seq += 1
 
-                # Convert to NumPy int16
-                audio_array = np.frombuffer(audio_data, dtype=np.int16)
+    def _play_prompt(self, base_name: str) -> None:
+        """Queue a stored prompt (start_message, thinking) behind the sentences queued before it."""
+        job = self._add_job(None)
+        job.base_name = base_name
+        if self.rtp_sender:
+            try:
+                self._job_output(job, tts_cache.read_named(base_name))
+            except Exception as e:
+                logger.error(f"Error reading {base_name} for streaming: {e}")
+        self._job_done(job)
 
-                # Increase volume
-                audio_array = np.clip(audio_array * 2.0, -32768, 32767).astype(np.int16)
+    def _stream_speech(self, job: SentenceJob, key: str) -> None:
+        """
+        Stream the sentence from ElevenLabs chunk by chunk into the job, and
+        store it in the cache once complete. The caller owns `key` in the
+        cache.
+        """
+        received = False
+        carry = b""
+        chunks = []
+        try:
+            audio_stream = self.client.text_to_speech.convert_as_stream(
+                text=job.text,
+                voice_id=ELEVEN_LABS_VOICE_ID,
+                model_id=TTS_MODEL_ID,
+                output_format=TTS_OUTPUT_FORMAT,
+                language_code=TTS_LANGUAGE
+            )
+            for chunk in audio_stream:
+                # boost_volume needs whole samples, chunks can split one
+                data = carry + chunk
+                whole = len(data) & ~1
+                carry = data[whole:]
+                if not whole:
+                    continue
+                if job.trace and not received:
+                    job.trace.mark("tts_first_byte")
+                received = True
+                pcm = boost_volume(data[:whole])
+                chunks.append(pcm)
+                if not self._job_output(job, pcm):
+                    logger.info("Barge-in, dropping the rest of the streamed sentence")
+                    tts_cache.release(key)
+                    return
+        except Exception as e:
+            logger.error(f"Error streaming TTS: {e}")
+            tts_cache.release(key)
+            return
+        tts_cache.put(key, b''.join(chunks), job.text)
 
-                # Write WAV file
-                with wave.open(asterisk_wav_path, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(8000)
-                    wf.writeframes(audio_array.tobytes())
+    def _synthesize_job(self, job: SentenceJob) -> None:
+        """Runs on the synthesis pool: get the sentence's audio from the cache or ElevenLabs."""
+        try:
+            if job.epoch != self.epoch:
+                return
+            key = cache_key(job.text)
+            pcm = tts_cache.acquire(key)
+            if pcm is not None:
+                job.base_name = tts_cache.base_name(key)
+                if self.rtp_sender:
+                    self._job_output(job, pcm)
+            elif self.rtp_sender:
+                self._stream_speech(job, key)
+            else:
+                try:
+                    pcm = synthesize(job.text, self.client, job.trace)
+                except Exception as e:
+                    logger.error(f"Error during TTS generation: {e}")
+                    tts_cache.release(key)
+                    return
+                tts_cache.put(key, pcm, job.text)
+                if job.trace:
+                    job.trace.mark("wav_written")
+                job.base_name = tts_cache.base_name(key)
+        except Exception as e:
+            logger.error(f"Error synthesizing sentence: {e}")
+        finally:
+            self._job_done(job)
 
-                logger.info(f"Wrote final WAV to: {asterisk_wav_path}")
+    def synthesize_and_play(self, ai_answer: str, trace=None) -> None:
+        """
+        Queue a sentence for synthesis and playback without waiting for it.
+        `trace` is the TurnTrace of the turn, if any.
+        """
+        if self.stop_flag:
+            return
+        job = self._add_job(ai_answer, trace)
+        try:
+            job.future = self.synthesis_pool.submit(self._synthesize_job, job)
+        except RuntimeError:
+            pass  # the call ended meanwhile, stop() shut the pool down
 
+    def prefetch(self, text: str, on_synthesized=None) -> None:
+        """
+        Render a sentence into the TTS cache without playing it (speculative
+        replies). A later synthesize_and_play() of the same text is a cache
+        hit, or waits for this synthesis if it is still running.
+        on_synthesized(text) is called if ElevenLabs had to be asked.
+        """
+        def render():
+            key = cache_key(text)
+            if tts_cache.acquire(key) is not None:
+                return
+            try:
+                pcm = synthesize(text, self.client)
             except Exception as e:
-                logger.error(f"Error during TTS generation or saving WAV: {e}")
+                logger.error(f"Error prefetching TTS: {e}")
+                tts_cache.release(key)
                 return
+            tts_cache.put(key, pcm, text)
+            if on_synthesized:
+                on_synthesized(text)
 
-        # Add to queue instead of playing immediately
-        with self.queue_lock:
-            self.audio_queue.append(base_name)
-            logger.info(f"Added '{base_name}' to the playback queue. Queue size: {len(self.audio_queue)}")
-    
-    def play_thinking_sound(self):
-        self.audio_queue.append("thinking")
+        if self.stop_flag:
+            return
+        try:
+            self.synthesis_pool.submit(render)
+        except RuntimeError:
+            pass  # the call ended meanwhile
 
+    def play_thinking_sound(self):
+        self._play_prompt("thinking")
@@ -0,0 +1,87 @@
+from typing import Optional
+import threading
+import time
+from capacity_manager import capacity_manager
+from metrics import metrics
+from utils import logger
+
+# Stages of one turn, in the order they happen
+TURN_STAGES = (
+    "speech_final",
+    "message_created",
+    "first_text_delta",
+    "first_sentence_to_tts",
+    "tts_first_byte",
+    "wav_written",
+    "ari_play_accepted",
+    "playback_started",
+)
+
+turn_elapsed = metrics.histogram(
+    "voicebot_turn_elapsed_seconds",
+    "Time from Deepgram speech_final to each stage of the reply",
+    labels=("stage",),
+)
+turn_stage = metrics.histogram(
+    "voicebot_turn_stage_seconds",
+    "Time spent in each stage of the reply, from the previous stage",
+    labels=("stage",),
+)
+turns_total = metrics.counter("voicebot_turns_total", "Conversational turns started")
+
+
+class TurnTrace:
+    """
+    Timestamps of one conversational turn, from Deepgram speech_final to the
+    first audible byte of the reply.
+
+    The trace is handed along ConversationHandler -> OpenAI_EventHandler ->
+    TTSHandler; each marks its stages. Only the first mark of a stage counts
+    (first delta, first sentence, first playback), later ones are ignored.
+    When playback starts the turn is logged and its spans go to the metrics.
+    """
+
+    def __init__(self, channel_id: str, turn: int, started_at: float = None):
+        self.channel_id = channel_id
+        self.turn = turn
+        self.marks = {}
+        self.lock = threading.Lock()
+        self.finished = False
+        turns_total.inc()
+        self.mark("speech_final", started_at)
+
+    def mark(self, stage: str, at: float = None) -> None:
+        with self.lock:
+            if self.finished or stage in self.marks:
+                return
+            self.marks[stage] = time.time() if at is None else at
+        if stage == TURN_STAGES[-1]:
+            self.finish()
+
+    def elapsed(self, stage: str) -> Optional[float]:
+        """Seconds from speech_final to the stage, None if it has not happened."""
+        at = self.marks.get(stage)
+        return None if at is None else at - self.marks["speech_final"]
+
+    def finish(self) -> None:
+        """Record the spans in the metrics and log the turn. Called once, later calls do nothing."""
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            marks = dict(self.marks)
+
+        start = marks["speech_final"]
+        previous = start
+        parts = []
+        for stage in TURN_STAGES[1:]:
+            at = marks.get(stage)
+            if at is None:
+                continue
+            turn_elapsed.observe(at - start, stage=stage)
+            turn_stage.observe(at - previous, stage=stage)
+            parts.append(f"{stage}=+{(at - start) * 1000:.0f}ms")
+            previous = at
+        if "playback_started" in marks:
+            capacity_manager.observe_turn_latency(marks["playback_started"] - start)
+        logger.info(f"[Channel {self.channel_id}] Turn {self.turn} latency: {' '.join(parts) or 'no reply'}")
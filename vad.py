@@ -0,0 +1,159 @@
+import numpy as np
+from metrics import metrics
+
+vad_seconds = metrics.counter("voicebot_vad_seconds_total",
+                              "Ingest audio the voice gate streamed (speech) or held back (suppressed)",
+                              labels=("state",))
+vad_onsets = metrics.counter("voicebot_vad_onsets_total", "Speech onsets detected by the voice gate")
+
+
+class VoiceActivityGate:
+    """
+    Energy and zero-crossing voice activity gate.
+
+    Each chunk is split into `subframe_ms` sub-frames. A sub-frame is speech
+    when its energy is `threshold_db` above the running noise floor and its
+    zero-crossing rate is speech-like (hiss and line noise cross zero far
+    more often than voiced speech), or when it is twice as far above the
+    floor. The floor falls at once to quieter sub-frames and creeps up
+    slowly, so it follows the line noise but not the caller, whose pauses
+    between words keep pulling it back down.
+
+    process() returns True for chunks that should be streamed: chunks with
+    at least `min_speech_subframes` speech sub-frames, then everything for
+    `hangover_ms` afterwards so trailing syllables and the silence the
+    recognizer needs for endpointing still get through. With `channels` > 1
+    the state is kept per channel and process_rows() gates a batch. stats()
+    reports one channel, the voicebot_vad_* counters add up every call.
+    """
+
+    def __init__(self, sample_rate: int = 8000, subframe_ms: int = 20, threshold_db: float = 9.0,
+                 max_zcr: float = 0.35, min_speech_subframes: int = 2, hangover_ms: int = 2000,
+                 min_floor_db: float = 20.0, floor_rise_db: float = 0.05, warmup_ms: int = 1000,
+                 channels: int = 1):
+        self.sample_rate = sample_rate
+        self.subframe = sample_rate * subframe_ms // 1000
+        self.threshold_db = threshold_db
+        self.max_zcr = max_zcr
+        self.min_speech_subframes = min_speech_subframes
+        self.hangover_ms = hangover_ms
+        self.min_floor_db = min_floor_db
+        self.floor_rise_db = floor_rise_db  # per sub-frame, 0.05 dB per 20 ms = 2.5 dB/s
+        self.warmup_subframes = warmup_ms // subframe_ms
+        self.channels = channels
+
+        self.floor_db = np.zeros(channels)
+        self.subframes_seen = np.zeros(channels, dtype=np.int64)
+        self.hangover_left_ms = np.zeros(channels)
+        self.active = np.zeros(channels, dtype=bool)
+        self.previous_seconds = np.zeros(channels)
+        self.speech_seconds = np.zeros(channels)
+        self.suppressed_seconds = np.zeros(channels)
+        self.onsets = np.zeros(channels, dtype=np.int64)
+        self.reset()
+
+    def reset(self, rows=slice(None)) -> None:
+        # start low so a caller who talks straight away is heard, then climb
+        # ten times faster than usual until warmup_ms of audio has been seen
+        self.floor_db[rows] = self.min_floor_db
+        self.subframes_seen[rows] = 0
+        self.hangover_left_ms[rows] = 0
+        self.active[rows] = False
+        self.previous_seconds[rows] = 0
+        self.speech_seconds[rows] = 0
+        self.suppressed_seconds[rows] = 0
+        self.onsets[rows] = 0
+
+    def _speech_subframes(self, rows, samples: np.ndarray) -> np.ndarray:
+        usable = samples.shape[1] - samples.shape[1] % self.subframe
+        frames = np.asarray(samples[:, :usable], dtype=np.float32).reshape(len(samples), -1, self.subframe)
+        energy_db = 10 * np.log10(np.einsum("ijk,ijk->ij", frames, frames) / self.subframe + 1.0)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[..., 1:] != signs[..., :-1], axis=-1) / (self.subframe - 1)
+
+        if len(samples) == 1:
+            count = np.array([self._track_floor_scalar(rows, energy_db[0].tolist(), zcr[0].tolist())])
+        else:
+            count = self._track_floor(rows, energy_db, zcr)
+        return count
+
+    def _is_speech(self, above: float, crossings: float) -> bool:
+        return above > 2 * self.threshold_db or (above > self.threshold_db and crossings < self.max_zcr)
+
+    def _track_floor_scalar(self, rows, energy_db: list, zcr: list) -> int:
+        # plain floats are several times faster than NumPy scalars for one channel
+        row = np.arange(self.channels)[rows][0]
+        floor = float(self.floor_db[row])
+        seen = int(self.subframes_seen[row])
+        count = 0
+        for energy, crossings in zip(energy_db, zcr):
+            if energy < floor:
+                floor = max(energy, self.min_floor_db)
+            count += self._is_speech(energy - floor, crossings)
+            # rising during speech too lets the floor catch up with a louder line,
+            # pauses between words pull it back down
+            rise = self.floor_rise_db * (10 if seen < self.warmup_subframes else 1)
+            floor = min(floor + rise, max(energy, self.min_floor_db))
+            seen += 1
+        self.floor_db[row] = floor
+        self.subframes_seen[row] = seen
+        return count
+
+    def _track_floor(self, rows, energy_db: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+        """_track_floor_scalar() for a batch, stepping through the sub-frames of all rows at once."""
+        floor = self.floor_db[rows]
+        seen = self.subframes_seen[rows]
+        count = np.zeros(len(energy_db), dtype=np.int64)
+        for energy, crossings in zip(energy_db.T, zcr.T):
+            floor = np.where(energy < floor, np.maximum(energy, self.min_floor_db), floor)
+            above = energy - floor
+            count += (above > 2 * self.threshold_db) | ((above > self.threshold_db) & (crossings < self.max_zcr))
+            rise = np.where(seen < self.warmup_subframes, 10 * self.floor_rise_db, self.floor_rise_db)
+            floor = np.minimum(floor + rise, np.maximum(energy, self.min_floor_db))
+            seen = seen + 1
+        self.floor_db[rows] = floor
+        self.subframes_seen[rows] = seen
+        return count
+
+    def process_rows(self, rows, samples: np.ndarray) -> np.ndarray:
+        """Classify one chunk per row of a (batch, samples) array, return which to stream."""
+        seconds = samples.shape[1] / self.sample_rate
+        was_active = self.active[rows].copy()
+        if not seconds:
+            return was_active
+
+        speech = self._speech_subframes(rows, samples) >= self.min_speech_subframes
+        hangover = self.hangover_left_ms[rows]
+        in_hangover = ~speech & (hangover > 0)
+        self.hangover_left_ms[rows] = np.where(speech, self.hangover_ms,
+                                               np.where(in_hangover, hangover - seconds * 1000, hangover))
+        active = speech | in_hangover
+        self.active[rows] = active
+
+        # the chunk before an onset goes out as pre-roll
+        onset = active & ~was_active
+        preroll = np.where(onset, self.previous_seconds[rows], 0.0)
+        streamed = np.where(active, seconds, 0.0) + preroll
+        self.speech_seconds[rows] += streamed
+        self.suppressed_seconds[rows] += seconds - streamed
+        self.onsets[rows] += onset
+        speech_total = float(streamed.sum())
+        vad_seconds.inc(speech_total, state="speech")
+        vad_seconds.inc(seconds * len(streamed) - speech_total, state="suppressed")
+        onsets = int(np.count_nonzero(onset))
+        if onsets:
+            vad_onsets.inc(onsets)
+        self.previous_seconds[rows] = np.where(active, 0.0, seconds)
+        return active
+
+    def process(self, samples: np.ndarray) -> bool:
+        """Classify one chunk of channel 0, return whether it should be streamed."""
+        return bool(self.process_rows(slice(0, 1), np.asarray(samples)[np.newaxis])[0])
+
+    def stats(self, row: int = 0) -> dict:
+        return {
+            "speech_seconds": round(float(self.speech_seconds[row]), 2),
+            "suppressed_seconds": round(float(self.suppressed_seconds[row]), 2),
+            "onsets": int(self.onsets[row]),
+            "noise_floor_db": round(float(self.floor_db[row]), 1),
+        }
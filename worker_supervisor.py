@@ -0,0 +1,229 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from config import (WORKER_PROCESSES, WORKER_HEARTBEAT_SECONDS, WORKER_HEARTBEAT_TIMEOUT, METRICS_PORT, PROMPT_PREWARM,
+                    LLM_BACKEND)
+from ari_client import ari_client
+from external_media import is_external_media_channel
+from metrics import metrics
+from utils import logger
+
+worker_calls = metrics.gauge("voicebot_worker_calls", "Calls placed on each worker process", labels=("worker",))
+worker_cpu = metrics.gauge("voicebot_worker_cpu_percent", "CPU use each worker reported", labels=("worker",))
+worker_restarts = metrics.counter("voicebot_worker_restarts_total", "Worker processes restarted after dying",
+                                  labels=("worker",))
+calls_lost = metrics.counter("voicebot_worker_calls_lost_total", "Calls hung up because their worker died")
+
+
+def event_channel_id(event: dict):
+    """The caller channel an ARI event belongs to, None for events we do not route."""
+    if event.get('type') in ("PlaybackStarted", "PlaybackFinished"):
+        target = event.get('playback', {}).get('target_uri', '')
+        return target[len('channel:'):] if target.startswith('channel:') else None
+    channel = event.get('channel')
+    if not channel or is_external_media_channel(channel):
+        return None
+    return channel.get('id')
+
+
+def worker_main(index: int, inbox, outbox) -> None:
+    """
+    Entry point of a worker process. Runs the single-process call handling
+    (ari_handler.on_ari_message) on the raw ARI events the supervisor
+    forwards, and reports its load every WORKER_HEARTBEAT_SECONDS.
+    """
+    # imported here so the supervisor process never starts call machinery of its own
+    from ari_handler import on_ari_message, active_channels, cleanup_channel
+    from capacity_manager import capacity_manager
+    from openai_functions.OpenAIClient import openai_client
+    from session_pool import session_pool
+    from prompt_builder import prewarm_prompts
+    from knowledge_index import knowledge_index
+
+    if LLM_BACKEND == "assistants":
+        openai_client.create_assistant()
+    else:
+        openai_client.connect()
+        knowledge_index.load()
+    if PROMPT_PREWARM:
+        prewarm_prompts(synthesize_missing=False)  # the supervisor built them, load them into this worker's memory
+    session_pool.start()
+    if METRICS_PORT:
+        metrics.start_server(port=METRICS_PORT + 1 + index)
+
+    def heartbeat():
+        last_cpu, last_wall = time.process_time(), time.monotonic()
+        while True:
+            time.sleep(WORKER_HEARTBEAT_SECONDS)
+            cpu, wall = time.process_time(), time.monotonic()
+            outbox.put({
+                "worker": index,
+                "pid": os.getpid(),
+                "active_calls": capacity_manager.active_calls(),
+                "cpu_percent": round(100 * (cpu - last_cpu) / (wall - last_wall), 1),
+            })
+            last_cpu, last_wall = cpu, wall
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    logger.info(f"Worker {index} (pid {os.getpid()}) ready")
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        on_ari_message(None, message)
+
+    for channel_id in list(active_channels.keys()):
+        cleanup_channel(channel_id)
+    session_pool.stop()
+
+
+class WorkerHandle:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.inbox = None
+        self.channels = set()
+        self.last_heartbeat = 0.0
+        self.cpu_percent = 0.0
+        self.started_at = 0.0
+        self.quick_deaths = 0  # deaths soon after start, in a row
+        self.respawn_at = None
+
+    def healthy(self) -> bool:
+        return (self.process is not None and self.process.is_alive()
+                and time.monotonic() - self.last_heartbeat < WORKER_HEARTBEAT_TIMEOUT)
+
+
+class WorkerSupervisor:
+    """
+    Front process of the multi-process mode.
+
+    Keeps the ARI websocket and places every new call on one of N worker
+    processes, each with its own GIL, DSP, Deepgram and TTS threads. The
+    call goes to the healthy worker with the fewest calls, CPU use
+    breaking ties; after that every event of the channel (StasisEnd,
+    playback events) is forwarded to the same worker. Workers report
+    their load in heartbeats. A worker that dies is restarted, and only
+    its own calls are hung up.
+    """
+
+    def __init__(self, workers: int = WORKER_PROCESSES):
+        self.context = multiprocessing.get_context("spawn")
+        self.outbox = self.context.Queue()  # heartbeats from all workers
+        self.workers = [WorkerHandle(i) for i in range(workers)]
+        self.channel_workers = {}  # channel_id -> WorkerHandle
+        self.lock = threading.Lock()
+        self.stop_flag = False
+        self.monitor_thread = None
+
+    def _spawn(self, worker: WorkerHandle) -> None:
+        worker.inbox = self.context.Queue()
+        worker.process = self.context.Process(
+            target=worker_main, args=(worker.index, worker.inbox, self.outbox),
+            name=f"voicebot-worker-{worker.index}", daemon=True,
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.respawn_at = None
+        # the first heartbeat is due after startup, give the worker time to import and connect
+        worker.last_heartbeat = time.monotonic() + WORKER_HEARTBEAT_TIMEOUT
+        logger.info(f"Started worker {worker.index} (pid {worker.process.pid})")
+
+    def start(self) -> None:
+        for worker in self.workers:
+            self._spawn(worker)
+        self.monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def _pick(self):
+        healthy = [worker for worker in self.workers if worker.healthy()]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda worker: (len(worker.channels), worker.cpu_percent))
+
+    def route(self, ws, message) -> None:
+        """on_message of the ARI websocket: forward the event to the worker that owns its channel."""
+        try:
+            event = json.loads(message)
+            event_type = event.get('type')
+            channel_id = event_channel_id(event)
+            if not channel_id:
+                return
+
+            with self.lock:
+                if event_type == "StasisStart":
+                    worker = self._pick()
+                    if worker:
+                        worker.channels.add(channel_id)
+                        self.channel_workers[channel_id] = worker
+                        worker_calls.set(len(worker.channels), worker=str(worker.index))
+                elif event_type == "StasisEnd":
+                    worker = self.channel_workers.pop(channel_id, None)
+                    if worker:
+                        worker.channels.discard(channel_id)
+                        worker_calls.set(len(worker.channels), worker=str(worker.index))
+                else:
+                    worker = self.channel_workers.get(channel_id)
+
+            if worker:
+                worker.inbox.put(message)
+            elif event_type == "StasisStart":
+                logger.error(f"No healthy worker for channel {channel_id}, rejecting the call")
+                ari_client.delete(f"/channels/{channel_id}", params={"reason": "congestion"})
+        except Exception as e:
+            logger.error(f"Error routing ARI message: {e}")
+
+    def _handle_dead_worker(self, worker: WorkerHandle) -> None:
+        with self.lock:
+            lost = list(worker.channels)
+            worker.channels.clear()
+            for channel_id in lost:
+                self.channel_workers.pop(channel_id, None)
+            worker_calls.set(0, worker=str(worker.index))
+        logger.error(f"Worker {worker.index} died (exit code {worker.process.exitcode}), "
+                     f"hanging up its {len(lost)} calls")
+        for channel_id in lost:
+            calls_lost.inc()
+            try:
+                ari_client.delete(f"/channels/{channel_id}")
+            except Exception as e:
+                logger.error(f"Error hanging up channel {channel_id}: {e}")
+        # a worker that keeps dying right after start (bad config, backend down) is restarted with backoff
+        if time.monotonic() - worker.started_at < 10 * WORKER_HEARTBEAT_TIMEOUT:
+            worker.quick_deaths += 1
+        else:
+            worker.quick_deaths = 0
+        worker.respawn_at = time.monotonic() + (min(60, 2 ** worker.quick_deaths) if worker.quick_deaths > 1 else 0)
+
+    def _monitor(self) -> None:
+        while not self.stop_flag:
+            try:
+                report = self.outbox.get(timeout=1.0)
+                worker = self.workers[report["worker"]]
+                worker.last_heartbeat = time.monotonic()
+                worker.cpu_percent = report["cpu_percent"]
+                worker_cpu.set(worker.cpu_percent, worker=str(worker.index))
+            except queue.Empty:
+                pass
+            for worker in self.workers:
+                if self.stop_flag or not worker.process:
+                    continue
+                if worker.respawn_at is not None:
+                    if time.monotonic() >= worker.respawn_at:
+                        worker_restarts.inc(worker=str(worker.index))
+                        self._spawn(worker)
+                elif not worker.process.is_alive():
+                    self._handle_dead_worker(worker)
+
+    def stop(self) -> None:
+        self.stop_flag = True
+        for worker in self.workers:
+            if worker.process and worker.process.is_alive():
+                worker.inbox.put(None)
+        for worker in self.workers:
+            if worker.process:
+                worker.process.join(timeout=10)